@@ -7,15 +7,126 @@ LANGUAGE SQL
 AS
 $$
 BEGIN
+    -- Written by monitor_pipeline.py; created here too so the views compile
+    -- before the first instrumented run
+    CREATE TABLE IF NOT EXISTS GPT_REVIEWS_DB.PUBLIC.PIPELINE_STAGE_MONITORING (
+        RUN_ID STRING,
+        DATE DATE,
+        TASK_NAME STRING,
+        STAGE STRING,
+        CALLS INT,
+        DURATION_SEC FLOAT,
+        ROWS_PROCESSED INT,
+        PAGES INT,
+        BYTES INT,
+        RETRIES INT,
+        TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP
+    );
+    ALTER TABLE GPT_REVIEWS_DB.PUBLIC.PIPELINE_MONITORING ADD COLUMN IF NOT EXISTS RUN_ID STRING;
+    ALTER TABLE GPT_REVIEWS_DB.PUBLIC.PIPELINE_MONITORING ADD COLUMN IF NOT EXISTS ANOMALY_SEVERITY STRING;
+
+    -- Written by review_update.py (quality.py) in each batch's transaction:
+    -- the rows its MERGE inserts or rewrites count +1, the values it replaces
+    -- -1, so the table sums to the stored corpus. The reviews loaded before
+    -- it existed are counted once as RUN_ID 'backfill'
+    CREATE TABLE IF NOT EXISTS GPT_REVIEWS_DB.PUBLIC.REVIEW_QUALITY_STATS (
+        RUN_ID STRING,
+        DATE DATE,
+        TASK_NAME STRING,
+        APP_ID STRING,
+        ROWS_CHECKED INT,
+        MISSING_REVIEW_ID INT,
+        MISSING_CONTENT INT,
+        MISSING_SCORE INT,
+        SCORE_OUT_OF_RANGE INT,
+        MISSING_CREATED_AT INT,
+        DUPLICATE_IDS INT,
+        LONG_CONTENT INT,
+        CONTENT_LEN_SUM BIGINT,
+        CONTENT_LEN_SUMSQ BIGINT,
+        CONTENT_LEN_MAX INT,
+        TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Quality of what each run changed in reviews (net of rewrites), plus
+    -- running totals over all runs, which with the backfill row are the
+    -- whole stored corpus
+    CREATE OR REPLACE VIEW GPT_REVIEWS_DB.PUBLIC.REVIEW_QUALITY_BY_RUN AS
+    WITH runs AS (
+        SELECT
+            RUN_ID,
+            MIN(DATE) AS RUN_DATE,
+            MIN(TIMESTAMP) AS FIRST_BATCH_AT,
+            SUM(ROWS_CHECKED) AS ROWS_CHECKED,
+            SUM(MISSING_REVIEW_ID) AS MISSING_REVIEW_ID,
+            SUM(MISSING_CONTENT) AS MISSING_CONTENT,
+            SUM(MISSING_SCORE) AS MISSING_SCORE,
+            SUM(SCORE_OUT_OF_RANGE) AS SCORE_OUT_OF_RANGE,
+            SUM(MISSING_CREATED_AT) AS MISSING_CREATED_AT,
+            SUM(DUPLICATE_IDS) AS DUPLICATE_IDS,
+            SUM(LONG_CONTENT) AS LONG_CONTENT,
+            SUM(CONTENT_LEN_SUM) AS CONTENT_LEN_SUM,
+            SUM(CONTENT_LEN_SUMSQ) AS CONTENT_LEN_SUMSQ,
+            MAX(CONTENT_LEN_MAX) AS CONTENT_LEN_MAX
+        FROM GPT_REVIEWS_DB.PUBLIC.REVIEW_QUALITY_STATS
+        GROUP BY RUN_ID
+    )
+    SELECT
+        RUN_ID,
+        RUN_DATE,
+        ROWS_CHECKED,
+        MISSING_REVIEW_ID,
+        MISSING_CONTENT,
+        MISSING_SCORE,
+        SCORE_OUT_OF_RANGE,
+        MISSING_CREATED_AT,
+        DUPLICATE_IDS,
+        LONG_CONTENT,
+        ROUND(100 * MISSING_CONTENT / NULLIF(ROWS_CHECKED, 0), 2) AS MISSING_CONTENT_PCT,
+        ROUND(CONTENT_LEN_SUM / NULLIF(ROWS_CHECKED, 0), 1) AS AVG_CONTENT_LENGTH,
+        ROUND(SQRT(GREATEST(CONTENT_LEN_SUMSQ / NULLIF(ROWS_CHECKED, 0)
+                            - POWER(CONTENT_LEN_SUM / NULLIF(ROWS_CHECKED, 0), 2), 0)), 1) AS STDDEV_CONTENT_LENGTH,
+        CONTENT_LEN_MAX,
+        SUM(ROWS_CHECKED) OVER (ORDER BY FIRST_BATCH_AT) AS TOTAL_ROWS_CHECKED,
+        ROUND(100 * SUM(MISSING_CONTENT) OVER (ORDER BY FIRST_BATCH_AT)
+              / NULLIF(SUM(ROWS_CHECKED) OVER (ORDER BY FIRST_BATCH_AT), 0), 2) AS TOTAL_MISSING_CONTENT_PCT
+    FROM runs
+    ORDER BY FIRST_BATCH_AT DESC;
+
+    -- One row per run and stage, with the stage's share of the run's wall time.
+    -- Fetching runs on worker threads alongside the other stages, so shares
+    -- can add up to more than 100%.
+    CREATE OR REPLACE VIEW GPT_REVIEWS_DB.PUBLIC.PIPELINE_STAGE_BREAKDOWN AS
+    SELECT
+        s.DATE AS RUN_DATE,
+        s.RUN_ID,
+        s.TASK_NAME,
+        s.STAGE,
+        s.CALLS,
+        s.DURATION_SEC,
+        ROUND(100 * s.DURATION_SEC / NULLIF(m.DURATION_SEC, 0), 1) AS PCT_OF_RUN,
+        s.ROWS_PROCESSED,
+        ROUND(s.ROWS_PROCESSED / NULLIF(s.DURATION_SEC, 0), 1) AS ROWS_PER_SEC,
+        s.PAGES,
+        s.BYTES,
+        s.RETRIES
+    FROM GPT_REVIEWS_DB.PUBLIC.PIPELINE_STAGE_MONITORING s
+    LEFT JOIN GPT_REVIEWS_DB.PUBLIC.PIPELINE_MONITORING m
+      ON m.RUN_ID = s.RUN_ID
+    ORDER BY s.DATE DESC, s.DURATION_SEC DESC;
+
     CREATE OR REPLACE VIEW GPT_REVIEWS_DB.PUBLIC.PIPELINE_MONITORING_WITH_ANOMALY AS
     WITH base AS (
         SELECT 
+            RUN_ID,
             DATE AS RUN_DATE,
             TASK_NAME,
             STATUS,
             ROWS_LOADED,
             DURATION_SEC,
             ERROR_MESSAGE,
+            ANOMALY_FLAG,
+            ANOMALY_SEVERITY,
             CASE 
                 WHEN ROWS_LOADED = 0 THEN 'NO_DATA'
                 WHEN ERROR_MESSAGE IS NOT NULL THEN 'PIPELINE_ERROR'
@@ -24,15 +135,38 @@ BEGIN
         FROM GPT_REVIEWS_DB.PUBLIC.PIPELINE_MONITORING
     ),
     field_check AS (
-        SELECT 
-            MAX(DATE_TRUNC('MONTH', CURRENT_DATE())) AS RUN_MONTH,
-            'review_update' AS TASK_NAME,
-            COUNT_IF(REVIEW_ID IS NULL) AS missing_review_id,
-            COUNT_IF(CONTENT IS NULL OR TRIM(CONTENT) = '') AS missing_content,
-            COUNT_IF(SCORE IS NULL) AS missing_score,
-            COUNT(*) AS total_rows,
-            ROUND(100 * COUNT_IF(CONTENT IS NULL OR TRIM(CONTENT) = '') / NULLIF(COUNT(*), 0), 2) AS missing_content_pct
-        FROM GPT_REVIEWS_DB.PUBLIC.REVIEWS
+        SELECT
+            RUN_ID,
+            MISSING_REVIEW_ID AS missing_review_id,
+            MISSING_CONTENT AS missing_content,
+            MISSING_SCORE AS missing_score,
+            SCORE_OUT_OF_RANGE AS score_out_of_range,
+            DUPLICATE_IDS AS duplicate_ids,
+            ROWS_CHECKED AS total_rows,
+            MISSING_CONTENT_PCT AS missing_content_pct
+        FROM GPT_REVIEWS_DB.PUBLIC.REVIEW_QUALITY_BY_RUN
+    ),
+    stages AS (
+        SELECT
+            RUN_ID,
+            SUM(IFF(STAGE = 'setup', DURATION_SEC, 0)) AS SETUP_SEC,
+            SUM(IFF(STAGE = 'fetch', DURATION_SEC, 0)) AS FETCH_SEC,
+            SUM(IFF(STAGE = 'filter', DURATION_SEC, 0)) AS FILTER_SEC,
+            SUM(IFF(STAGE = 'landing', DURATION_SEC, 0)) AS LANDING_SEC,
+            SUM(IFF(STAGE = 'quality', DURATION_SEC, 0)) AS QUALITY_SEC,
+            SUM(IFF(STAGE = 'transform', DURATION_SEC, 0)) AS TRANSFORM_SEC,
+            SUM(IFF(STAGE = 'stage', DURATION_SEC, 0)) AS STAGE_SEC,
+            SUM(IFF(STAGE = 'sentiment', DURATION_SEC, 0)) AS SENTIMENT_SEC,
+            SUM(IFF(STAGE = 'aggregates', DURATION_SEC, 0)) AS AGGREGATES_SEC,
+            SUM(IFF(STAGE = 'merge', DURATION_SEC, 0)) AS MERGE_SEC,
+            SUM(IFF(STAGE = 'commit', DURATION_SEC, 0)) AS COMMIT_SEC,
+            SUM(IFF(STAGE = 'watermarks', DURATION_SEC, 0)) AS WATERMARKS_SEC,
+            SUM(IFF(STAGE = 'metadata', DURATION_SEC, 0)) AS METADATA_SEC,
+            SUM(IFF(STAGE = 'fetch', PAGES, 0)) AS PAGES_FETCHED,
+            SUM(IFF(STAGE = 'stage', BYTES, 0)) AS BYTES_STAGED,
+            SUM(RETRIES) AS RETRIES
+        FROM GPT_REVIEWS_DB.PUBLIC.PIPELINE_STAGE_MONITORING
+        GROUP BY RUN_ID
     )
     SELECT 
         b.RUN_DATE,
@@ -43,15 +177,40 @@ BEGIN
         b.ERROR_MESSAGE,
         COALESCE(
             b.pipeline_flag,
-            CASE WHEN f.missing_content_pct > 10 THEN 'MISSING_FIELDS' END
+            CASE WHEN b.ANOMALY_SEVERITY IN ('WARNING', 'CRITICAL') THEN 'STATISTICAL_' || b.ANOMALY_SEVERITY END,
+            CASE WHEN f.missing_content_pct > 10 THEN 'MISSING_FIELDS' END,
+            CASE WHEN f.score_out_of_range > 0 THEN 'INVALID_SCORES' END,
+            CASE WHEN f.duplicate_ids > 0 THEN 'DUPLICATE_IDS' END
         ) AS FINAL_ANOMALY_FLAG,
+        b.ANOMALY_SEVERITY,
+        b.ANOMALY_FLAG AS ANOMALY_DETAIL,
         f.missing_review_id,
         f.missing_content,
         f.missing_score,
-        f.missing_content_pct
+        f.missing_content_pct,
+        f.score_out_of_range,
+        f.duplicate_ids,
+        s.SETUP_SEC,
+        s.FETCH_SEC,
+        s.FILTER_SEC,
+        s.LANDING_SEC,
+        s.QUALITY_SEC,
+        s.TRANSFORM_SEC,
+        s.STAGE_SEC,
+        s.SENTIMENT_SEC,
+        s.AGGREGATES_SEC,
+        s.MERGE_SEC,
+        s.COMMIT_SEC,
+        s.WATERMARKS_SEC,
+        s.METADATA_SEC,
+        s.PAGES_FETCHED,
+        s.BYTES_STAGED,
+        s.RETRIES
     FROM base b
     LEFT JOIN field_check f
-      ON b.TASK_NAME = f.TASK_NAME
+      ON b.RUN_ID = f.RUN_ID
+    LEFT JOIN stages s
+      ON b.RUN_ID = s.RUN_ID
     ORDER BY b.RUN_DATE DESC;
 
     RETURN 'Dashboard view recreated successfully';
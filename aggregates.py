@@ -0,0 +1,190 @@
+# aggregates.py
+
+import argparse
+import os
+
+import loader
+import spans
+
+
+# Additive counters kept per (app, month) and per (app, app_version), with the
+# expression each delta row contributes. Being sums, they can be updated from
+# the rows a MERGE adds and replaces without rereading the rest of a month
+COUNTERS = [
+    ("review_count", "sign"),
+    ("scored_count", "CASE WHEN score IS NULL THEN 0 ELSE sign END"),
+    ("score_sum", "sign * COALESCE(score, 0)"),
+    ("score_sumsq", "sign * COALESCE(score * score, 0)"),
+    ("content_length_sum", "sign * COALESCE(content_length, 0)"),
+    ("content_length_sumsq", "sign * COALESCE(content_length * content_length, 0)"),
+    ("word_count_sum", "sign * COALESCE(word_count, 0)"),
+    ("word_count_sumsq", "sign * COALESCE(word_count * word_count, 0)"),
+]
+
+# Summary table -> its key columns besides app_id, with their types
+TABLES = {
+    "review_monthly_stats": [("month", "DATE")],
+    "review_version_stats": [("app_version", "STRING")],
+}
+
+# Whitespace-separated words, as `str.split()` counts them in analysis.py
+WORD_COUNT_SQL = {
+    "snowflake": "REGEXP_COUNT({col}, '\\\\S+')",
+    "duckdb": "LEN(REGEXP_EXTRACT_ALL({col}, '\\S+'))",
+}
+
+DELTA_DDL = """
+CREATE OR REPLACE TEMPORARY TABLE reviews_delta (
+    app_id STRING,
+    month DATE,
+    app_version STRING,
+    sign INT,
+    score INT,
+    content_length INT,
+    word_count INT
+)
+"""
+
+CLEAR_DELTA_SQL = "DELETE FROM reviews_delta"
+
+# Run between staging and MERGE: every staged row the MERGE will insert or
+# rewrite adds its new values, and every row it rewrites takes back the old
+CAPTURE_DELTA_SQL = """
+INSERT INTO reviews_delta (app_id, month, app_version, sign, score, content_length, word_count)
+SELECT source.app_id, CAST(DATE_TRUNC('MONTH', source.created_at) AS DATE), source.app_version, 1,
+       source.score, LENGTH(source.content), {source_words}
+FROM reviews_staging AS source
+LEFT JOIN reviews AS target ON target.review_id = source.review_id
+WHERE target.review_id IS NULL OR target.content_hash IS DISTINCT FROM source.content_hash
+UNION ALL
+SELECT target.app_id, CAST(DATE_TRUNC('MONTH', target.created_at) AS DATE), target.app_version, -1,
+       target.score, LENGTH(target.content), {target_words}
+FROM reviews_staging AS source
+JOIN reviews AS target ON target.review_id = source.review_id
+WHERE target.content_hash IS DISTINCT FROM source.content_hash
+"""
+
+# Every stored review as a delta, for a full rebuild
+FULL_DELTA_SQL = """
+INSERT INTO reviews_delta (app_id, month, app_version, sign, score, content_length, word_count)
+SELECT app_id, CAST(DATE_TRUNC('MONTH', created_at) AS DATE), app_version, 1,
+       score, LENGTH(content), {words}
+FROM reviews
+"""
+
+
+def table_ddl(table):
+    keys = TABLES[table]
+    columns = ["app_id STRING"] + [f"{name} {kind}" for name, kind in keys]
+    columns += [f"{name} BIGINT" for name, _ in COUNTERS] + ["updated_at TIMESTAMP_NTZ"]
+    return f"CREATE TABLE IF NOT EXISTS {table} (\n    " + ",\n    ".join(columns) + "\n)"
+
+
+def apply_sql(table):
+    """MERGE the summed reviews_delta into `table`, adding to existing counters."""
+    keys = ["app_id"] + [name for name, _ in TABLES[table]]
+    sums = ",\n        ".join(f"SUM({expr}) AS {name}" for name, expr in COUNTERS)
+    match = " AND ".join(f"target.{k} IS NOT DISTINCT FROM source.{k}" for k in keys)
+    updates = ", ".join(f"{name} = target.{name} + source.{name}" for name, _ in COUNTERS)
+    columns = keys + [name for name, _ in COUNTERS]
+    return f"""
+MERGE INTO {table} AS target
+USING (
+    SELECT {", ".join(keys)},
+        {sums}
+    FROM reviews_delta
+    GROUP BY {", ".join(keys)}
+) AS source
+ON {match}
+WHEN MATCHED THEN UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP()
+WHEN NOT MATCHED THEN INSERT ({", ".join(columns)}, updated_at)
+VALUES ({", ".join(f"source.{c}" for c in columns)}, CURRENT_TIMESTAMP())
+"""
+
+
+def aggregates_from_env():
+    """Return the ReviewAggregates for this run, or None when REVIEW_AGGREGATES=0 turns them off."""
+    if os.getenv("REVIEW_AGGREGATES", "1") == "0":
+        return None
+    return ReviewAggregates()
+
+
+class ReviewAggregates:
+    """Monthly and per-version summary tables kept in step with reviews.
+
+    `capture()` runs after a batch is staged and before it is merged; it
+    records what the MERGE will add and replace in the temporary
+    reviews_delta table. `apply()` runs after the MERGE and adds the summed
+    deltas to the rows of the months and versions the batch touched.
+    Nothing else is read or rewritten. Both warehouses autocommit, so the
+    caller must run capture, MERGE and apply inside one explicit
+    transaction (ingest_pipeline.commit_batch does); otherwise a crash
+    between the MERGE and apply leaves the summaries short of the batch.
+    """
+
+    def __init__(self):
+        self.dialect = None
+
+    def _words(self, col):
+        return WORD_COUNT_SQL["snowflake" if self.dialect == "snowflake" else "duckdb"].format(col=col)
+
+    def ensure_tables(self, cursor, build_empty=True):
+        """Create the summary tables and reviews_delta; build the summaries when they are empty."""
+        self.dialect = loader.dialect_of(cursor)
+        for table in TABLES:
+            cursor.execute(table_ddl(table))
+        cursor.execute(DELTA_DDL)
+        if build_empty:
+            cursor.execute("SELECT COUNT(*) FROM review_monthly_stats")
+            if cursor.fetchone()[0] == 0:
+                self.rebuild(cursor)
+
+    def rebuild(self, cursor):
+        """Recompute both summary tables from all of reviews."""
+        print("Rebuilding review summary tables from reviews...")
+        with spans.span("aggregates"):
+            for table in TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+            cursor.execute(CLEAR_DELTA_SQL)
+            cursor.execute(FULL_DELTA_SQL.format(words=self._words("content")))
+            self._apply(cursor)
+
+    def capture(self, cursor):
+        """Record the staged batch's effect on the summaries; call before the MERGE."""
+        with spans.span("aggregates"):
+            cursor.execute(CLEAR_DELTA_SQL)
+            cursor.execute(CAPTURE_DELTA_SQL.format(source_words=self._words("source.content"),
+                                                    target_words=self._words("target.content")))
+
+    def apply(self, cursor):
+        """Add the captured deltas to the summary tables; call after the MERGE."""
+        with spans.span("aggregates"):
+            self._apply(cursor)
+
+    def _apply(self, cursor):
+        for table in TABLES:
+            cursor.execute(apply_sql(table))
+            # Months or versions whose every review moved elsewhere
+            cursor.execute(f"DELETE FROM {table} WHERE review_count = 0")
+        cursor.execute(CLEAR_DELTA_SQL)
+
+
+def main(argv=None):
+    """Command line: `python aggregates.py rebuild` recomputes the summary tables from reviews."""
+    import warehouse
+
+    parser = argparse.ArgumentParser(description="Maintain the review summary tables.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args(argv)
+    conn = warehouse.get_connection()
+    cursor = conn.cursor()
+    aggregates = ReviewAggregates()
+    aggregates.ensure_tables(cursor, build_empty=False)
+    aggregates.rebuild(cursor)
+    conn.commit()
+    cursor.close()
+    print("Review summary tables rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
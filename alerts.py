@@ -0,0 +1,274 @@
+# alerts.py
+
+from collections import namedtuple
+from email.mime.text import MIMEText
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+
+from checkpoint import CHECKPOINT_DIR
+
+
+ALERT_STATE_PATH = os.getenv("ALERT_STATE_PATH", os.path.join(CHECKPOINT_DIR, "alerts.json"))
+DEDUP_SEC = float(os.getenv("ALERT_DEDUP_SEC", 6 * 3600))     # repeats of a key inside this are dropped
+MAX_PER_HOUR = int(os.getenv("ALERT_MAX_PER_HOUR", 10))        # messages actually sent, across runs
+BATCH_SEC = float(os.getenv("ALERT_BATCH_SEC", 1.0))           # alerts arriving this close share one message
+FLUSH_TIMEOUT = float(os.getenv("ALERT_FLUSH_TIMEOUT", 30))
+
+Alert = namedtuple("Alert", ["key", "subject", "body", "severity", "created"])
+
+_STOP = object()
+
+
+def _env(*names, default=None):
+    """First set variable among `names` (the workflow and older docs use different ones)."""
+    for name in names:
+        value = os.getenv(name)
+        if value:
+            return value
+    return default
+
+
+class ConsoleSink:
+    """Prints alerts instead of sending them; the fallback when SMTP is not configured."""
+
+    def send(self, subject, body):
+        print(f"ALERT: {subject}\n{body}")
+
+    def close(self):
+        pass
+
+
+class SmtpSink:
+    """Sends alerts by email over one SMTP connection, reused across messages.
+
+    The connection is opened on the first message and checked with NOOP
+    before each later one; a dropped connection is reopened once. Works
+    against a plain local debugging server (`starttls=False`, no `user`),
+    e.g. `python -m aiosmtpd -n -l localhost:1025`.
+    """
+
+    def __init__(self, host, port=587, user=None, password=None, sender=None, recipients=(),
+                 starttls=True, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.sender = sender or user or "pipeline@localhost"
+        self.recipients = list(recipients)
+        self.starttls = starttls
+        self.timeout = timeout
+        self.connections = 0
+        self._server = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a sink from SMTP_HOST / SMTP_PORT / SMTP_USER / SMTP_PASS / ALERT_FROM / ALERT_TO.
+
+        The older names SMTP_SERVER, SMTP_PASSWORD and ALERT_EMAILS are
+        accepted too. Returns None when no host or recipient is set.
+        """
+        host = _env("SMTP_HOST", "SMTP_SERVER")
+        recipients = [r.strip() for r in _env("ALERT_TO", "ALERT_EMAILS", default="").split(",") if r.strip()]
+        if not host or not recipients:
+            return None
+        port = int(_env("SMTP_PORT", default=587))
+        return cls(
+            host, port,
+            user=_env("SMTP_USER"),
+            password=_env("SMTP_PASS", "SMTP_PASSWORD"),
+            sender=_env("ALERT_FROM"),
+            recipients=recipients,
+            starttls=_env("SMTP_STARTTLS", default="1" if port == 587 else "0") == "1",
+            timeout=float(_env("SMTP_TIMEOUT", default=10)),
+        )
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.user:
+            server.login(self.user, self.password)
+        self.connections += 1
+        return server
+
+    def _connection(self):
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except smtplib.SMTPException:
+                pass
+            self.close()
+        self._server = self._connect()
+        return self._server
+
+    def send(self, subject, body):
+        msg = MIMEText(body)
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = ", ".join(self.recipients)
+        try:
+            self._connection().sendmail(self.sender, self.recipients, msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._connection().sendmail(self.sender, self.recipients, msg.as_string())
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+def sink_from_env():
+    """The sink ALERT_SINK asks for: "console", "none", or SMTP when configured (the default)."""
+    kind = os.getenv("ALERT_SINK", "auto")
+    if kind == "none":
+        return None
+    if kind == "console":
+        return ConsoleSink()
+    sink = SmtpSink.from_env()
+    if sink is None:
+        print("No SMTP_HOST / ALERT_TO configured. Alerts go to the console.")
+        return ConsoleSink()
+    return sink
+
+
+class AlertDispatcher:
+    """Delivers alerts from a background thread so callers never wait on the sink.
+
+    `submit()` only enqueues. The worker collects alerts that arrive
+    within `batch_sec` of each other into one message, drops repeats of a
+    key already sent in the last `dedup_sec`, and sends at most
+    `max_per_hour` messages; what is over the limit is dropped with a log
+    line. Sent keys and send times are kept in `state_path` so manual
+    re-runs of a failing job do not repeat the same alert. `sink` is
+    anything with `send(subject, body)` and `close()`.
+    """
+
+    def __init__(self, sink, dedup_sec=DEDUP_SEC, max_per_hour=MAX_PER_HOUR, batch_sec=BATCH_SEC,
+                 state_path=ALERT_STATE_PATH):
+        self.sink = sink
+        self.dedup_sec = dedup_sec
+        self.max_per_hour = max_per_hour
+        self.batch_sec = batch_sec
+        self.state_path = state_path
+        self.sent = 0
+        self.deduplicated = 0
+        self.rate_limited = 0
+        self.failed = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._state = self._load_state()
+
+    def _load_state(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {"keys": {}, "sends": []}
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+            return {"keys": dict(state.get("keys", {})), "sends": list(state.get("sends", []))}
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable alert state {self.state_path}: {e}")
+            return {"keys": {}, "sends": []}
+
+    def _save_state(self):
+        if not self.state_path:
+            return
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self.state_path)
+
+    def submit(self, subject, body, key=None, severity="WARNING"):
+        """Queue an alert and return at once. `key` (default: the subject) identifies repeats."""
+        if self.sink is None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="alert-dispatcher", daemon=True)
+                self._thread.start()
+        self._queue.put(Alert(key or subject, subject, body, severity, time.time()))
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.batch_sec
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._deliver(batch)
+        self.sink.close()
+
+    def _deliver(self, batch):
+        now = time.time()
+        keys = self._state["keys"]
+        fresh = []
+        for alert in batch:
+            if now - keys.get(alert.key, -self.dedup_sec) < self.dedup_sec or alert.key in {a.key for a in fresh}:
+                self.deduplicated += 1
+                print(f"Alert suppressed as a repeat: {alert.subject}")
+            else:
+                fresh.append(alert)
+        if not fresh:
+            return
+
+        sends = [t for t in self._state["sends"] if now - t < 3600]
+        if len(sends) >= self.max_per_hour:
+            self.rate_limited += len(fresh)
+            print(f"Alert rate limit ({self.max_per_hour}/hour) reached; dropped {len(fresh)} alert(s)")
+            return
+
+        if len(fresh) == 1:
+            subject, body = fresh[0].subject, fresh[0].body
+        else:
+            subject = f"[Pipeline Alert] {len(fresh)} alerts: " + "; ".join(a.subject for a in fresh)
+            body = "\n\n----\n\n".join(f"{a.subject}\n\n{a.body}" for a in fresh)
+        try:
+            self.sink.send(subject, body)
+        except Exception as e:
+            self.failed += len(fresh)
+            print("Failed to send alert:", e)
+            return
+
+        self.sent += 1
+        for alert in fresh:
+            keys[alert.key] = now
+        self._state = {"keys": {k: t for k, t in keys.items() if now - t < self.dedup_sec},
+                       "sends": sends + [now]}
+        try:
+            self._save_state()
+        except OSError as e:
+            print("Failed to save alert state:", e)
+        print(f"Alert sent: {subject}")
+
+    def close(self, timeout=FLUSH_TIMEOUT):
+        """Deliver what is queued, waiting at most `timeout` seconds, and stop the worker."""
+        if self._thread is None:
+            return True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Alert delivery still running after {timeout}s; giving up on it")
+            return False
+        return True
@@ -7,7 +7,7 @@ Original file is located at
     https://colab.research.google.com/drive/1gt5jMLRWzkBnPntnzLU4MBPGzSZazo8W
 """
 
-!pip install -q pandas numpy matplotlib seaborn wordcloud vaderSentiment scikit-learn snowflake-connector-python
+!pip install -q pandas numpy matplotlib seaborn wordcloud vaderSentiment scikit-learn snowflake-connector-python pyarrow google-play-scraper
 
 import pandas as pd
 import numpy as np
@@ -19,7 +19,6 @@ from matplotlib import cm
 from matplotlib.ticker import ScalarFormatter, FuncFormatter
 from wordcloud import WordCloud, STOPWORDS
 from collections import Counter
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
@@ -35,11 +34,24 @@ conn = snowflake.connector.connect(
     role="ACCOUNTADMIN"
 )
 
-# Query the reviews table
-query = "SELECT * FROM reviews"
-df = pd.read_sql(query, conn)
+# App analysed below; reviews and the summaries hold every tracked app
+from ingest_pipeline import DEFAULT_APP_ID
+APP_ID = DEFAULT_APP_ID
+
+# Load the review columns used below through the local cache (review_cache.py):
+# the first run streams them as Arrow batches into review_cache/, later runs
+# only fetch reviews newer than the cached ones
+from review_cache import load_reviews
+df = load_reviews(conn, app_id=APP_ID)
 print(f"Loaded {len(df):,} rows with {len(df.columns)} columns from Snowflake.")
 
+# Monthly and per-version summaries maintained by review_update.py
+# (aggregates.py): a few hundred rows instead of the whole corpus
+monthly_stats = pd.read_sql("SELECT * FROM review_monthly_stats WHERE app_id = %s", conn, params=(APP_ID,))
+version_stats = pd.read_sql("SELECT * FROM review_version_stats WHERE app_id = %s", conn, params=(APP_ID,))
+monthly_stats.columns = monthly_stats.columns.str.upper()
+version_stats.columns = version_stats.columns.str.upper()
+
 # Query app metadata table
 # metadata_df = pd.read_sql("SELECT * FROM app_metadata", conn)
 # print(f"Loaded {len(metadata_df):,} rows from app_metadata.")
@@ -172,11 +184,16 @@ plt.show()
 Sentiment Score
 """
 
-# Initialize the sentiment analyzer
-sid = SentimentIntensityAnalyzer()
-
-# Apply sentiment analysis and extract compound score
-df["SENTIMENT"] = df["CONTENT"].apply(lambda x: sid.polarity_scores(x)["compound"])
+# Compound VADER score per review, stored in reviews.sentiment at ingest
+# (SENTIMENT_ENRICHMENT=1) or by `python sentiment.py backfill`. Rows without
+# one yet are scored here by sentiment.py, which scores each distinct text
+# once and keeps the results in review_cache/sentiment/
+from sentiment import SentimentEngine
+unscored = df["SENTIMENT"].isna() & df["CONTENT"].notna()
+if unscored.any():
+    engine = SentimentEngine()
+    df.loc[unscored, "SENTIMENT"] = engine.compound(df.loc[unscored, "CONTENT"])
+    print(engine.summary())
 
 # Calculate correlation between sentiment and score
 corr = df["SENTIMENT"].corr(df["SCORE"])
@@ -187,21 +204,20 @@ print(f"Pearson correlation (SENTIMENT vs SCORE): {corr:.4f}")
 # Convert CREATED_AT to datetime
 df["CREATED_AT"] = pd.to_datetime(df["CREATED_AT"], errors="coerce")
 
-# Extract year and month
-df["YEAR_MONTH"] = df["CREATED_AT"].dt.to_period("M")
-
-# Build full month range to ensure continuity
-all_months = pd.period_range(df["YEAR_MONTH"].min(), df["YEAR_MONTH"].max(), freq="M")
-
-# Group by month and compute mean score and mean sentiment
-monthly = (
-    df.groupby("YEAR_MONTH")
-      .agg(MEAN_SCORE=("SCORE", "mean"),
-           MEAN_SENT=("SENTIMENT", "mean"))
-      .reindex(all_months)
-      .reset_index()
-      .rename(columns={"index": "YEAR_MONTH"})
+# Monthly average rating from the monthly summary table,
+# over the full month range so gaps stay visible
+monthly_scores = (
+    monthly_stats.assign(YEAR_MONTH=pd.to_datetime(monthly_stats["MONTH"]).dt.to_period("M"))
+                 .groupby("YEAR_MONTH")[["SCORE_SUM", "SCORED_COUNT"]].sum()
 )
+all_months = pd.period_range(monthly_scores.index.min(), monthly_scores.index.max(), freq="M")
+monthly = monthly_scores.reindex(all_months)
+monthly["MEAN_SCORE"] = monthly["SCORE_SUM"] / monthly["SCORED_COUNT"]
+
+# Sentiment is not in the summaries (backfill fills it outside the MERGE),
+# so its monthly mean is the one column still grouped from the reviews
+monthly["MEAN_SENT"] = df.groupby(df["CREATED_AT"].dt.to_period("M"))["SENTIMENT"].mean()
+monthly = monthly.rename_axis("YEAR_MONTH").reset_index()
 
 # Convert month periods to string for plotting
 xm = monthly["YEAR_MONTH"].astype(str)
@@ -394,9 +410,10 @@ for i in range(top_n):
     right = f"{neg_top[i][0]:<15} {neg_top[i][1]:<6}" if i < len(neg_top) else ""
     print(f"{left:<30} | {right}")
 
-# Sentiment-based coloring
-analyzer = SentimentIntensityAnalyzer()
-word_sent = {w: analyzer.polarity_scores(w)["compound"] for w in set(freq_pos) | set(freq_neg)}
+# Sentiment-based coloring: compound score of each cloud word, all scored in one vectorised pass
+from vader_batch import BatchScorer
+cloud_words = sorted(set(freq_pos) | set(freq_neg))
+word_sent = dict(zip(cloud_words, BatchScorer().scores(cloud_words)["compound"]))
 
 
 def color_by_sentiment(word, font_size, position, orientation, random_state=None, **kwargs):
@@ -455,12 +472,10 @@ else:
 
 """Sarcastic / Misclassified Reviews by Month"""
 
-# Extract year and month
-df["YEAR_MONTH"] = df["CREATED_AT"].dt.to_period("M")
-sarcastic["YEAR_MONTH"] = sarcastic["CREATED_AT"].dt.to_period("M")
+# Extract year and month of the sarcastic reviews only
+sarcastic = sarcastic.assign(YEAR_MONTH=sarcastic["CREATED_AT"].dt.to_period("M"))
 
-# Define full month range
-all_months = pd.period_range(df["YEAR_MONTH"].min(), df["YEAR_MONTH"].max(), freq="M")
+# Full month range, from the monthly summary table (all_months above)
 
 # Count sarcastic reviews per month
 monthly_sarcasm = (
@@ -584,14 +599,20 @@ else:
 
 """Average Review Length Over Time"""
 
-if "WORD_COUNT" not in df.columns:
-    df["WORD_COUNT"] = df["CONTENT"].astype(str).apply(lambda x: len(x.split()))
-
-# Extract year-month
-df["YEAR_MONTH"] = df["CREATED_AT"].dt.to_period("M")
-
-# Compute average word count per month
-monthly_length = df.groupby("YEAR_MONTH")["WORD_COUNT"].mean()
+# Average word count per month, from the monthly summary table
+monthly_words = (
+    monthly_stats.assign(YEAR_MONTH=pd.to_datetime(monthly_stats["MONTH"]).dt.to_period("M"))
+                 .groupby("YEAR_MONTH")[["WORD_COUNT_SUM", "REVIEW_COUNT"]].sum()
+                 .sort_index()
+)
+# The summary counts a review without content as 0 words; the per-review
+# len(str(x).split()) counted its "None" as 1, so add those back to keep
+# the averages comparable with earlier runs of this notebook
+missing_content = df.loc[df["CONTENT"].isna(), "CREATED_AT"].dt.to_period("M").value_counts()
+monthly_length = (
+    (monthly_words["WORD_COUNT_SUM"] + missing_content.reindex(monthly_words.index, fill_value=0))
+    / monthly_words["REVIEW_COUNT"]
+)
 
 # Plot
 plt.figure(figsize=(10, 4))
@@ -612,14 +633,11 @@ Average Rating and Review Volume by Version
 # Average Rating and Review Volume by App Version
 
 version_df = (
-    df.groupby("APP_VERSION")
-      .agg(
-          REVIEW_COUNT=("REVIEW_ID", "count"),
-          AVG_SCORE=("SCORE", "mean")
-      )
-      .reset_index()
-      .dropna(subset=["APP_VERSION"])
+    version_stats.dropna(subset=["APP_VERSION"])
+                 .groupby("APP_VERSION")[["REVIEW_COUNT", "SCORE_SUM", "SCORED_COUNT"]].sum()
+                 .reset_index()
 )
+version_df["AVG_SCORE"] = version_df["SCORE_SUM"] / version_df["SCORED_COUNT"]
 
 # Define version sorting key
 import re
@@ -925,6 +943,9 @@ if {"USER_NAME", "SENTIMENT", "SCORE", "CONTENT", "CREATED_AT"}.issubset(df.colu
 
 # User Behavior Clustering
 
+if "WORD_COUNT" not in df.columns:
+    df["WORD_COUNT"] = df["CONTENT"].astype(str).apply(lambda x: len(x.split()))
+
 user_features = df.groupby("USER_NAME").agg(
     REVIEW_COUNT=("REVIEW_ID", "count"),
     AVG_SCORE=("SCORE", "mean"),
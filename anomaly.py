@@ -0,0 +1,233 @@
+# anomaly.py
+
+from collections import namedtuple
+import math
+import os
+
+
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS PIPELINE_ANOMALY_STATE (
+    TASK_NAME STRING,
+    METRIC STRING,
+    SEASON STRING,
+    N INT,
+    MEAN FLOAT,
+    VAR FLOAT,
+    LAST_VALUE FLOAT,
+    UPDATED_AT TIMESTAMP_NTZ
+)
+"""
+
+UPSERT_STATE_SQL = """
+MERGE INTO PIPELINE_ANOMALY_STATE AS target
+USING (
+    SELECT %s AS TASK_NAME, %s AS METRIC, %s AS SEASON,
+           %s AS N, %s AS MEAN, %s AS VAR, %s AS LAST_VALUE
+) AS source
+ON target.TASK_NAME = source.TASK_NAME AND target.METRIC = source.METRIC AND target.SEASON = source.SEASON
+WHEN MATCHED THEN UPDATE SET
+    N = source.N, MEAN = source.MEAN, VAR = source.VAR,
+    LAST_VALUE = source.LAST_VALUE, UPDATED_AT = CURRENT_TIMESTAMP
+WHEN NOT MATCHED THEN INSERT (TASK_NAME, METRIC, SEASON, N, MEAN, VAR, LAST_VALUE, UPDATED_AT)
+VALUES (source.TASK_NAME, source.METRIC, source.SEASON, source.N, source.MEAN, source.VAR,
+        source.LAST_VALUE, CURRENT_TIMESTAMP)
+"""
+
+HISTORY_SQL = """
+SELECT ROWS_LOADED, DURATION_SEC, DATE
+FROM PIPELINE_MONITORING
+WHERE STATUS = 'SUCCESS' AND ROWS_LOADED > 0 AND TASK_NAME = %s
+ORDER BY TIMESTAMP
+"""
+
+SEVERITIES = ("OK", "INFO", "WARNING", "CRITICAL")
+
+ALPHA = float(os.getenv("ANOMALY_ALPHA", 0.3))   # EWMA weight of the newest run
+MIN_HISTORY = 3        # runs before z-scores are trusted
+MIN_SEASON = 2         # same-month runs before the seasonal baseline is used
+MIN_STAGE_SEC = 1.0    # stages faster than this are never flagged
+CLIP_SD = 3.0          # outliers enter the baseline clipped to mean +/- CLIP_SD sd
+ALL = "all"            # season key of the all-time baseline
+
+# One finding: severity (see SEVERITIES), a code such as VOLUME_DROP, the
+# metric, its value and the baseline it was compared with
+Finding = namedtuple("Finding", ["severity", "code", "metric", "value", "expected", "detail"])
+
+
+class Baseline:
+    """EWMA mean and variance of one metric, updated in O(1) per run."""
+
+    __slots__ = ("n", "mean", "var", "last")
+
+    def __init__(self, n=0, mean=0.0, var=0.0, last=None):
+        self.n = n
+        self.mean = mean
+        self.var = var
+        self.last = last
+
+    def sd(self):
+        # Floors keep a very steady history from turning noise into huge z-scores
+        return max(math.sqrt(max(self.var, 0.0)), 0.1 * abs(self.mean), 1e-9)
+
+    def z(self, value):
+        return (value - self.mean) / self.sd()
+
+    def update(self, value):
+        if self.n >= MIN_HISTORY:
+            limit = CLIP_SD * self.sd()
+            value_in = min(max(value, self.mean - limit), self.mean + limit)
+        else:
+            value_in = value
+        if self.n == 0:
+            self.mean, self.var = float(value_in), 0.0
+        else:
+            diff = value_in - self.mean
+            incr = ALPHA * diff
+            self.mean += incr
+            self.var = (1 - ALPHA) * (self.var + diff * incr)
+        self.n += 1
+        self.last = float(value)
+
+
+def severity_rank(severity):
+    return SEVERITIES.index(severity)
+
+
+class AnomalyDetector:
+    """Flags unusual runs against rolling baselines kept in PIPELINE_ANOMALY_STATE.
+
+    Each metric (rows loaded, duration, seconds per stage) has an all-time
+    EWMA baseline and one per calendar month, so a month that is always
+    busy is compared with its own history once it has some. `check()`
+    compares a run with the baselines as they were before it, and
+    `update()` folds the run in. Only the state rows are read and written,
+    never the run history, except to seed an empty state table once.
+    """
+
+    def __init__(self, task_name="review_update", state=None):
+        self.task_name = task_name
+        self.state = state or {}
+        self._dirty = set()
+
+    @classmethod
+    def load(cls, cursor, task_name="review_update"):
+        cursor.execute(STATE_DDL)
+        cursor.execute(
+            "SELECT METRIC, SEASON, N, MEAN, VAR, LAST_VALUE FROM PIPELINE_ANOMALY_STATE WHERE TASK_NAME = %s",
+            (task_name,),
+        )
+        state = {(metric, season): Baseline(n, mean, var, last)
+                 for metric, season, n, mean, var, last in cursor.fetchall()}
+        detector = cls(task_name, state)
+        if not state:
+            detector.seed(cursor)
+        return detector
+
+    def seed(self, cursor):
+        """Build the baselines from past successful runs (only done while the state is empty)."""
+        try:
+            cursor.execute(HISTORY_SQL, (self.task_name,))
+            history = cursor.fetchall()
+        except Exception:
+            return  # no monitoring table yet
+        for rows_loaded, duration, run_date in history:
+            self.update({"rows_loaded": rows_loaded or 0, "duration_sec": duration or 0.0},
+                        run_date.month if run_date else None)
+
+    def baseline(self, metric, month):
+        """The baseline a value is judged against: seasonal when it has enough runs."""
+        seasonal = self.state.get((metric, f"{month:02d}")) if month else None
+        overall = self.state.get((metric, ALL))
+        if seasonal is not None and seasonal.n >= MIN_SEASON and overall is not None:
+            # Seasonal level, all-time spread (a month sees one run a year)
+            return Baseline(seasonal.n, seasonal.mean, overall.var, seasonal.last)
+        return overall
+
+    def check(self, metrics, month=None, success=True):
+        """Return the `Finding`s for one run's `metrics` ({name: value})."""
+        findings = []
+        rows = metrics.get("rows_loaded")
+        rows_base = self.baseline("rows_loaded", month)
+
+        if success and rows == 0:
+            if rows_base is not None and rows_base.mean >= 1:
+                findings.append(Finding("CRITICAL", "ZERO_ROWS", "rows_loaded", 0, rows_base.mean,
+                                        "run succeeded but loaded no rows"))
+            else:
+                findings.append(Finding("WARNING", "ZERO_ROWS", "rows_loaded", 0, None,
+                                        "run succeeded but loaded no rows"))
+        elif rows is not None and rows_base is not None and rows_base.mean >= 1:
+            ratio = rows / rows_base.mean
+            z = rows_base.z(rows)
+            if ratio < 0.2:
+                findings.append(Finding("CRITICAL", "VOLUME_DROP", "rows_loaded", rows, rows_base.mean,
+                                        f"{ratio:.0%} of expected"))
+            elif ratio < 0.5 or (rows_base.n >= MIN_HISTORY and z <= -3):
+                findings.append(Finding("WARNING", "VOLUME_DROP", "rows_loaded", rows, rows_base.mean,
+                                        f"{ratio:.0%} of expected, z={z:.1f}"))
+            elif rows_base.n >= MIN_HISTORY and z >= 4:
+                findings.append(Finding("INFO", "VOLUME_SPIKE", "rows_loaded", rows, rows_base.mean,
+                                        f"z={z:.1f}"))
+
+        for metric, value in metrics.items():
+            if metric == "rows_loaded" or value is None:
+                continue
+            base = self.baseline(metric, month)
+            if base is None or base.n < MIN_HISTORY:
+                continue
+            if metric != "duration_sec" and value < MIN_STAGE_SEC:
+                continue
+            z = base.z(value)
+            ratio = value / base.mean if base.mean > 0 else math.inf
+            if z >= 3 and ratio >= 1.25:
+                severe = metric == "duration_sec" and (z >= 6 or ratio >= 3)
+                findings.append(Finding("CRITICAL" if severe else "WARNING", "LATENCY_SPIKE", metric,
+                                        value, base.mean, f"{ratio:.1f}x expected, z={z:.1f}"))
+        return findings
+
+    def observe(self, metrics, month=None, success=True):
+        """check() a run, then update() the baselines with it if it succeeded.
+
+        A metric flagged WARNING or worse (a zero-row success, a volume drop,
+        a latency spike) is a defect rather than a data point, so it is left
+        out and the next runs are still judged against the normal level.
+        """
+        findings = self.check(metrics, month, success)
+        if success:
+            flagged = {f.metric for f in findings if severity_rank(f.severity) >= severity_rank("WARNING")}
+            self.update({m: v for m, v in metrics.items() if m not in flagged}, month)
+        return findings
+
+    def update(self, metrics, month=None):
+        """Fold one successful run into the all-time and monthly baselines."""
+        for metric, value in metrics.items():
+            if value is None:
+                continue
+            seasons = [ALL] + ([f"{month:02d}"] if month else [])
+            for season in seasons:
+                self.state.setdefault((metric, season), Baseline()).update(float(value))
+                self._dirty.add((metric, season))
+
+    def save(self, cursor):
+        """Write back the baselines changed since load()."""
+        rows = []
+        for metric, season in sorted(self._dirty):
+            b = self.state[(metric, season)]
+            rows.append((self.task_name, metric, season, b.n, b.mean, b.var, b.last))
+        for row in rows:
+            cursor.execute(UPSERT_STATE_SQL, row)
+        self._dirty.clear()
+
+
+def worst_severity(findings):
+    """Highest severity among `findings`, "OK" when there are none."""
+    return max((f.severity for f in findings), key=severity_rank, default="OK")
+
+
+def format_findings(findings):
+    """Compact one-line description of the findings, most severe first."""
+    parts = []
+    for f in sorted(findings, key=lambda f: -severity_rank(f.severity)):
+        expected = f" (expected ~{f.expected:,.6g})" if f.expected is not None else ""
+        parts.append(f"{f.severity}: {f.code} {f.metric}={f.value:,.6g}{expected} {f.detail}")
+    return "; ".join(parts)
@@ -0,0 +1,104 @@
+# benchmarks/bench_ingest.py
+#
+# End-to-end throughput of review_update.main() with no network and no
+# Snowflake: reviews come from fake_play.FakePlayStore and land in a
+# DuckDB file through the warehouse stand-in. Each size runs in a fresh
+# process and directory, first as an initial sync and then as an
+# incremental re-run with nothing new, and reports pages/sec, rows/sec,
+# peak RSS and the time spent in each pipeline stage (from spans.py).
+#
+#   python benchmarks/bench_ingest.py                        # 10k, 100k and 1M reviews
+#   python benchmarks/bench_ingest.py 50000 --latency 0.05 --error-rate 0.02
+#   python benchmarks/bench_ingest.py 100000 --load-mode insert
+#   python benchmarks/bench_ingest.py 100000 --profile        # cProfile + tracemalloc artifact
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+
+def run(n, load_mode, latency, error_rate, profile=False):
+    """Child process: sync `n` fake reviews into a fresh DuckDB file and print JSON results."""
+    work = tempfile.mkdtemp(prefix="bench_ingest_")
+    os.environ.update({
+        "WAREHOUSE_BACKEND": "duckdb",
+        "WAREHOUSE_PATH": os.path.join(work, "reviews.duckdb"),
+        "CHECKPOINT_DIR": os.path.join(work, "checkpoints"),
+        "KNOWN_IDS_PATH": os.path.join(work, "checkpoints", "known_ids.npz"),
+        "LANDING_DIR": os.path.join(work, "landing"),
+        "FETCH_RATE": "100000", "FETCH_BURST": "100000", "FETCH_MAX_RATE": "100000",
+        "FETCH_GLOBAL_RATE": "100000", "FETCH_GLOBAL_MAX_RATE": "100000",
+    })
+
+    import profiling
+    import review_update
+    import spans
+    from fake_play import FakePlayStore
+
+    store = FakePlayStore(total=n, latency=latency, error_rate=error_rate)
+    results = {}
+    for label in ("initial", "rerun"):
+        tracer = spans.start_run("bench_ingest")
+        calls = store.calls
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            with profiling.profiled(f"bench_ingest-{n}-{label}", enabled=profile) as prof:
+                rows = review_update.main(["com.example.bench"], load_mode=load_mode,
+                                          reviews_fn=store.reviews, app_fn=store.app)
+        results[label] = {
+            "seconds": time.perf_counter() - start,
+            "rows": rows,
+            "pages": store.calls - calls - 1,  # minus the app() call
+            "stages": {stage: t["seconds"] for stage, t in tracer.stages.items()},
+            "profile": prof.summary if prof else None,
+        }
+    results["errors"] = store.errors
+    results["peak_rss_mib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps(results))
+
+
+def report(n, result):
+    print(f"{n:>9,} reviews   peak RSS {result['peak_rss_mib']:,.0f} MiB   "
+          f"injected errors {result['errors']}")
+    for label in ("initial", "rerun"):
+        r = result[label]
+        secs = r["seconds"]
+        print(f"  {label:<8} {secs:7.2f}s  {r['pages'] / secs:8,.1f} pages/s  "
+              f"{r['rows'] / secs:10,.0f} rows/s  ({r['rows']:,} rows loaded)")
+        print("           " + "  ".join(f"{s} {t:.2f}s" for s, t in r["stages"].items()))
+        if r["profile"]:
+            print(f"           profile: {r['profile']}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(int(sys.argv[2]), sys.argv[3], float(sys.argv[4]), float(sys.argv[5]), sys.argv[6] == "1")
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--load-mode", default="parquet", choices=["insert", "parquet"])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per fake request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake requests that fail")
+    parser.add_argument("--profile", action="store_true", help="write a profiling artifact per run to PROFILE_DIR")
+    args = parser.parse_args()
+
+    print(f"load mode {args.load_mode}, latency {args.latency}s, error rate {args.error_rate:.0%}; "
+          f"stage times are summed wall time (fetch runs on worker threads)")
+    for n in args.sizes:
+        out = subprocess.run(
+            [sys.executable, __file__, "--run", str(n), args.load_mode, str(args.latency), str(args.error_rate),
+             "1" if args.profile else "0"],
+            check=True, capture_output=True, text=True, cwd=ROOT,
+        ).stdout
+        report(n, json.loads(out.strip().splitlines()[-1]))
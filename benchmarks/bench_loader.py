@@ -0,0 +1,54 @@
+# benchmarks/bench_loader.py
+#
+# Compares rows/sec of the two staging load modes against a local DuckDB
+# database standing in for Snowflake:
+#   insert  - executemany() with row-bound parameters
+#   parquet - compressed Parquet file + bulk read_parquet() load
+#
+#   python benchmarks/bench_loader.py            # 50k rows
+#   python benchmarks/bench_loader.py 500000
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import duckdb
+
+import loader
+from bench_transform import synthetic_rows
+
+STAGING_DDL = """
+CREATE OR REPLACE TABLE reviews_staging (
+    review_id VARCHAR,
+    user_name VARCHAR,
+    content VARCHAR,
+    score INTEGER,
+    created_at TIMESTAMP,
+    app_version VARCHAR,
+    app_id VARCHAR,
+    content_hash BIGINT
+)
+"""
+
+
+def bench(mode, rows, batch_size):
+    conn = duckdb.connect()
+    cursor = conn.cursor()
+    cursor.execute(STAGING_DDL)
+    start = time.perf_counter()
+    for i in range(0, len(rows), batch_size):
+        loader.stage(cursor, rows[i:i + batch_size], mode)
+    elapsed = time.perf_counter() - start
+    loaded = cursor.execute("SELECT COUNT(*) FROM reviews_staging").fetchone()[0]
+    conn.close()
+    return loaded, elapsed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    rows = synthetic_rows(n)
+    for mode in loader.LOAD_MODES:
+        loaded, elapsed = bench(mode, rows, batch_size=10_000)
+        print(f"{mode:>8}: {loaded:,} rows in {elapsed:6.2f}s -> {loaded / elapsed:12,.0f} rows/s")
@@ -0,0 +1,83 @@
+# benchmarks/bench_memory.py
+#
+# Peak RSS of a full sync's review buffer: the old review_sync.py approach
+# (every scraper dict kept in `buf`, then `pd.DataFrame(buf)`) against
+# transform.ReviewBuffer. Each variant runs in its own process so
+# ru_maxrss reflects only that variant.
+#
+#   python benchmarks/bench_memory.py            # 1M reviews
+#   python benchmarks/bench_memory.py 200000     # custom size
+
+import os
+import resource
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+PAGE = 200
+MODES = ("baseline", "dicts", "buffer")
+
+
+def scraper_pages(n):
+    """Yield pages of scraper-shaped dicts with freshly built strings, as a JSON parse would give."""
+    start = datetime(2025, 1, 1)
+    for first in range(0, n, PAGE):
+        page = []
+        for i in range(first, min(n, first + PAGE)):
+            page.append({
+                "reviewId": f"gp:AOqpTOH{i:024d}",
+                "userName": f"User {i % 50000}",
+                "userImage": f"https://play-lh.googleusercontent.com/a-/ALV-UjW{i % 50000:032d}",
+                "content": f"Review {i}: the app keeps logging me out after the latest update, please fix",
+                "score": (i % 5) + 1,
+                "thumbsUpCount": i % 7,
+                "reviewCreatedVersion": f"1.2025.{i % 50:03d}",
+                "at": start - timedelta(seconds=37 * i),
+                "replyContent": None,
+                "repliedAt": None,
+                "appVersion": f"1.2025.{i % 50:03d}",
+                "appId": "com.openai.chatgpt",
+            })
+        yield page
+
+
+def run(mode, n):
+    import pandas as pd
+    import transform
+
+    if mode == "dicts":
+        buf = []
+        for page in scraper_pages(n):
+            buf.extend(page)
+        df = pd.DataFrame(buf)
+    elif mode == "buffer":
+        buf = transform.ReviewBuffer()
+        for page in scraper_pages(n):
+            buf.extend(page)
+        df = buf.to_frame()
+    else:
+        df = pd.DataFrame()
+    assert len(df) == (0 if mode == "baseline" else n)
+    # Linux reports ru_maxrss in KiB
+    print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def peak_rss_mib(mode, n):
+    out = subprocess.run([sys.executable, __file__, "--run", mode, str(n)],
+                         check=True, capture_output=True, text=True).stdout
+    return int(out.split()[-1]) / 1024
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run(sys.argv[2], int(sys.argv[3]))
+        sys.exit(0)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    peaks = {mode: peak_rss_mib(mode, n) for mode in MODES}
+    base = peaks["baseline"]
+    print(f"{n:,} reviews (interpreter + pandas baseline {base:,.0f} MiB)")
+    for mode in MODES[1:]:
+        print(f"  {mode:<7} peak RSS {peaks[mode]:8,.0f} MiB  (+{peaks[mode] - base:,.0f} MiB)")
+    print(f"  buffer uses {(peaks['dicts'] - base) / (peaks['buffer'] - base):.1f}x less memory")
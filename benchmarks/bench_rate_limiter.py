@@ -0,0 +1,77 @@
+# benchmarks/bench_rate_limiter.py
+#
+# Compares the old fixed `time.sleep(0.2)` pacing against RateLimiter on a
+# fake scraper that answers in ~50 ms, throttles (429) above a hidden
+# request rate, and fails a few percent of calls at random.
+#
+#   python benchmarks/bench_rate_limiter.py
+
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from rate_limiter import RateLimiter
+
+PAGES = 200
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+class FakeScraper:
+    """Answers in `latency` seconds; raises 429-style errors above `max_rate`."""
+
+    def __init__(self, latency=0.05, max_rate=12.0, error_rate=0.03, seed=0):
+        self.latency = latency
+        self.max_rate = max_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def reviews(self, page):
+        now = time.monotonic()
+        with self.lock:
+            self.calls = [t for t in self.calls if now - t < 1.0] + [now]
+            throttled = len(self.calls) > self.max_rate
+            failed = self.random.random() < self.error_rate
+        time.sleep(self.latency)
+        if throttled:
+            raise TooManyRequests("429 Too Many Requests")
+        if failed:
+            raise TooManyRequests("503 Service Unavailable")
+        return [page] * 200
+
+
+def run_fixed_sleep(scraper):
+    start, pages = time.monotonic(), 0
+    try:
+        for page in range(PAGES):
+            scraper.reviews(page)
+            pages += 1
+            time.sleep(0.2)
+    except TooManyRequests as e:
+        print(f"  fixed sleep aborted after {pages} pages: {e}")
+    return pages, time.monotonic() - start
+
+
+def run_limiter(scraper):
+    limiter = RateLimiter(rate=5.0, burst=2, base_delay=0.05, max_delay=1.0, max_retries=8)
+    start = time.monotonic()
+    for page in range(PAGES):
+        limiter.call(scraper.reviews, page)
+    return PAGES, time.monotonic() - start, limiter
+
+
+if __name__ == "__main__":
+    pages, elapsed = run_fixed_sleep(FakeScraper())
+    print(f"fixed sleep(0.2): {pages} pages in {elapsed:.1f}s -> {pages / elapsed:.2f} pages/s")
+
+    pages, elapsed, limiter = run_limiter(FakeScraper())
+    print(f"RateLimiter:      {pages} pages in {elapsed:.1f}s -> {pages / elapsed:.2f} pages/s "
+          f"({limiter.retries} retries, final rate {limiter.rate:.1f}/s)")
@@ -0,0 +1,80 @@
+# benchmarks/bench_review_cache.py
+#
+# Times loading the reviews analysis.py needs from a local DuckDB database
+# standing in for Snowflake:
+#   read_sql - pd.read_sql("SELECT * FROM reviews ..."), the notebook's old path
+#   cold     - review_cache.load_reviews() with an empty cache
+#   warm     - the same call again, nothing new in the warehouse
+#   append   - after 1% new reviews arrive
+#
+#   python benchmarks/bench_review_cache.py            # 200k rows
+#   python benchmarks/bench_review_cache.py 1000000
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+
+from ingest_pipeline import DEFAULT_APP_ID, ensure_reviews_table
+import review_cache
+import warehouse
+
+# Synthetic reviews: short repeated texts, 5k users, 30 versions, 2 apps
+POPULATE_SQL = """
+INSERT INTO reviews (review_id, user_name, content, score, created_at, app_version, app_id, content_hash)
+SELECT 'id' || i, 'user' || (i % 5000), repeat('word ', (i % 40) + 1), (i % 5) + 1,
+       TIMESTAMP '2024-01-01' + to_seconds({offset} + i * 60), '1.' || (i % 30),
+       CASE WHEN i % 3 = 0 THEN 'com.example.a' ELSE 'com.openai.chatgpt' END, i
+FROM range({start}, {stop}) t(i)
+"""
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    workdir = tempfile.mkdtemp(prefix="bench_review_cache_")
+    os.environ["WAREHOUSE_BACKEND"] = "duckdb"
+    os.environ["WAREHOUSE_PATH"] = os.path.join(workdir, "warehouse.duckdb")
+    cache_dir = os.path.join(workdir, "review_cache")
+    try:
+        conn = warehouse.get_connection()
+        cursor = conn.cursor()
+        ensure_reviews_table(cursor)
+        cursor.execute(POPULATE_SQL.format(offset=0, start=0, stop=n))
+        conn.commit()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)  # pandas wants SQLAlchemy for non-sqlite DBAPI
+            df, elapsed = timed(lambda: pd.read_sql("SELECT * FROM reviews WHERE app_id = ?", conn._conn,
+                                                    params=(DEFAULT_APP_ID,)))
+        results = [("read_sql", len(df), elapsed, df.memory_usage(deep=True).sum())]
+        del df
+
+        for label in ("cold", "warm", "append"):
+            if label == "append":
+                cursor.execute(POPULATE_SQL.format(offset=n * 60, start=n, stop=n + n // 100))
+                conn.commit()
+            df, elapsed = timed(lambda: review_cache.load_reviews(conn, path=cache_dir))
+            results.append((label, len(df), elapsed, df.memory_usage(deep=True).sum()))
+            del df
+
+        size = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(cache_dir) for f in files)
+        print()
+        for label, rows, elapsed, memory in results:
+            print(f"{label:>8}: {rows:,} rows in {elapsed:6.2f}s -> {rows / elapsed:12,.0f} rows/s, "
+                  f"{memory / 1e6:8,.1f} MB in memory")
+        print(f"cache on disk: {size / 1e6:,.1f} MB")
+    finally:
+        warehouse.close()
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,85 @@
+# benchmarks/bench_sentiment.py
+#
+# Reviews/sec of sentiment scoring over a synthetic corpus where, as in the
+# Play Store, many reviews repeat a few short texts ("good", "nice"):
+#   apply  - df["CONTENT"].apply(sid.polarity_scores), analysis.py's old path
+#   cold   - SentimentEngine with an empty score store
+#   warm   - the same corpus again
+#   append - the corpus plus 1% new reviews
+#
+#   python benchmarks/bench_sentiment.py                  # 100k and 1M reviews
+#   python benchmarks/bench_sentiment.py 50000 --workers 4
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from fake_play import CONTENT
+from sentiment import SentimentEngine
+
+SHORT = ["good", "nice", "great", "Good", "Nice app", "excellent", "ok", "bad", "love it", "very good",
+         "awesome", "Best app", "useless", "amazing", "helpful"]
+WORDS = ("the app is really not very good bad great slow fast helpful useless love hate update answers "
+         "crash login voice free limit accurate wrong amazing terrible okay but and so too").split()
+DUPLICATE_SHARE = 0.4   # reviews drawn from SHORT and fake_play.CONTENT
+
+
+def corpus(n, seed=0, start=0):
+    rng = random.Random(seed)
+    common = SHORT + CONTENT
+    texts = []
+    for i in range(start, start + n):
+        if rng.random() < DUPLICATE_SHARE:
+            texts.append(rng.choice(common))
+        else:
+            words = rng.choices(WORDS, k=rng.randint(3, 25))
+            texts.append(" ".join(words) + f" #{i}")
+    return pd.Series(texts, dtype=object)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench(n, workers, baseline=True):
+    texts = corpus(n)
+    results = []
+    if baseline:
+        sid = SentimentIntensityAnalyzer()
+        results.append(("apply", n, timed(lambda: texts.apply(lambda x: sid.polarity_scores(x)["compound"]))))
+
+    store = tempfile.mkdtemp(prefix="bench_sentiment_")
+    try:
+        for label in ("cold", "warm", "append"):
+            batch = texts if label != "append" else pd.concat([texts, corpus(n // 100, seed=1, start=n)],
+                                                            ignore_index=True)
+            engine = SentimentEngine(store, workers=workers)
+            results.append((label, len(batch), timed(lambda: engine.compound(batch))))
+            print(f"  {label}: {engine.summary()}")
+    finally:
+        shutil.rmtree(store, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--workers", type=int, default=None, help="process pool size (default: all CPUs)")
+    parser.add_argument("--no-baseline", action="store_true", help="skip the single-threaded apply() run")
+    args = parser.parse_args()
+    print(f"CPUs: {os.cpu_count()}")
+    for n in args.sizes:
+        print(f"\n{n:,} reviews")
+        for label, rows, elapsed in bench(n, args.workers, baseline=not args.no_baseline):
+            print(f"{label:>8}: {rows:,} texts in {elapsed:7.2f}s -> {rows / elapsed:12,.0f} reviews/s")
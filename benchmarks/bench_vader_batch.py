@@ -0,0 +1,118 @@
+# benchmarks/bench_vader_batch.py
+#
+# vader_batch.BatchScorer against SentimentIntensityAnalyzer.polarity_scores:
+#   agreement  - largest difference per score on a corpus built to exercise
+#                every VADER rule (boosters, negations, ALL CAPS, "no",
+#                "least", "but", idioms, emoticons, emoji, punctuation),
+#                checked against vader_batch.TOLERANCE
+#   throughput - texts/sec of a polarity_scores loop and of BatchScorer on
+#                short, mostly distinct reviews
+#
+#   python benchmarks/bench_vader_batch.py                  # 100k and 1M reviews
+#   python benchmarks/bench_vader_batch.py 50000 --agreement 100000
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pandas as pd
+from vaderSentiment.vaderSentiment import BOOSTER_DICT, NEGATE, SPECIAL_CASES, SentimentIntensityAnalyzer
+
+from fake_play import CONTENT
+from sentiment import SCORES
+from vader_batch import TOLERANCE, BatchScorer
+
+EXAMPLES = [
+    "VADER is smart, handsome, and funny.", "VADER is VERY SMART, uber handsome, and FRIGGIN FUNNY!!!",
+    "VADER is not smart, handsome, nor funny.", "At least it isn't a horrible book.",
+    "The book was only kind of good.", "Today only kinda sux! But I'll get by, lol",
+    "Make sure you :) or :D today!", "Catch utf-8 emoji such as 💘 and 💋 and 😁", "Not bad at all",
+    "Sentiment analysis has never been this good!", "On the other hand, VADER is quite bad ass",
+    "Without a doubt, excellent idea.", "Roger Dodger is one of the least compelling variations on this theme.",
+    "Roger Dodger is at least compelling as a variation on the theme.", "a😁good", "", "   ", "!!!", "why??",
+]
+RULE_WORDS = "no least at very never so this without doubt or nor but kind of sort just enough the app is it".split()
+MARKS = ["", ".", "!", "!!", "!!!!!", "??", "???", "?!?!?"]
+SHORT = ["good", "nice", "great", "Good", "Nice app", "excellent", "ok", "bad", "love it", "very good",
+         "awesome", "Best app", "useless", "amazing", "helpful", "not good", "GREAT app", "so bad!!"]
+
+
+def rule_corpus(n, seed=0):
+    """Texts dense in lexicon words and the words VADER's rules look for."""
+    rng = random.Random(seed)
+    lexicon = list(SentimentIntensityAnalyzer().lexicon)
+    pool = (rng.sample(lexicon, 500) + list(BOOSTER_DICT) + list(NEGATE) + RULE_WORDS
+            + [w for phrase in SPECIAL_CASES for w in phrase.split()]
+            + [":)", ":(", "<3", ":D", "GOOD", "BAD", "VERY", "NOT", "Great!", "bad,", "😁", "💘", "(great)"])
+    texts = EXAMPLES + CONTENT
+    for _ in range(n):
+        texts.append(" ".join(rng.choices(pool, k=rng.randint(1, 20))) + rng.choice(MARKS))
+    return texts
+
+
+def review_corpus(n, seed=0):
+    """Short reviews: 2-15 words of app-review vocabulary, a fifth of them with a number (versions, prices)."""
+    rng = random.Random(seed)
+    words = ("the app is really not very good bad great slow fast helpful useless love hate update answers "
+             "crash login voice free limit accurate wrong amazing terrible okay but and so too").split()
+    texts = []
+    for _ in range(n):
+        text = " ".join(rng.choices(words, k=rng.randint(2, 15))) + rng.choice(MARKS)
+        if rng.random() < 0.2:
+            text += f" {rng.randint(0, 100_000)}"
+        texts.append(rng.choice(SHORT) if rng.random() < 0.2 else text)
+    return texts
+
+
+def agreement(n):
+    texts = rule_corpus(n)
+    sid = SentimentIntensityAnalyzer()
+    expected = pd.DataFrame([sid.polarity_scores(t) for t in texts])[list(SCORES)]
+    got = BatchScorer(sid).scores(texts)
+    ok = True
+    print(f"agreement on {len(texts):,} texts:")
+    for name in SCORES:
+        diff = (got[name] - expected[name]).abs()
+        over = int((diff > TOLERANCE[name] + 1e-9).sum())
+        ok &= over == 0
+        print(f"  {name:>8}: max |diff| {diff.max():.1e} (tolerance {TOLERANCE[name]:.0e}), "
+              f"{int((diff > 1e-12).sum()):,} differ, {over:,} over tolerance")
+    return ok
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def throughput(n, baseline=True):
+    texts = review_corpus(n)
+    results = []
+    if baseline:
+        sid = SentimentIntensityAnalyzer()
+        results.append(("loop", timed(lambda: [sid.polarity_scores(t) for t in texts])))
+    scorer = BatchScorer()
+    results.append(("batch", timed(lambda: scorer.scores(texts))))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("sizes", nargs="*", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--agreement", type=int, default=50_000, help="rule-corpus size for the agreement check")
+    parser.add_argument("--no-baseline", action="store_true", help="skip the polarity_scores loop")
+    args = parser.parse_args()
+    within = agreement(args.agreement)
+    for n in args.sizes:
+        print(f"\n{n:,} reviews")
+        results = throughput(n, baseline=not args.no_baseline)
+        for label, elapsed in results:
+            print(f"{label:>8}: {n / elapsed:12,.0f} texts/s ({elapsed:.2f}s)")
+        if len(results) == 2:
+            print(f" speedup: {results[0][1] / results[1][1]:.1f}x")
+    sys.exit(0 if within else 1)
@@ -0,0 +1,108 @@
+# checkpoint.py
+
+from datetime import datetime, timezone
+import json
+import os
+
+try:
+    from google_play_scraper.features.reviews import _ContinuationToken
+except ImportError:  # private to the scraper; gone or moved in other versions
+    _ContinuationToken = None
+
+
+CHECKPOINT_DIR = os.getenv("CHECKPOINT_DIR", ".checkpoints")
+
+_TOKEN_FIELDS = (
+    "token", "lang", "country", "sort", "count",
+    "filter_score_with", "filter_device_with",
+)
+
+
+def checkpoint_path(name):
+    """Return the file that holds the checkpoint called `name`."""
+    safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return os.path.join(CHECKPOINT_DIR, f"{safe}.json")
+
+
+def serialize_token(token):
+    """Convert a Google Play continuation token into a JSON-safe dict."""
+    if token is None:
+        return None
+    return {field: getattr(token, field, None) for field in _TOKEN_FIELDS}
+
+
+def deserialize_token(data):
+    """Rebuild a continuation token saved by serialize_token().
+
+    Raises ValueError when it cannot be rebuilt with the installed scraper.
+    """
+    if not data:
+        return None
+    if _ContinuationToken is None:
+        raise ValueError("this google-play-scraper has no _ContinuationToken")
+    try:
+        return _ContinuationToken(*(data.get(field) for field in _TOKEN_FIELDS))
+    except (AttributeError, TypeError) as e:
+        raise ValueError(f"saved token does not fit this google-play-scraper: {e}") from e
+
+
+def load_checkpoint(name):
+    """Return the saved state for `name`, or None when there is nothing to resume."""
+    path = checkpoint_path(name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return None
+
+
+def resume_checkpoint(name):
+    """Return `(state, token)` to resume `name` from, or `(None, None)` to start over.
+
+    A checkpoint whose continuation token cannot be rebuilt is logged and
+    cleared, so the caller restarts from its watermark instead of failing.
+    """
+    state = load_checkpoint(name)
+    if not state:
+        return None, None
+    try:
+        return state, deserialize_token(state.get("token"))
+    except ValueError as e:
+        print(f"Cannot resume {name} ({e}); clearing its checkpoint and restarting from the watermark.")
+        clear_checkpoint(name)
+        return None, None
+
+
+def save_checkpoint(name, token, pages_fetched, pages_uploaded, rows_uploaded, since=None, newest=None):
+    """Record the last committed page so an interrupted run can resume after it.
+
+    The file is written to a temporary path and renamed into place, so a crash
+    mid-write leaves the previous checkpoint intact.
+    """
+    state = {
+        "token": serialize_token(token),
+        "pages_fetched": pages_fetched,
+        "pages_uploaded": pages_uploaded,
+        "rows_uploaded": rows_uploaded,
+        "since": since.isoformat() if since is not None else None,
+        "newest": newest.isoformat() if newest is not None else None,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = checkpoint_path(name)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+    return state
+
+
+def clear_checkpoint(name):
+    """Remove the checkpoint for `name` once a run has finished cleanly."""
+    try:
+        os.remove(checkpoint_path(name))
+    except FileNotFoundError:
+        pass
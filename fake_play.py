@@ -0,0 +1,117 @@
+# fake_play.py
+
+from google_play_scraper import Sort
+from google_play_scraper.features.reviews import _ContinuationToken
+from datetime import datetime, timedelta
+import random
+import threading
+import time
+
+
+CONTENT = [
+    "Great app, very helpful for work and study.",
+    "It keeps logging me out after the latest update.",
+    "Voice mode is amazing but drains the battery.",
+    "Answers are fast and mostly accurate.",
+    "Crashes every time I open an old chat, please fix.",
+    "Useful, but the free tier limits are frustrating.",
+    "Best AI assistant I have tried so far!",
+    "Too many errors lately, not worth it anymore.",
+]
+
+
+class FakePlayError(Exception):
+    """Transient failure injected by FakePlayStore (stands in for 429/5xx responses)."""
+
+
+class FakePlayStore:
+    """Deterministic offline stand-in for google_play_scraper's `reviews()` and `app()`.
+
+    Each (app, lang) has `total` synthetic reviews, newest first, spaced
+    evenly over `span` back from `now`; storefronts of the same language
+    share their reviews, as on Google Play. Paging follows the scraper's
+    contract: `reviews()` returns `(rows, token)` and the last page carries a
+    token whose `.token` is None. Every call sleeps `latency` seconds and
+    fails with `FakePlayError` at `error_rate`, drawn from a seeded RNG, so
+    a run is reproducible. Safe to call from several threads.
+    """
+
+    def __init__(self, total=10_000, span=timedelta(days=25), now=None,
+                 latency=0.0, error_rate=0.0, seed=0, versions=20):
+        self.total = total
+        self.now = (now or datetime.utcnow()).replace(microsecond=0)
+        self.step = span / max(1, total)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.versions = [f"1.2025.{v:03d}" for v in range(versions)]
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+            failed = self.error_rate and self._random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise FakePlayError("503 Service Unavailable (injected)")
+
+    def review(self, app_id, lang, i):
+        """The i-th newest review of `app_id` in `lang`, as the scraper returns it."""
+        version = self.versions[(i // 500) % len(self.versions)]
+        return {
+            "reviewId": f"gp:{app_id}:{lang}:{i:09d}",
+            "userName": f"User {i % 9973}",
+            "userImage": "https://play-lh.googleusercontent.com/a/default-user",
+            "content": CONTENT[(i * 2654435761) % len(CONTENT)],
+            "score": 1 + (i * 7) % 5,
+            "thumbsUpCount": i % 11,
+            "reviewCreatedVersion": version,
+            "at": self.now - self.step * i,
+            "replyContent": None,
+            "repliedAt": None,
+            "appVersion": version if i % 13 else None,
+        }
+
+    def reviews(self, app_id, lang="en", country="us", sort=Sort.NEWEST, count=100,
+                filter_score_with=None, filter_device_with=None, continuation_token=None):
+        """Drop-in for `google_play_scraper.reviews`."""
+        if continuation_token is not None:
+            offset = int(continuation_token.token)
+            lang, country = continuation_token.lang, continuation_token.country
+            sort, count = continuation_token.sort, continuation_token.count
+        else:
+            offset = 0
+        self._call()
+        end = min(self.total, offset + count)
+        rows = [self.review(app_id, lang, i) for i in range(offset, end)]
+        token = str(end) if end < self.total else None
+        return rows, _ContinuationToken(token, lang, country, sort, count,
+                                        filter_score_with, filter_device_with)
+
+    def app(self, app_id, lang="en", country="us"):
+        """Drop-in for `google_play_scraper.app`."""
+        self._call()
+        return {
+            "appId": app_id,
+            "title": f"Fake {app_id}",
+            "version": self.versions[0],
+            "developer": "Fake Developer",
+            "genre": "Productivity",
+            "score": 4.5,
+            "ratings": self.total * 4,
+            "reviews": self.total,
+            "installs": "10,000,000+",
+            "realInstalls": self.total * 100,
+            "free": True,
+            "price": 0,
+            "currency": "USD",
+            "sale": False,
+            "offersIAP": True,
+            "inAppProductPrice": "$0.99 - $199.99 per item",
+            "url": f"https://play.google.com/store/apps/details?id={app_id}",
+        }
@@ -0,0 +1,326 @@
+# harvester.py
+
+from google_play_scraper import reviews
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import heapq
+import json
+import os
+import queue
+import threading
+
+from ingest_pipeline import DEFAULT_APP_ID, QUEUE_PAGES, fetch_pages
+from rate_limiter import RateLimiter
+
+
+# One storefront of one app; every shard pages and watermarks independently
+Shard = namedtuple("Shard", ["app_id", "lang", "country"])
+
+# Persisted ingest state of one shard: the newest review timestamp loaded and
+# the {review_id: timestamp} of reviews loaded inside the overlap window
+Watermark = namedtuple("Watermark", ["last_at", "recent"])
+
+# Reviews this far behind the watermark are re-checked against the recent ids
+WATERMARK_OVERLAP = timedelta(minutes=int(os.getenv("WATERMARK_OVERLAP_MINUTES", 60)))
+RECENT_ID_LIMIT = int(os.getenv("RECENT_ID_LIMIT", 5000))  # newest ids kept per shard
+
+WATERMARKS_DDL = """
+CREATE TABLE IF NOT EXISTS REVIEW_WATERMARKS (
+    APP_ID STRING,
+    LANG STRING,
+    COUNTRY STRING,
+    LAST_REVIEW_AT TIMESTAMP,
+    RECENT_IDS STRING,
+    UPDATED_AT TIMESTAMP
+)
+"""
+
+WATERMARKS_MIGRATIONS = [
+    "ALTER TABLE REVIEW_WATERMARKS ADD COLUMN IF NOT EXISTS RECENT_IDS STRING",
+]
+
+UPSERT_WATERMARK_SQL = """
+MERGE INTO REVIEW_WATERMARKS AS target
+USING (
+    SELECT %s AS APP_ID, %s AS LANG, %s AS COUNTRY,
+           %s::TIMESTAMP AS LAST_REVIEW_AT, %s AS RECENT_IDS
+) AS source
+ON target.APP_ID = source.APP_ID AND target.LANG = source.LANG AND target.COUNTRY = source.COUNTRY
+WHEN MATCHED THEN UPDATE SET
+    LAST_REVIEW_AT = GREATEST(target.LAST_REVIEW_AT, source.LAST_REVIEW_AT),
+    RECENT_IDS = source.RECENT_IDS,
+    UPDATED_AT = CURRENT_TIMESTAMP
+WHEN NOT MATCHED THEN INSERT (APP_ID, LANG, COUNTRY, LAST_REVIEW_AT, RECENT_IDS, UPDATED_AT)
+VALUES (source.APP_ID, source.LANG, source.COUNTRY, source.LAST_REVIEW_AT, source.RECENT_IDS, CURRENT_TIMESTAMP)
+"""
+
+_DONE = object()
+
+# Queued by a shard's worker after its last page
+_ShardDone = namedtuple("_ShardDone", ["shard"])
+
+
+def parse_locales(spec):
+    """Parse a REVIEW_LOCALES string such as "en:us,en:gb,de:de" into (lang, country) pairs."""
+    locales = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        lang, _, country = item.partition(":")
+        locales.append((lang.strip().lower(), (country or lang).strip().lower()))
+    return locales
+
+
+def locales_from_env():
+    """Return the storefronts to harvest, from REVIEW_LOCALES (default en:us)."""
+    return parse_locales(os.getenv("REVIEW_LOCALES", "en:us"))
+
+
+def apps_from_env():
+    """Return the app ids to ingest, from APP_IDS (default: the ChatGPT app)."""
+    return [a.strip() for a in os.getenv("APP_IDS", DEFAULT_APP_ID).split(",") if a.strip()]
+
+
+def build_shards(app_ids, locales):
+    """Cross every app with every (lang, country) storefront."""
+    return [Shard(app_id, lang, country) for app_id in app_ids for lang, country in locales]
+
+
+def shard_key(shard):
+    """Stable name for a shard, used for checkpoints and log lines."""
+    return f"{shard.app_id}_{shard.lang}_{shard.country}"
+
+
+def encode_recent(recent):
+    """Serialise {review_id: timestamp} as the JSON stored in RECENT_IDS."""
+    return json.dumps([[review_id, at.isoformat()] for review_id, at in recent.items()])
+
+
+def decode_recent(text):
+    """Parse a RECENT_IDS value back into {review_id: timestamp}."""
+    if not text:
+        return {}
+    return {review_id: datetime.fromisoformat(at) for review_id, at in json.loads(text)}
+
+
+def load_watermarks(cursor, shards, default):
+    """Return {shard: Watermark} from REVIEW_WATERMARKS.
+
+    Only shards with no stored row call `default(shard)` for their starting
+    timestamp, so the cost of a run's startup does not grow with `reviews`.
+    """
+    cursor.execute(WATERMARKS_DDL)
+    for sql in WATERMARKS_MIGRATIONS:
+        cursor.execute(sql)
+    cursor.execute("SELECT APP_ID, LANG, COUNTRY, LAST_REVIEW_AT, RECENT_IDS FROM REVIEW_WATERMARKS")
+    saved = {Shard(*row[:3]): Watermark(row[3], decode_recent(row[4])) for row in cursor.fetchall()}
+    watermarks = {}
+    for shard in shards:
+        watermark = saved.get(shard)
+        if watermark is None or watermark.last_at is None:
+            watermark = Watermark(default(shard), {})
+        watermarks[shard] = watermark
+    return watermarks
+
+
+def save_watermarks(cursor, watermarks):
+    """Advance the stored watermark of each shard; never moves one backwards."""
+    for shard, watermark in watermarks.items():
+        if watermark.last_at is None:
+            continue
+        cursor.execute(UPSERT_WATERMARK_SQL, (
+            shard.app_id, shard.lang, shard.country,
+            watermark.last_at.strftime("%Y-%m-%d %H:%M:%S.%f"),
+            encode_recent(watermark.recent),
+        ))
+
+
+class SeenIds:
+    """`review_id`s already yielded for one app that another of its shards may still fetch.
+
+    Shards page newest first, so once every unfinished shard of the app has
+    yielded a page older than a review, none can fetch that review again and
+    its id is forgotten. The set holds the spread between the fastest and
+    the slowest shard, not every review of the run.
+    """
+
+    def __init__(self, shards):
+        # Oldest review timestamp yielded per unfinished shard; None before its first page
+        self.frontier = {shard: None for shard in shards}
+        self.ids = set()
+        self._newest = []  # heap of (-timestamp, review_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add_page(self, shard, rows):
+        """Return the rows of a page not yielded before and remember them."""
+        fresh = []
+        for r in rows:
+            if r["reviewId"] in self.ids:
+                continue
+            self.ids.add(r["reviewId"])
+            heapq.heappush(self._newest, (-r["at"].timestamp(), r["reviewId"]))
+            fresh.append(r)
+        if rows:
+            oldest = min(r["at"] for r in rows)
+            if self.frontier[shard] is None or oldest < self.frontier[shard]:
+                self.frontier[shard] = oldest
+            self._forget()
+        return fresh
+
+    def finish(self, shard):
+        """A shard yields no more pages; it no longer holds ids back."""
+        self.frontier.pop(shard, None)
+        self._forget()
+
+    def _forget(self):
+        if any(at is None for at in self.frontier.values()):
+            return
+        if not self.frontier:
+            self.ids.clear()
+            self._newest.clear()
+            return
+        # Every unfinished shard has paged past reviews newer than this
+        bound = -max(self.frontier.values()).timestamp()
+        while self._newest and self._newest[0][0] < bound:
+            _, review_id = heapq.heappop(self._newest)
+            self.ids.discard(review_id)
+
+
+class Harvester:
+    """Fetch several shards concurrently and merge them into one page stream.
+
+    Each shard runs `fetch_pages` on its own worker thread with its own
+    watermark and rate limiter; when `budget` is given every shard limiter
+    draws from it too, so all apps and storefronts share one global request
+    rate and a run costs about as long as its slowest shard. Pages are funnelled through one bounded queue
+    and `review_id`s already seen from another shard are dropped (`SeenIds`),
+    so each review reaches staging once. `known` maps each shard to the review ids
+    already loaded inside its overlap window, which `fetch_pages` skips and
+    uses to stop paging early; `known_filter` is shared by every shard to
+    drop reviews already merged. After `pages()` is exhausted, `watermarks`
+    holds the newest review timestamp fetched per shard, `completed` the
+    shards that paged through to the end, and `errors` any shard failures.
+    """
+
+    def __init__(self, shards, since, workers=None, start=None, reviews_fn=reviews,
+                 limiter_factory=RateLimiter.from_env, budget=None, max_pages=QUEUE_PAGES,
+                 known=None, overlap=WATERMARK_OVERLAP, known_filter=None):
+        self.shards = list(shards)
+        self.since = since
+        self.known = known or {}
+        self.overlap = overlap
+        self.known_filter = known_filter
+        self.workers = workers or len(self.shards)
+        self.start = start or {}
+        self.reviews_fn = reviews_fn
+        self.limiter_factory = limiter_factory
+        self.budget = budget
+        self.max_pages = max_pages
+        self.watermarks = {shard: None for shard in self.shards}
+        self._recent = {shard: [(at, review_id) for review_id, at in self.known.get(shard, {}).items()]
+                        for shard in self.shards}
+        self.completed = set()
+        self.errors = {}
+        self.duplicates = 0
+
+    def _fetch_shard(self, shard, q, stop):
+        token, page_no = self.start.get(shard, (None, 0))
+        pages = fetch_pages(
+            shard.app_id, shard.lang, shard.country, since=self.since.get(shard),
+            reviews_fn=self.reviews_fn, start_token=token, start_page=page_no,
+            limiter=self.limiter_factory(parent=self.budget), shard=shard,
+            known_ids=self.known.get(shard), overlap=self.overlap, known_filter=self.known_filter,
+        )
+        recent = self._recent[shard]
+        heapq.heapify(recent)
+        try:
+            for page in pages:
+                newest = max(r["at"] for r in page.rows)
+                if self.watermarks[shard] is None or newest > self.watermarks[shard]:
+                    self.watermarks[shard] = newest
+                # Keep only the newest RECENT_ID_LIMIT ids of this shard
+                for r in page.rows:
+                    heapq.heappush(recent, (r["at"], r["reviewId"]))
+                    if len(recent) > RECENT_ID_LIMIT:
+                        heapq.heappop(recent)
+                if not self._put(q, page, stop):
+                    return
+            self.completed.add(shard)
+        except Exception as e:
+            print(f"Shard {shard_key(shard)} failed: {e}")
+            self.errors[shard] = e
+        finally:
+            pages.close()
+            self._put(q, _ShardDone(shard), stop)
+
+    @staticmethod
+    def _put(q, item, stop):
+        """Queue `item` unless the consumer stops first; returns whether it was queued."""
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pages(self):
+        """Yield deduplicated pages from every shard as they arrive.
+
+        Raises the first shard error once all other shards have finished.
+        """
+        q = queue.Queue(maxsize=self.max_pages)
+        stop = threading.Event()
+        seen = {app_id: SeenIds([s for s in self.shards if s.app_id == app_id])
+                for app_id in {shard.app_id for shard in self.shards}}
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="harvest")
+        futures = [pool.submit(self._fetch_shard, shard, q, stop) for shard in self.shards]
+
+        def signal_done():
+            for future in futures:
+                future.exception()
+            self._put(q, _DONE, stop)
+
+        threading.Thread(target=signal_done, name="harvest-done", daemon=True).start()
+        try:
+            while True:
+                page = q.get()
+                if page is _DONE:
+                    break
+                if isinstance(page, _ShardDone):
+                    seen[page.shard.app_id].finish(page.shard)
+                    continue
+                rows = seen[page.shard.app_id].add_page(page.shard, page.rows)
+                self.duplicates += len(page.rows) - len(rows)
+                yield page._replace(rows=rows)
+        finally:
+            stop.set()
+            while any(not future.done() for future in futures):
+                try:
+                    q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            pool.shutdown(wait=True)
+
+        if self.errors:
+            raise next(iter(self.errors.values()))
+
+    def finished_watermarks(self):
+        """`Watermark`s of the shards that completed, safe to persist.
+
+        A shard that found nothing new keeps its starting timestamp, so a
+        bootstrapped watermark is stored after its first run.
+        """
+        finished = {}
+        for shard in self.completed:
+            last_at = self.watermarks[shard] or self.since.get(shard)
+            if last_at is None:
+                continue
+            floor = last_at - self.overlap
+            recent = {review_id: at for at, review_id in self._recent[shard] if at >= floor}
+            finished[shard] = Watermark(last_at, recent)
+        return finished
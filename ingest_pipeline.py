@@ -0,0 +1,295 @@
+# ingest_pipeline.py
+
+from google_play_scraper import reviews, Sort
+from collections import namedtuple
+from datetime import timedelta
+import queue
+import threading
+
+import loader
+from rate_limiter import RateLimiter
+import spans
+from transform import ReviewBuffer
+
+
+PAGE_SIZE = 200          # reviews requested per Google Play page
+QUEUE_PAGES = 8          # pages buffered between the fetch and upload stages
+MICRO_BATCH_SIZE = 10000 # rows staged and merged per batch
+
+DEFAULT_APP_ID = "com.openai.chatgpt"
+
+REVIEWS_DDL = """
+CREATE TABLE IF NOT EXISTS reviews (
+    review_id STRING PRIMARY KEY,
+    user_name STRING,
+    content TEXT,
+    score INT,
+    created_at TIMESTAMP,
+    app_version STRING,
+    app_id STRING,
+    content_hash BIGINT,
+    sentiment DOUBLE
+)
+CLUSTER BY (app_id)
+"""
+
+# Upgrades a reviews table created before it held more than one app; rows
+# that predate the app_id column all belong to the ChatGPT app
+REVIEWS_MIGRATIONS = [
+    f"ALTER TABLE reviews ADD COLUMN IF NOT EXISTS app_id STRING DEFAULT '{DEFAULT_APP_ID}'",
+    "ALTER TABLE reviews CLUSTER BY (app_id)",
+    # Rows written before fingerprints existed get one during their next MERGE
+    "ALTER TABLE reviews ADD COLUMN IF NOT EXISTS content_hash BIGINT",
+    # VADER compound score, filled at ingest (SENTIMENT_ENRICHMENT=1) or by
+    # `python sentiment.py backfill`
+    "ALTER TABLE reviews ADD COLUMN IF NOT EXISTS sentiment DOUBLE",
+]
+
+STAGING_DDL = "CREATE OR REPLACE TEMPORARY TABLE reviews_staging LIKE reviews"
+
+CLEAR_STAGING_SQL = "DELETE FROM reviews_staging"
+
+# Both warehouses run in autocommit; this opens one explicit transaction
+BEGIN_SQL = "BEGIN"
+
+# Matched rows are only rewritten when their content fingerprint changed
+MERGE_SQL = """
+MERGE INTO reviews AS target
+USING reviews_staging AS source
+ON target.review_id = source.review_id
+WHEN MATCHED AND target.content_hash IS DISTINCT FROM source.content_hash THEN UPDATE SET
+    content = source.content,
+    score = source.score,
+    created_at = source.created_at,
+    app_version = source.app_version,
+    app_id = source.app_id,
+    content_hash = source.content_hash,
+    sentiment = source.sentiment
+WHEN NOT MATCHED THEN INSERT (
+    review_id, user_name, content, score, created_at, app_version, app_id, content_hash, sentiment
+) VALUES (
+    source.review_id, source.user_name, source.content,
+    source.score, source.created_at, source.app_version, source.app_id, source.content_hash, source.sentiment
+)
+"""
+
+# Classifies staged rows the way MERGE_SQL will treat them; used where the
+# warehouse does not report per-action MERGE counts
+MERGE_PREVIEW_SQL = """
+SELECT
+    COUNT_IF(target.review_id IS NULL),
+    COUNT_IF(target.review_id IS NOT NULL AND target.content_hash IS DISTINCT FROM source.content_hash)
+FROM reviews_staging AS source
+LEFT JOIN reviews AS target ON target.review_id = source.review_id
+"""
+
+MergeCounts = namedtuple("MergeCounts", ["inserted", "updated", "unchanged"])
+
+# One fetched page: its 1-based position in the run, the review dicts, the
+# continuation token that fetches the page after it, and the shard it came from
+Page = namedtuple("Page", ["number", "rows", "token", "shard"], defaults=(None,))
+
+_DONE = object()
+
+
+def ensure_reviews_table(cursor):
+    """Create the reviews table, upgrading an older single-app layout in place."""
+    cursor.execute(REVIEWS_DDL)
+    for sql in REVIEWS_MIGRATIONS:
+        cursor.execute(sql)
+
+
+def fetch_pages(app_id, lang="en", country="us", since=None, reviews_fn=reviews,
+                start_token=None, start_page=0, limiter=None, shard=None,
+                known_ids=None, overlap=timedelta(0), known_filter=None, stop_on_known=True):
+    """Yield `Page`s of Google Play reviews, newest first.
+
+    When `since` is given, only reviews at or after `since - overlap` whose
+    `reviewId` is not in `known_ids` are yielded, so reviews sharing the
+    boundary timestamp are never dropped. Because `known_ids` covers that
+    window, paging stops at the first page with nothing unknown in it, or
+    right after the page that reaches past the window. `known_filter` (a
+    `known_ids.KnownReviews`) drops reviews already merged unchanged and
+    stops paging at a page made up only of those, which is what keeps
+    backfills and overlapping runs from re-staging what the warehouse has.
+    With `stop_on_known=False` it only drops them and paging goes on to the
+    end, yielding empty pages, for full syncs that must reach older history.
+    Passing the token and page number saved by a checkpoint resumes paging
+    right after that page.
+    Requests are paced and retried by `limiter` (a `RateLimiter`). Every
+    review is tagged with `appId` so pages from several apps can share a batch.
+    """
+    if limiter is None:
+        limiter = RateLimiter.from_env()
+    floor = since - overlap if since is not None else None
+    known = known_ids or ()
+    token, number = start_token, start_page
+    while True:
+        retries = limiter.retries
+        with spans.span("fetch", pages=1) as span:
+            if token is None:
+                res, token = limiter.call(reviews_fn, app_id, lang=lang, country=country,
+                                          sort=Sort.NEWEST, count=PAGE_SIZE)
+            else:
+                res, token = limiter.call(reviews_fn, app_id, continuation_token=token)
+            span["rows"] = len(res)
+            span["retries"] = limiter.retries - retries
+
+        if not res:
+            break
+
+        for r in res:
+            r["appId"] = app_id
+
+        crossed = False
+        if floor is not None:
+            fresh = [r for r in res if r["at"] >= floor]
+            crossed = len(fresh) < len(res)
+            res = [r for r in fresh if r["reviewId"] not in known]
+            if not res:
+                break
+
+        if known_filter is not None:
+            with spans.span("filter", rows=len(res)):
+                merged = known_filter.known_rows(res)
+            if merged.all() and stop_on_known:
+                break
+            res = [r for r, seen in zip(res, merged) if not seen]
+
+        number += 1
+        yield Page(number, res, token, shard)
+
+        if crossed or token is None or getattr(token, "token", None) is None:
+            break
+
+
+def stage_batch(cursor, rows, mode="insert"):
+    """Load one micro-batch of raw reviews into reviews_staging (see loader.LOAD_MODES)."""
+    return loader.stage(cursor, rows, mode)
+
+
+def merge_staging(cursor, staged):
+    """MERGE reviews_staging into reviews and return its `MergeCounts`.
+
+    Snowflake reports inserted/updated counts as the MERGE result; other
+    backends classify the staged rows with MERGE_PREVIEW_SQL first.
+    """
+    with spans.span("merge", rows=staged):
+        if loader.dialect_of(cursor) != "snowflake":
+            cursor.execute(MERGE_PREVIEW_SQL)
+            inserted, updated = cursor.fetchone()
+            cursor.execute(MERGE_SQL)
+        else:
+            cursor.execute(MERGE_SQL)
+            result = dict(zip((d[0].lower() for d in cursor.description), cursor.fetchone()))
+            inserted = result.get("number of rows inserted", 0)
+            updated = result.get("number of rows updated", 0)
+    return MergeCounts(inserted, updated, staged - inserted - updated)
+
+
+def commit_batch(conn, cursor, rows, mode="insert", known_filter=None, quality=None, aggregates=None,
+                 sentiment=None):
+    """Stage one micro-batch, MERGE it into reviews and commit.
+
+    Once this returns the batch is durable, so a checkpoint taken afterwards
+    never points past rows that could still be lost, and the batch is added
+    to `known_filter` if one is given. With a `sentiment.SentimentEnrichment`
+    the staged rows get their sentiment column before the MERGE; without
+    one, new and rewritten rows have none. The `quality.QualityLog`
+    statistics, the MERGE, the `aggregates.ReviewAggregates` summary update
+    and the staging cleanup run in one explicit transaction, so a run that
+    dies between them leaves reviews, quality stats and the summaries as
+    they were. Staging stays outside it: Snowflake's PUT and temporary
+    stage would commit it.
+    Returns `MergeCounts`.
+    """
+    staged = stage_batch(cursor, rows, mode)
+    if sentiment is not None:
+        sentiment.enrich(cursor, rows)
+    cursor.execute(BEGIN_SQL)
+    try:
+        if quality is not None:
+            quality.record(cursor, staged)
+        if aggregates is not None:
+            aggregates.capture(cursor)
+        counts = merge_staging(cursor, staged)
+        if aggregates is not None:
+            aggregates.apply(cursor)
+        with spans.span("commit"):
+            cursor.execute(CLEAR_STAGING_SQL)
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if known_filter is not None:
+        with spans.span("filter", rows=len(rows)):
+            known_filter.add_rows(rows)
+    return counts
+
+
+def run_pipeline(pages, flush, batch_size=MICRO_BATCH_SIZE, max_pages=QUEUE_PAGES, on_page=None):
+    """Fetch pages in a background thread and flush fixed-size micro-batches.
+
+    `pages` is any iterable of `Page`s (usually `fetch_pages(...)`); it is
+    consumed on a producer thread and handed over through a bounded queue, so
+    at most `max_pages` pages plus one micro-batch are held in memory. The
+    micro-batch is a `ReviewBuffer`, which keeps only the schema fields.
+    `flush(rows, pages)` runs on the calling thread while fetching continues;
+    `pages` lists the pages whose rows make up `rows`, in arrival order.
+    Returns the total number of rows flushed.
+    """
+    q = queue.Queue(maxsize=max_pages)
+    stop = threading.Event()
+    errors = []
+
+    def produce():
+        try:
+            for page in pages:
+                while not stop.is_set():
+                    try:
+                        q.put(page, timeout=0.5)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if hasattr(pages, "close"):
+                pages.close()
+            q.put(_DONE)
+
+    producer = threading.Thread(target=produce, name="review-fetch", daemon=True)
+    producer.start()
+
+    batch, batch_pages, total = ReviewBuffer(), [], 0
+    try:
+        while True:
+            page = q.get()
+            if page is _DONE:
+                break
+            batch.extend(page.rows)
+            batch_pages.append(page)
+            if on_page is not None:
+                on_page(page)
+            if len(batch) >= batch_size:
+                flush(batch, batch_pages)
+                total += len(batch)
+                batch, batch_pages = ReviewBuffer(), []
+
+        if batch:
+            flush(batch, batch_pages)
+            total += len(batch)
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        # Unblock a producer waiting on a full queue
+        while producer.is_alive():
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.1)
+
+    return total
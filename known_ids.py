@@ -0,0 +1,148 @@
+# known_ids.py
+
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from checkpoint import CHECKPOINT_DIR
+from transform import to_frame
+
+
+KNOWN_IDS_PATH = os.getenv("KNOWN_IDS_PATH", os.path.join(CHECKPOINT_DIR, "known_ids.npz"))
+KNOWN_IDS_ERROR_RATE = float(os.getenv("KNOWN_IDS_ERROR_RATE", 1e-6))
+MIN_CAPACITY = 1_000_000
+REBUILD_CHUNK = 100_000
+
+# Two independent 16-byte keys for pandas' SipHash, giving the h1/h2 of
+# double hashing
+_HASH_KEYS = ("known-review-ids", "known-review-ix2")
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+ALL_KEYS_SQL = "SELECT review_id, content_hash FROM reviews WHERE content_hash IS NOT NULL"
+
+
+class KnownReviews:
+    """Bloom filter of (review_id, content fingerprint) pairs already merged into reviews.
+
+    Keying on the fingerprint as well as the id means an edited review is
+    never "known", so dropping known rows before staging only ever skips
+    rows the MERGE would have left unchanged. A false positive drops a new
+    row with probability `error_rate`; a stale or missing filter only costs
+    an unnecessary MERGE. Lookups and inserts are vectorised over a batch.
+    """
+
+    def __init__(self, capacity=MIN_CAPACITY, error_rate=KNOWN_IDS_ERROR_RATE, bits=None, count=0):
+        self.capacity = int(capacity)
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bits if bits is not None else np.zeros((self.num_bits + 7) // 8, dtype=np.uint8)
+        self.count = count
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, review_ids, content_hashes):
+        ids = np.asarray(review_ids, dtype=object)
+        salt = np.asarray(content_hashes, dtype=np.int64).view(np.uint64) * _MIX
+        h1 = pd.util.hash_array(ids, hash_key=_HASH_KEYS[0]) ^ salt
+        h2 = (pd.util.hash_array(ids, hash_key=_HASH_KEYS[1]) + salt) | np.uint64(1)
+        steps = np.arange(self.num_hashes, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            return (h1[:, None] + steps * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add(self, review_ids, content_hashes):
+        """Record pairs that are now in reviews."""
+        if len(review_ids) == 0:
+            return
+        pos = self._positions(review_ids, content_hashes).ravel()
+        masks = np.left_shift(1, pos & np.uint64(7)).astype(np.uint8)
+        with self._lock:
+            np.bitwise_or.at(self.bits, pos >> np.uint64(3), masks)
+            self.count += len(review_ids)
+
+    def contains(self, review_ids, content_hashes):
+        """Boolean array: True where a pair is (probably) already in reviews."""
+        if len(review_ids) == 0:
+            return np.zeros(0, dtype=bool)
+        pos = self._positions(review_ids, content_hashes)
+        hit = (self.bits[pos >> np.uint64(3)] >> (pos & np.uint64(7)).astype(np.uint8)) & 1
+        return hit.all(axis=1)
+
+    def add_rows(self, rows):
+        """Record a batch of raw scraper dicts once it has been merged."""
+        if rows:
+            df = to_frame(rows)
+            self.add(df["review_id"].to_numpy(dtype=object), df["content_hash"].to_numpy())
+
+    def known_rows(self, rows):
+        """Boolean array over raw scraper dicts (tagged with `appId`): True where already merged."""
+        if not rows:
+            return np.zeros(0, dtype=bool)
+        df = to_frame(rows)
+        known = self.contains(df["review_id"].to_numpy(dtype=object), df["content_hash"].to_numpy())
+        with self._lock:
+            self.skipped += int(known.sum())
+        return known
+
+    @property
+    def full(self):
+        return self.count > self.capacity
+
+    def save(self, path=KNOWN_IDS_PATH):
+        """Persist the filter atomically next to the checkpoints."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, bits=self.bits, meta=np.array([self.capacity, self.count], dtype=np.int64),
+                     error_rate=np.array([self.error_rate]))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=KNOWN_IDS_PATH):
+        """Load a saved filter, or return None when there is none."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                capacity, count = (int(v) for v in data["meta"])
+                return cls(capacity, float(data["error_rate"][0]), bits=data["bits"].copy(), count=count)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable known-id filter {path}: {e}")
+            return None
+
+    @classmethod
+    def rebuild(cls, cursor, error_rate=KNOWN_IDS_ERROR_RATE):
+        """Build a filter from every fingerprinted row in reviews, streamed in chunks."""
+        cursor.execute("SELECT COUNT(*) FROM reviews")
+        total = cursor.fetchone()[0] or 0
+        known = cls(max(MIN_CAPACITY, 2 * total), error_rate)
+        cursor.execute(ALL_KEYS_SQL)
+        while True:
+            chunk = cursor.fetchmany(REBUILD_CHUNK)
+            if not chunk:
+                break
+            ids, hashes = zip(*chunk)
+            known.add(ids, np.array(hashes, dtype=np.int64))
+        return known
+
+
+def open_known_reviews(cursor, path=KNOWN_IDS_PATH, rebuild=None):
+    """Load the persisted filter, rebuilding it from reviews when missing, full or requested.
+
+    Returns None when KNOWN_IDS_FILTER=0 disables it. KNOWN_IDS_REBUILD=1
+    forces a rebuild, e.g. after rows were deleted from reviews.
+    """
+    if os.getenv("KNOWN_IDS_FILTER", "1") == "0":
+        return None
+    if rebuild is None:
+        rebuild = os.getenv("KNOWN_IDS_REBUILD", "0") == "1"
+    known = None if rebuild else KnownReviews.load(path)
+    if known is None or known.full:
+        print("Rebuilding known review filter from reviews...")
+        known = KnownReviews.rebuild(cursor)
+        known.save(path)
+        print(f"Known review filter holds {known.count:,} reviews.")
+    return known
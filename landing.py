@@ -0,0 +1,236 @@
+# landing.py
+
+from datetime import datetime, timezone
+import argparse
+import json
+import os
+import uuid
+
+from ingest_pipeline import MICRO_BATCH_SIZE, STAGING_DDL, commit_batch, ensure_reviews_table
+from transform import FIELD_MAP, ReviewBuffer
+import spans
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed when the landing zone is enabled
+    pa = pq = None
+
+
+LANDING_DIR = os.getenv("LANDING_DIR", "landing")
+MANIFEST = "_manifest.jsonl"
+UNKNOWN_MONTH = "unknown"
+
+
+def raw_schema():
+    """Arrow schema of the scraper payload as landed, every field kept."""
+    if pa is None:
+        raise ImportError("pyarrow is required for the landing zone: pip install pyarrow")
+    return pa.schema([
+        ("reviewId", pa.string()),
+        ("userName", pa.string()),
+        ("userImage", pa.string()),
+        ("content", pa.string()),
+        ("score", pa.int8()),
+        ("thumbsUpCount", pa.int64()),
+        ("reviewCreatedVersion", pa.string()),
+        ("at", pa.timestamp("us")),
+        ("replyContent", pa.string()),
+        ("repliedAt", pa.timestamp("us")),
+        ("appVersion", pa.string()),
+        ("appId", pa.string()),
+    ])
+
+
+def landing_from_env():
+    """Return the LandingZone for this run, or None when LANDING_ZONE=0 turns it off."""
+    if os.getenv("LANDING_ZONE", "1") == "0":
+        return None
+    return LandingZone(LANDING_DIR)
+
+
+class LandingZone:
+    """Month-partitioned Parquet copy of every scraped page.
+
+    Pages are collected with `append()` and written by `flush()`, one file
+    per `month=YYYY-MM` partition of `created_at`, before the batch is
+    merged, so the landing zone always holds everything the warehouse got.
+    A file is listed in `_manifest.jsonl` only once it is fully written;
+    readers go through the manifest and ignore anything else on disk.
+    """
+
+    def __init__(self, root=LANDING_DIR):
+        if pq is None:
+            raise ImportError("pyarrow is required for the landing zone: pip install pyarrow")
+        self.root = root
+        self.run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self._pending = []
+        self._files = 0
+
+    def append(self, rows):
+        """Queue one page of raw scraper dicts for the next flush."""
+        self._pending.extend(rows)
+
+    def flush(self):
+        """Write the queued pages, one Parquet file per month; returns the manifest entries."""
+        rows, self._pending = self._pending, []
+        with spans.span("landing", rows=len(rows)) as span:
+            by_month = {}
+            for r in rows:
+                at = r.get("at")
+                by_month.setdefault(at.strftime("%Y-%m") if at is not None else UNKNOWN_MONTH, []).append(r)
+            entries = [self._write(month, month_rows) for month, month_rows in sorted(by_month.items())]
+            span["bytes"] = sum(e["bytes"] for e in entries)
+        return entries
+
+    def _write(self, month, rows):
+        directory = os.path.join(self.root, f"month={month}")
+        os.makedirs(directory, exist_ok=True)
+        self._files += 1
+        name = f"part-{self.run_id}-{self._files:05d}.parquet"
+        path = os.path.join(directory, name)
+        table = pa.Table.from_pylist(rows, schema=raw_schema())
+        pq.write_table(table, path + ".tmp", compression="zstd")
+        os.replace(path + ".tmp", path)
+        nbytes = os.path.getsize(path)
+
+        stamps = [r["at"] for r in rows if r.get("at") is not None]
+        entry = {
+            "file": os.path.join(f"month={month}", name),
+            "month": month,
+            "rows": len(rows),
+            "bytes": nbytes,
+            "app_ids": sorted({r.get("appId") for r in rows if r.get("appId")}),
+            "min_at": min(stamps).isoformat() if stamps else None,
+            "max_at": max(stamps).isoformat() if stamps else None,
+            "run_id": self.run_id,
+            "written_at": datetime.now(timezone.utc).isoformat(),
+        }
+        with open(os.path.join(self.root, MANIFEST), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+
+def read_manifest(root=LANDING_DIR, months=None, app_ids=None):
+    """Return the manifest entries of `root`, in write order, optionally filtered."""
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if months and entry["month"] not in months:
+                continue
+            if app_ids and not set(entry["app_ids"]) & set(app_ids):
+                continue
+            entries.append(entry)
+    return entries
+
+
+def read_month(root, entries, app_ids=None):
+    """Read one month's landed files as schema-field dicts, the latest copy of each review winning."""
+    table = pa.concat_tables(
+        pq.read_table(os.path.join(root, e["file"]), columns=list(FIELD_MAP)) for e in entries
+    )
+    latest = {}
+    for r in table.to_pylist():
+        if app_ids and r["appId"] not in app_ids:
+            continue
+        latest[r["reviewId"]] = r
+    return list(latest.values())
+
+
+def replay(conn, cursor, root=LANDING_DIR, months=None, app_ids=None, load_mode="parquet",
+           batch_size=MICRO_BATCH_SIZE, known_filter=None, quality=None, aggregates=None, sentiment=None):
+    """MERGE the landing zone into reviews month by month, without calling Google Play.
+
+    Returns the summed `MergeCounts` as a dict.
+    """
+    if pq is None:
+        raise ImportError("pyarrow is required for the landing zone: pip install pyarrow")
+    by_month = {}
+    for entry in read_manifest(root, months, app_ids):
+        by_month.setdefault(entry["month"], []).append(entry)
+
+    ensure_reviews_table(cursor)
+    cursor.execute(STAGING_DDL)
+    merged = {"inserted": 0, "updated": 0, "unchanged": 0}
+    for month, entries in sorted(by_month.items()):
+        rows = read_month(root, entries, app_ids)
+        for i in range(0, len(rows), batch_size):
+            counts = commit_batch(conn, cursor, ReviewBuffer(rows[i:i + batch_size]), load_mode, known_filter,
+                                  quality, aggregates, sentiment=sentiment)
+            for key, value in counts._asdict().items():
+                merged[key] += value
+        print(f"Replayed {month}: {len(rows):,} reviews from {len(entries)} files.")
+    return merged
+
+
+def main(argv=None):
+    """Command line: `python landing.py replay [--month YYYY-MM ...] [--app ID ...] [--rebuild]`."""
+    from aggregates import aggregates_from_env
+    from known_ids import open_known_reviews
+    from loader import LOAD_MODES
+    from quality import quality_from_env
+    from sentiment import enrichment_from_env
+    import warehouse
+
+    parser = argparse.ArgumentParser(description="Rebuild reviews from the local landing zone.")
+    parser.add_argument("command", choices=["replay"])
+    parser.add_argument("--root", default=LANDING_DIR)
+    parser.add_argument("--month", action="append", help="only replay this YYYY-MM partition (repeatable)")
+    parser.add_argument("--app", action="append", help="only replay this app id (repeatable)")
+    parser.add_argument("--load-mode", choices=LOAD_MODES, default="parquet",
+                        help="how batches reach reviews_staging (default: parquet bulk load)")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="delete the replayed apps' rows from reviews first")
+    args = parser.parse_args(argv)
+    if args.rebuild and args.month:
+        parser.error("--rebuild replaces whole apps and cannot be combined with --month")
+
+    conn = warehouse.get_connection()
+    cursor = conn.cursor()
+    ensure_reviews_table(cursor)
+    if args.rebuild:
+        if args.app:
+            for app_id in args.app:
+                cursor.execute("DELETE FROM reviews WHERE app_id = %s", (app_id,))
+        else:
+            cursor.execute("DELETE FROM reviews")
+        conn.commit()
+
+    # Deleted rows may still be in the known-review filter, the summary
+    # tables and the quality statistics, so a rebuild rebuilds them
+    # afterwards; otherwise replayed rows are added to them
+    known_filter = None if args.rebuild else open_known_reviews(cursor)
+    quality = quality_from_env("landing_replay")
+    if quality is not None:
+        quality.ensure_table(cursor)
+    aggregates = aggregates_from_env()
+    if aggregates is not None:
+        aggregates.ensure_tables(cursor, build_empty=not args.rebuild)
+    enrichment = enrichment_from_env()
+    if enrichment is not None:
+        enrichment.ensure_table(cursor)
+    merged = replay(conn, cursor, args.root, args.month, args.app, args.load_mode,
+                    known_filter=known_filter, quality=None if args.rebuild else quality,
+                    aggregates=None if args.rebuild else aggregates, sentiment=enrichment)
+    if args.rebuild:
+        open_known_reviews(cursor, rebuild=True)
+        if quality is not None:
+            quality.rebuild(cursor, args.app)
+        if aggregates is not None:
+            aggregates.rebuild(cursor)
+        conn.commit()
+    elif known_filter is not None:
+        known_filter.save()
+    cursor.close()
+    print(f"Replay finished: {merged['inserted']:,} inserted, {merged['updated']:,} updated, "
+          f"{merged['unchanged']:,} unchanged.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# loader.py
+
+import os
+import tempfile
+import uuid
+
+from transform import prepare_records, to_arrow, to_frame
+import spans
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for LOAD_MODE=parquet
+    pa = pq = None
+
+
+LOAD_MODES = ("insert", "parquet")
+
+INSERT_STAGING_SQL = """
+INSERT INTO reviews_staging (
+    review_id, user_name, content, score, created_at, app_version, app_id, content_hash
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+LOAD_STAGE = "reviews_load_stage"
+
+CREATE_STAGE_SQL = f"CREATE TEMPORARY STAGE IF NOT EXISTS {LOAD_STAGE} FILE_FORMAT = (TYPE = PARQUET)"
+
+COPY_STAGING_SQL = f"""
+COPY INTO reviews_staging
+FROM @{LOAD_STAGE}
+FILES = ('{{name}}')
+FILE_FORMAT = (TYPE = PARQUET)
+MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE
+PURGE = TRUE
+"""
+
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+
+
+def load_mode_from_env():
+    """Return the staging load mode for this run: LOAD_MODE=insert (default) or parquet."""
+    mode = os.getenv("LOAD_MODE", "insert").lower()
+    if mode not in LOAD_MODES:
+        raise ValueError(f"LOAD_MODE must be one of {LOAD_MODES}, got {mode!r}")
+    return mode
+
+
+def dialect_of(cursor):
+    """Guess the warehouse behind a DBAPI cursor: 'snowflake', 'duckdb' or 'sqlite'."""
+    if getattr(cursor, "dialect", None):
+        return cursor.dialect
+    module = type(cursor).__module__.lstrip("_")
+    for name in ("duckdb", "sqlite3"):
+        if module.startswith(name):
+            return name.rstrip("3")
+    return "snowflake"
+
+
+def stage_insert(cursor, rows, dialect="snowflake"):
+    """Load a batch into reviews_staging with row-bound executemany INSERTs."""
+    with spans.span("transform", rows=len(rows)):
+        records = prepare_records(rows)
+    if not records:
+        return 0
+    sql = INSERT_STAGING_SQL if dialect == "snowflake" else INSERT_STAGING_SQL.replace("%s", "?")
+    with spans.span("stage", rows=len(records)):
+        cursor.executemany(sql, records)
+    return len(records)
+
+
+def write_parquet(rows, directory):
+    """Write a batch of raw reviews to one compressed Parquet file and return its path."""
+    if pq is None:
+        raise ImportError("pyarrow is required for LOAD_MODE=parquet: pip install pyarrow")
+    path = os.path.join(directory, f"reviews_{uuid.uuid4().hex}.parquet")
+    batch = to_arrow(to_frame(rows))
+    pq.write_table(pa.Table.from_batches([batch]), path, compression=PARQUET_COMPRESSION)
+    return path
+
+
+def stage_parquet(cursor, rows, dialect="snowflake"):
+    """Load a batch into reviews_staging as Parquet: write, stage, then bulk COPY.
+
+    On Snowflake the file is PUT to a temporary internal stage and loaded
+    with COPY INTO; on DuckDB it is read straight from disk with
+    read_parquet(), which is the local stand-in for the same path.
+    """
+    if not rows:
+        return 0
+    with tempfile.TemporaryDirectory(prefix="reviews_load_") as directory:
+        with spans.span("transform", rows=len(rows)) as span:
+            path = write_parquet(rows, directory)
+            span["bytes"] = os.path.getsize(path)
+        with spans.span("stage", rows=len(rows), bytes=os.path.getsize(path)):
+            if dialect == "snowflake":
+                cursor.execute(CREATE_STAGE_SQL)
+                cursor.execute(f"PUT 'file://{path}' @{LOAD_STAGE} AUTO_COMPRESS = FALSE OVERWRITE = TRUE")
+                cursor.execute(COPY_STAGING_SQL.format(name=os.path.basename(path)))
+            elif dialect == "duckdb":
+                cursor.execute(f"INSERT INTO reviews_staging BY NAME SELECT * FROM read_parquet('{path}')")
+            else:
+                raise ValueError(f"LOAD_MODE=parquet is not supported on {dialect}")
+    return len(rows)
+
+
+def stage(cursor, rows, mode="insert"):
+    """Load one micro-batch into reviews_staging using the selected mode."""
+    dialect = dialect_of(cursor)
+    if mode == "parquet":
+        return stage_parquet(cursor, rows, dialect)
+    return stage_insert(cursor, rows, dialect)
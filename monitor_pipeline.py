@@ -1,149 +1,120 @@
-import os
+import argparse
+import sys
 import time
 import traceback
-import snowflake.connector
-import smtplib
-from email.mime.text import MIMEText
 
+import alerts
+import anomaly
+import profiling
+import spans
+import warehouse
 
-def send_email(subject, body):
-    """Send a simple email alert via SMTP."""
-    try:
-        smtp_server = os.getenv("SMTP_SERVER")
-        smtp_port = int(os.getenv("SMTP_PORT", 587))
-        smtp_user = os.getenv("SMTP_USER")
-        smtp_password = os.getenv("SMTP_PASSWORD")
-        recipients = os.getenv("ALERT_EMAILS", "").split(",")
-
-        if not recipients or recipients == [""]:
-            print("No ALERT_EMAILS configured. Skipping email alert.")
-            return
-
-        msg = MIMEText(body)
-        msg["Subject"] = subject
-        msg["From"] = smtp_user
-        msg["To"] = ", ".join(recipients)
 
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.sendmail(smtp_user, recipients, msg.as_string())
-
-        print(f"Email alert sent to: {recipients}")
+def log_to_snowflake(status, rows_loaded, error_message, duration, anomaly_flag=None, run_id=None,
+                     profile_summary=None, anomaly_severity=None):
+    """Write pipeline run log into Snowflake table PIPELINE_MONITORING."""
+    try:
+        with warehouse.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS PIPELINE_MONITORING (
+                    DATE DATE,
+                    TASK_NAME STRING,
+                    STATUS STRING,
+                    ROWS_LOADED INT,
+                    ERROR_MESSAGE STRING,
+                    DURATION_SEC FLOAT,
+                    ANOMALY_FLAG STRING,
+                    TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP,
+                    RUN_ID STRING
+                );
+            """)
+            cur.execute("ALTER TABLE PIPELINE_MONITORING ADD COLUMN IF NOT EXISTS RUN_ID STRING")
+            cur.execute("ALTER TABLE PIPELINE_MONITORING ADD COLUMN IF NOT EXISTS PROFILE_SUMMARY STRING")
+            cur.execute("ALTER TABLE PIPELINE_MONITORING ADD COLUMN IF NOT EXISTS ANOMALY_SEVERITY STRING")
+
+            if error_message:
+                error_message = error_message[:800] + " ..." if len(error_message) > 800 else error_message
+
+            cur.execute("""
+                INSERT INTO PIPELINE_MONITORING
+                (DATE, TASK_NAME, STATUS, ROWS_LOADED, ERROR_MESSAGE, DURATION_SEC, ANOMALY_FLAG, RUN_ID,
+                 PROFILE_SUMMARY, ANOMALY_SEVERITY)
+                VALUES (CURRENT_DATE(), 'review_update', %s, %s, %s, %s, %s, %s, %s, %s)
+            """, (status, rows_loaded, error_message, duration, anomaly_flag, run_id, profile_summary,
+                  anomaly_severity))
+
+            warehouse.get_connection().commit()
+        print("Pipeline status logged successfully in Snowflake.")
 
     except Exception as e:
-        print("Failed to send email:", e)
+        print("Failed to log to Snowflake:", e)
 
 
-def log_to_snowflake(status, rows_loaded, error_message, duration, anomaly_flag=None):
-    """Write pipeline run log into Snowflake table PIPELINE_MONITORING."""
+def log_stages(tracer):
+    """Write the run's per-stage timings into PIPELINE_STAGE_MONITORING."""
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"),
-            password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"),
-            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"),
-            schema=os.getenv("SNOWFLAKE_SCHEMA"),
-        )
-        cur = conn.cursor()
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS PIPELINE_MONITORING (
-                DATE DATE,
-                TASK_NAME STRING,
-                STATUS STRING,
-                ROWS_LOADED INT,
-                ERROR_MESSAGE STRING,
-                DURATION_SEC FLOAT,
-                ANOMALY_FLAG STRING,
-                TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP
-            );
-        """)
-
-        if error_message:
-            error_message = error_message[:800] + " ..." if len(error_message) > 800 else error_message
-
-        cur.execute("""
-            INSERT INTO PIPELINE_MONITORING
-            (DATE, TASK_NAME, STATUS, ROWS_LOADED, ERROR_MESSAGE, DURATION_SEC, ANOMALY_FLAG)
-            VALUES (CURRENT_DATE(), 'review_update', %s, %s, %s, %s, %s)
-        """, (status, rows_loaded, error_message, duration, anomaly_flag))
-
-        conn.commit()
-        print("Pipeline status logged successfully in Snowflake.")
+        with warehouse.cursor() as cur:
+            spans.save_stages(cur, tracer)
+            warehouse.get_connection().commit()
+        print("Stage timings logged successfully in Snowflake.")
 
     except Exception as e:
-        print("Failed to log to Snowflake:", e)
+        print("Failed to log stage timings to Snowflake:", e)
 
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
 
+def detect_anomalies(status, rows_loaded, duration, tracer):
+    """Compare this run with the rolling baselines and fold it into them.
 
-def get_last_run_rows():
-    """Fetch the ROWS_LOADED value from the last successful run for comparison."""
+    Checks rows loaded, total duration and each stage's seconds against the
+    EWMA baselines in PIPELINE_ANOMALY_STATE (see anomaly.py); only
+    successful runs update them. Returns (anomaly_flag, severity).
+    """
+    metrics = {"rows_loaded": rows_loaded, "duration_sec": duration}
+    for stage, totals in tracer.stages.items():
+        metrics[f"stage_{stage}_sec"] = round(totals["seconds"], 3)
+    month = time.localtime().tm_mon
     try:
-        conn = snowflake.connector.connect(
-            user=os.getenv("SNOWFLAKE_USER"),
-            password=os.getenv("SNOWFLAKE_PASSWORD"),
-            account=os.getenv("SNOWFLAKE_ACCOUNT"),
-            warehouse=os.getenv("SNOWFLAKE_WAREHOUSE"),
-            database=os.getenv("SNOWFLAKE_DATABASE"),
-            schema=os.getenv("SNOWFLAKE_SCHEMA"),
-        )
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT ROWS_LOADED
-            FROM PIPELINE_MONITORING
-            WHERE STATUS = 'SUCCESS'
-            ORDER BY TIMESTAMP DESC
-            LIMIT 1 OFFSET 1
-        """)
-        row = cur.fetchone()
-        return row[0] if row else None
+        with warehouse.cursor() as cur:
+            detector = anomaly.AnomalyDetector.load(cur, tracer.task_name)
+            findings = detector.observe(metrics, month, success=status == "SUCCESS")
+            detector.save(cur)
+            warehouse.get_connection().commit()
     except Exception as e:
-        print("Could not fetch previous ROWS_LOADED:", e)
-        return None
-    finally:
-        try:
-            cur.close()
-            conn.close()
-        except Exception:
-            pass
+        print("Anomaly detection failed:", e)
+        return None, None
+
+    severity = anomaly.worst_severity(findings)
+    return anomaly.format_findings(findings) or "OK", severity
+
 
+def main(profile=None):
+    """Run review_update.main() once in-process and log that run with anomaly detection.
 
-def main():
-    """Run review_update.py and log the result with anomaly detection."""
+    With `profile` (default: PIPELINE_PROFILE=1) the run executes under
+    cProfile and tracemalloc and the profile summary is logged with it.
+    Alerts are handed to an `alerts.AlertDispatcher` after the duration is
+    taken and delivered in the background while the run is logged.
+    Returns the run status ("SUCCESS" or "FAILURE").
+    """
     import review_update
+    dispatcher = alerts.AlertDispatcher(alerts.sink_from_env())
+    tracer = spans.start_run("review_update")
     start_time = time.time()
     status = "SUCCESS"
     rows_loaded = 0
     error_message = None
     anomaly_flag = None
+    prof = None
 
     try:
         print("Running monthly review update...")
         if hasattr(review_update, "main"):
-            rows_loaded = review_update.main()
+            with profiling.profiled(tracer.run_id, enabled=profile) as prof:
+                rows_loaded = review_update.main()
             print(f"review_update.main() completed. Rows loaded: {rows_loaded}")
         else:
             raise RuntimeError("review_update.main() not found")
 
-        last_rows = get_last_run_rows()
-        if last_rows and last_rows > 0:
-            diff_ratio = rows_loaded / last_rows if last_rows else 1
-            if diff_ratio < 0.2:
-                anomaly_flag = f"WARNING: Only {rows_loaded} rows vs {last_rows} last month"
-                print(anomaly_flag)
-            else:
-                anomaly_flag = "OK"
-        else:
-            anomaly_flag = "FIRST_RUN"
-
     except Exception:
         status = "FAILURE"
         error_message = traceback.format_exc()
@@ -152,16 +123,32 @@ def main():
     finally:
         duration = round(time.time() - start_time, 2)
         print(f"Pipeline finished in {duration} seconds with status: {status}")
-        log_to_snowflake(status, rows_loaded, error_message, duration, anomaly_flag)
-
-        # Send alert only if failure or anomaly
-        if status == "FAILURE" or (anomaly_flag and anomaly_flag.startswith("WARNING")):
-            subject = f"[Pipeline Alert] review_update.py {status}"
+        anomaly_flag, severity = detect_anomalies(status, rows_loaded, duration, tracer)
+        if severity and severity != "OK":
+            print(f"Anomaly ({severity}): {anomaly_flag}")
+
+        # Alert only on failure or an anomaly of WARNING or above
+        alerting = severity and anomaly.severity_rank(severity) >= anomaly.severity_rank("WARNING")
+        if status == "FAILURE" or alerting:
+            subject = f"[Pipeline Alert] review_update.py {status}" + (f" {severity}" if alerting else "")
             body = f"Status: {status}\nRows Loaded: {rows_loaded}\nDuration: {duration}s\n\n{anomaly_flag or ''}\n\n{error_message or ''}"
-            send_email(subject, body)
+            dispatcher.submit(subject, body, key=f"review_update {status} {severity}",
+                              severity="CRITICAL" if status == "FAILURE" else severity)
+
+        log_to_snowflake(status, rows_loaded, error_message, duration, anomaly_flag, tracer.run_id,
+                         prof.summary if prof else None, severity)
+        log_stages(tracer)
+        dispatcher.close()
+
+    return status
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run the review update with monitoring.")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="profile the run with cProfile and tracemalloc (or set PIPELINE_PROFILE=1)")
+    args = parser.parse_args()
+    if main(profile=args.profile) != "SUCCESS":
+        sys.exit(1)
 
 
@@ -0,0 +1,156 @@
+# profiling.py
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", 25))
+TRACEMALLOC_FRAMES = 5
+
+# Blocking waits dominate own time on idle threads; the summary skips them
+_WAITS = ("'acquire' of '_thread.lock", "'acquire' of '_thread.RLock", "time.sleep", "select.")
+
+
+def enabled_from_env():
+    """True when PIPELINE_PROFILE=1 asks for a profiled run."""
+    return os.getenv("PIPELINE_PROFILE", "0") == "1"
+
+
+class Profile:
+    """Result of a profiled block: the artifact paths and a one-line summary."""
+
+    def __init__(self, name):
+        self.name = name
+        self.path = None
+        self.stats_path = None
+        self.summary = None
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _start_thread(self, *_):
+        # Runs as the first profile event of every thread started while
+        # profiling; swap in a dedicated profiler for that thread. Python
+        # 3.12+ allows only one active profiler, so there only the calling
+        # thread is profiled.
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def _hotspots(self, stats, top):
+        rows = []
+        for (filename, line, func), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                "function": f"{os.path.basename(filename)}:{line}({func})",
+                "calls": calls,
+                "tottime": round(tottime, 4),
+                "cumtime": round(cumtime, 4),
+            })
+        by_cum = sorted(rows, key=lambda r: r["cumtime"], reverse=True)[:top]
+        by_own = sorted(rows, key=lambda r: r["tottime"], reverse=True)[:top]
+        return by_cum, by_own
+
+    def _allocations(self, snapshot, top):
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        ])
+        return [
+            {
+                "site": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                "size_kib": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            for stat in snapshot.statistics("lineno")[:top]
+        ]
+
+    def write(self, seconds, snapshot, peak, top, directory):
+        """Write the JSON artifact (and the raw .prof) and build the summary."""
+        stats = None
+        for profile in self._profiles:
+            profile.disable()
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        by_cum, by_own = self._hotspots(stats, top) if stats else ([], [])
+        allocations = self._allocations(snapshot, top)
+
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"profile-{self.name}")
+        self.path = base + ".json"
+        with open(self.path, "w") as f:
+            json.dump({
+                "name": self.name,
+                "written_at": datetime.now(timezone.utc).isoformat(),
+                "wall_sec": round(seconds, 3),
+                "threads_profiled": len(self._profiles),
+                "peak_traced_mib": round(peak / 2**20, 1),
+                "top_cumulative": by_cum,
+                "top_own_time": by_own,
+                "top_allocations": allocations,
+            }, f, indent=1)
+        if stats:
+            self.stats_path = base + ".prof"
+            stats.dump_stats(self.stats_path)
+
+        parts = [f"wall {seconds:.1f}s", f"peak traced {peak / 2**20:.0f} MiB"]
+        busy = [r for r in by_own if not any(w in r["function"] for w in _WAITS)]
+        if busy:
+            parts.append(f"hottest {busy[0]['function']} {busy[0]['tottime']:.1f}s own")
+        if allocations:
+            parts.append(f"top alloc {allocations[0]['site']} {allocations[0]['size_kib'] / 1024:.1f} MiB")
+        parts.append(f"artifact {self.path}")
+        self.summary = "; ".join(parts)[:800]
+
+
+@contextmanager
+def profiled(name, enabled=None, top=PROFILE_TOP, directory=PROFILE_DIR):
+    """Run the block under cProfile and tracemalloc when `enabled`.
+
+    `enabled` defaults to PIPELINE_PROFILE. When disabled this yields None
+    and does nothing else. When enabled it yields a `Profile` whose
+    `path` (JSON with the top-`top` hotspots and allocation sites),
+    `stats_path` (raw pstats dump) and `summary` are filled in once the
+    block exits, whether or not it raised.
+    """
+    if enabled is None:
+        enabled = enabled_from_env()
+    if not enabled:
+        yield None
+        return
+
+    profile = Profile(name)
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    tracemalloc.reset_peak()
+    threading.setprofile(profile._start_thread)
+    profile._start_thread()
+    start = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        seconds = time.perf_counter() - start
+        threading.setprofile(None)
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        try:
+            profile.write(seconds, snapshot, peak, top, directory)
+            print(f"Profile written: {profile.summary}")
+        except Exception as e:
+            print("Failed to write profile:", e)
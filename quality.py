@@ -0,0 +1,181 @@
+# quality.py
+
+import os
+
+import spans
+
+
+# Google Play caps review text at 500 characters; longer content points at a
+# scraping or encoding problem
+LONG_CONTENT = int(os.getenv("QUALITY_LONG_CONTENT", 500))
+
+# Counters kept per run and app, in REVIEW_QUALITY_STATS column order
+COUNTERS = (
+    "rows_checked", "missing_review_id", "missing_content", "missing_score", "score_out_of_range",
+    "missing_created_at", "duplicate_ids", "long_content", "content_len_sum", "content_len_sumsq",
+)
+
+QUALITY_DDL = """
+CREATE TABLE IF NOT EXISTS REVIEW_QUALITY_STATS (
+    RUN_ID STRING,
+    DATE DATE,
+    TASK_NAME STRING,
+    APP_ID STRING,
+    ROWS_CHECKED INT,
+    MISSING_REVIEW_ID INT,
+    MISSING_CONTENT INT,
+    MISSING_SCORE INT,
+    SCORE_OUT_OF_RANGE INT,
+    MISSING_CREATED_AT INT,
+    DUPLICATE_IDS INT,
+    LONG_CONTENT INT,
+    CONTENT_LEN_SUM BIGINT,
+    CONTENT_LEN_SUMSQ BIGINT,
+    CONTENT_LEN_MAX INT,
+    TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+INSERT_QUALITY_SQL = """
+INSERT INTO REVIEW_QUALITY_STATS
+(RUN_ID, DATE, TASK_NAME, APP_ID, ROWS_CHECKED, MISSING_REVIEW_ID, MISSING_CONTENT, MISSING_SCORE,
+ SCORE_OUT_OF_RANGE, MISSING_CREATED_AT, DUPLICATE_IDS, LONG_CONTENT, CONTENT_LEN_SUM, CONTENT_LEN_SUMSQ,
+ CONTENT_LEN_MAX)
+VALUES (%s, CURRENT_DATE(), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# Run between staging and MERGE, like aggregates.CAPTURE_DELTA_SQL: the new
+# values of every staged row the MERGE will insert or rewrite count +1 and
+# the values it replaces -1, so REVIEW_QUALITY_STATS sums to the stored
+# corpus. Columns follow COUNTERS, then content_len_max (longest written)
+QUALITY_DELTA_SQL = """
+SELECT
+    app_id,
+    SUM(sign),
+    SUM(CASE WHEN review_id IS NULL THEN sign ELSE 0 END),
+    SUM(CASE WHEN content IS NULL OR TRIM(content) = '' THEN sign ELSE 0 END),
+    SUM(CASE WHEN score IS NULL THEN sign ELSE 0 END),
+    SUM(CASE WHEN score NOT BETWEEN 1 AND 5 THEN sign ELSE 0 END),
+    SUM(CASE WHEN created_at IS NULL THEN sign ELSE 0 END),
+    SUM(CASE WHEN repeated THEN sign ELSE 0 END),
+    SUM(CASE WHEN LENGTH(content) > %s THEN sign ELSE 0 END),
+    SUM(sign * COALESCE(LENGTH(content), 0)),
+    SUM(sign * COALESCE(LENGTH(content), 0) * COALESCE(LENGTH(content), 0)),
+    MAX(CASE WHEN sign = 1 THEN COALESCE(LENGTH(content), 0) ELSE 0 END)
+FROM (
+    SELECT source.app_id, 1 AS sign, source.review_id, source.content, source.score, source.created_at,
+           source.review_id IS NOT NULL
+           AND ROW_NUMBER() OVER (PARTITION BY source.review_id ORDER BY source.review_id) > 1 AS repeated
+    FROM reviews_staging AS source
+    LEFT JOIN reviews AS target ON target.review_id = source.review_id
+    WHERE target.review_id IS NULL OR target.content_hash IS DISTINCT FROM source.content_hash
+    UNION ALL
+    SELECT target.app_id, -1, target.review_id, target.content, target.score, target.created_at, FALSE
+    FROM reviews_staging AS source
+    JOIN reviews AS target ON target.review_id = source.review_id
+    WHERE target.content_hash IS DISTINCT FROM source.content_hash
+) AS delta
+GROUP BY app_id
+"""
+
+# Counts the reviews already stored when the stats table is first used, so
+# running totals over REVIEW_QUALITY_STATS cover the whole corpus; `where`
+# limits a rebuild to some apps
+BACKFILL_SQL = """
+INSERT INTO REVIEW_QUALITY_STATS
+(RUN_ID, DATE, TASK_NAME, APP_ID, ROWS_CHECKED, MISSING_REVIEW_ID, MISSING_CONTENT, MISSING_SCORE,
+ SCORE_OUT_OF_RANGE, MISSING_CREATED_AT, DUPLICATE_IDS, LONG_CONTENT, CONTENT_LEN_SUM, CONTENT_LEN_SUMSQ,
+ CONTENT_LEN_MAX)
+SELECT
+    'backfill', CURRENT_DATE(), %s, app_id,
+    COUNT(*),
+    COUNT_IF(review_id IS NULL),
+    COUNT_IF(content IS NULL OR TRIM(content) = ''),
+    COUNT_IF(score IS NULL),
+    COUNT_IF(score NOT BETWEEN 1 AND 5),
+    COUNT_IF(created_at IS NULL),
+    COUNT(review_id) - COUNT(DISTINCT review_id),
+    COUNT_IF(LENGTH(content) > %s),
+    SUM(COALESCE(LENGTH(content), 0)),
+    SUM(COALESCE(LENGTH(content), 0) * COALESCE(LENGTH(content), 0)),
+    MAX(COALESCE(LENGTH(content), 0))
+FROM reviews
+{where}
+GROUP BY app_id
+"""
+
+
+def quality_from_env(task_name="review_update"):
+    """Return the QualityLog for this run, or None when QUALITY_STATS=0 turns it off."""
+    if os.getenv("QUALITY_STATS", "1") == "0":
+        return None
+    return QualityLog(task_name)
+
+
+class QualityLog:
+    """Per-run data-quality statistics of what each batch changes in reviews.
+
+    `record()` runs after a batch is staged and before it is merged, inside
+    the transaction ingest_pipeline.commit_batch opens, so its rows commit
+    exactly with the batch. It checks, with QUALITY_DELTA_SQL, only the rows
+    the MERGE will insert or rewrite (null and blank ids, content and
+    scores, scores outside 1-5, rows without a timestamp, repeated ids,
+    content longer than LONG_CONTENT) and subtracts the rows it replaces,
+    so fetched duplicates and unchanged reviews are never counted and the
+    statistics sum to the stored corpus. One REVIEW_QUALITY_STATS row per
+    app carries the run id of `spans.current()`, which joins it to
+    PIPELINE_MONITORING.
+    """
+
+    def __init__(self, task_name="review_update"):
+        self.task_name = task_name
+        self.totals = dict.fromkeys(COUNTERS, 0)
+        self.totals["content_len_max"] = 0
+
+    def ensure_table(self, cursor):
+        """Create REVIEW_QUALITY_STATS; while it is empty, count the stored reviews once as 'backfill'."""
+        cursor.execute(QUALITY_DDL)
+        cursor.execute("SELECT COUNT(*) FROM REVIEW_QUALITY_STATS")
+        if cursor.fetchone()[0] == 0:
+            print("Backfilling review quality statistics from reviews...")
+            cursor.execute(BACKFILL_SQL.format(where=""), (self.task_name, LONG_CONTENT))
+
+    def rebuild(self, cursor, app_ids=None):
+        """Replace the statistics of `app_ids` (every app when None) with one 'backfill' count of reviews.
+
+        For reloads that delete reviews outside record(), such as
+        `landing.py replay --rebuild`; other apps keep their per-run rows.
+        """
+        print("Rebuilding review quality statistics from reviews...")
+        with spans.span("quality"):
+            if app_ids:
+                marks = ", ".join(["%s"] * len(app_ids))
+                cursor.execute(f"DELETE FROM REVIEW_QUALITY_STATS WHERE APP_ID IN ({marks})", tuple(app_ids))
+                cursor.execute(BACKFILL_SQL.format(where=f"WHERE app_id IN ({marks})"),
+                               (self.task_name, LONG_CONTENT, *app_ids))
+            else:
+                cursor.execute("DELETE FROM REVIEW_QUALITY_STATS")
+                cursor.execute(BACKFILL_SQL.format(where=""), (self.task_name, LONG_CONTENT))
+
+    def record(self, cursor, staged=0):
+        """Queue the statistics of what the staged batch will change; call before the MERGE."""
+        with spans.span("quality", rows=staged):
+            cursor.execute(QUALITY_DELTA_SQL, (LONG_CONTENT,))
+            stats = [(app_id, *(int(v or 0) for v in values)) for app_id, *values in cursor.fetchall()]
+            if stats:
+                run_id = spans.current().run_id
+                cursor.executemany(INSERT_QUALITY_SQL, [(run_id, self.task_name, *row) for row in stats])
+            for app_id, *values in stats:
+                for name, value in zip(COUNTERS, values):
+                    self.totals[name] += value
+                self.totals["content_len_max"] = max(self.totals["content_len_max"], values[-1])
+        return stats
+
+    def summary(self):
+        """One-line description of the problems found so far, or None when there were none."""
+        checked = self.totals["rows_checked"]
+        problems = [f"{self.totals[name]:,} {name.replace('_', ' ')}"
+                    for name in COUNTERS[1:8] if self.totals[name] > 0]
+        if not checked or not problems:
+            return None
+        return f"Quality checks over {checked:,} rows: " + ", ".join(problems)
@@ -0,0 +1,126 @@
+# rate_limiter.py
+
+from google_play_scraper.exceptions import NotFoundError
+import os
+import random
+import threading
+import time
+
+
+class RateLimiter:
+    """Adaptive token bucket for Google Play `reviews()` / `app()` calls.
+
+    Tokens refill at `rate` per second up to `burst`. After every call the
+    rate is adjusted AIMD-style: successful calls faster than
+    `target_latency` raise it additively, slow calls shrink it slightly, and
+    errors cut it multiplicatively. Failed calls are retried with
+    full-jitter exponential backoff. One instance can be shared by several
+    threads so they draw from a single request budget; alternatively each
+    worker gets its own limiter with a shared `parent`, so every call must
+    also fit the parent's global budget and errors slow everyone down.
+    """
+
+    def __init__(self, rate=5.0, burst=5, min_rate=0.2, max_rate=50.0,
+                 target_latency=1.5, increase=0.5, slowdown=0.9, decrease=0.5,
+                 max_retries=5, base_delay=0.5, max_delay=60.0, parent=None):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.increase = increase
+        self.slowdown = slowdown
+        self.decrease = decrease
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.parent = parent
+        self.retries = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, parent=None):
+        """Build a limiter from FETCH_RATE / FETCH_BURST / FETCH_MAX_RATE / FETCH_MAX_RETRIES."""
+        return cls(
+            rate=float(os.getenv("FETCH_RATE", 5.0)),
+            burst=int(os.getenv("FETCH_BURST", 5)),
+            max_rate=float(os.getenv("FETCH_MAX_RATE", 50.0)),
+            max_retries=int(os.getenv("FETCH_MAX_RETRIES", 5)),
+            parent=parent,
+        )
+
+    @classmethod
+    def global_from_env(cls):
+        """Build the process-wide budget shared by all workers (FETCH_GLOBAL_RATE / FETCH_GLOBAL_MAX_RATE)."""
+        rate = float(os.getenv("FETCH_GLOBAL_RATE", 20.0))
+        return cls(
+            rate=rate,
+            burst=max(1, int(rate)),
+            max_rate=float(os.getenv("FETCH_GLOBAL_MAX_RATE", 200.0)),
+        )
+
+    def acquire(self):
+        """Block until a token is available, then take it (and one from the parent)."""
+        self._acquire_own()
+        if self.parent is not None:
+            self.parent.acquire()
+
+    def _acquire_own(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def record_success(self, latency):
+        """Speed up after a fast call, ease off after a slow one."""
+        with self._lock:
+            if latency <= self.target_latency:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            else:
+                self.rate = max(self.min_rate, self.rate * self.slowdown)
+        if self.parent is not None:
+            self.parent.record_success(latency)
+
+    def record_error(self):
+        """Cut the rate and drain the bucket after a throttled or failed call."""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = 0.0
+            self.retries += 1
+        if self.parent is not None:
+            self.parent.record_error()
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff delay for the given retry attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        """Call `fn` under the rate limit, retrying retryable errors with backoff."""
+        attempt = 0
+        while True:
+            self.acquire()
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except NotFoundError:
+                raise
+            except Exception as e:
+                self.record_error()
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                print(f"{getattr(fn, '__name__', 'call')}() failed ({e}); retrying in {delay:.1f}s "
+                      f"[attempt {attempt + 1}/{self.max_retries}, rate {self.rate:.2f}/s]")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.record_success(time.monotonic() - start)
+            return result
@@ -0,0 +1,336 @@
+# review_cache.py
+
+import argparse
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+from ingest_pipeline import DEFAULT_APP_ID
+from loader import dialect_of
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # only needed by the analysis cache
+    pa = pc = pq = None
+
+
+REVIEW_CACHE_DIR = os.getenv("REVIEW_CACHE_DIR", "review_cache")
+META = "_cache.json"
+CACHE_VERSION = 1
+BATCH_ROWS = int(os.getenv("REVIEW_CACHE_BATCH_ROWS", 100_000))
+MAX_PARTS = int(os.getenv("REVIEW_CACHE_MAX_PARTS", 8))    # appended parts before they are compacted into one
+
+# Columns analysis.py reads, in warehouse order. content_hash and anything
+# added later stay in the warehouse
+COLUMNS = ("REVIEW_ID", "USER_NAME", "CONTENT", "SCORE", "CREATED_AT", "APP_VERSION", "APP_ID", "SENTIMENT")
+
+# Columns kept as pandas categoricals in memory; other dictionary columns are
+# only dictionary-encoded on disk
+CATEGORICAL = ("APP_ID",)
+
+# Columns filled in after a row is written (`sentiment.py backfill`). Such
+# updates do not move created_at, so their per-app non-null counts are
+# compared along with the row counts
+BACKFILLED = ("SENTIMENT",)
+
+
+def cache_schema(columns=COLUMNS):
+    """Compact Arrow types the cached columns are stored and returned with."""
+    if pa is None:
+        raise ImportError("pyarrow is required for the review cache: pip install pyarrow")
+    types = {
+        "REVIEW_ID": pa.string(),
+        "USER_NAME": pa.string(),
+        "CONTENT": pa.string(),
+        "SCORE": pa.int8(),
+        "CREATED_AT": pa.timestamp("us"),
+        "APP_VERSION": pa.dictionary(pa.int32(), pa.string()),
+        "APP_ID": pa.dictionary(pa.int32(), pa.string()),
+        "SENTIMENT": pa.float64(),
+    }
+    return pa.schema([(name, types.get(name, pa.string())) for name in columns])
+
+
+def select_sql(columns, where=None):
+    sql = f"SELECT {', '.join(c.lower() for c in columns)} FROM reviews"
+    return f"{sql} WHERE {where}" if where else sql
+
+
+def counts_sql(columns, where=None):
+    """Per-app COUNT(*) and non-null counts of the BACKFILLED columns among `columns`."""
+    counts = "".join(f", COUNT({c.lower()})" for c in BACKFILLED if c in columns)
+    sql = f"SELECT COALESCE(app_id, ''), COUNT(*){counts} FROM reviews"
+    return f"{sql}{f' WHERE {where}' if where else ''} GROUP BY COALESCE(app_id, '')"
+
+
+def arrow_batches(cursor, batch_rows=BATCH_ROWS):
+    """Yield the result of the last execute() as Arrow record batches.
+
+    Snowflake hands over its result chunks as Arrow and DuckDB streams
+    record batches natively, so neither builds a Python object per value.
+    Other DBAPI cursors are read with fetchmany().
+    """
+    dialect = dialect_of(cursor)
+    if dialect == "snowflake":
+        for table in cursor.fetch_arrow_batches():
+            yield from table.to_batches()
+    elif dialect == "duckdb":
+        # fetch_record_batch() is deprecated in current duckdb; older releases only have it
+        reader = getattr(cursor, "to_arrow_reader", None) or cursor.fetch_record_batch
+        yield from reader(batch_rows)
+    else:
+        names = [d[0] for d in cursor.description]
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            yield pa.RecordBatch.from_arrays([pa.array(col) for col in zip(*rows)], names=names)
+
+
+def compact(batch, schema):
+    """Cast one fetched batch, whatever the warehouse's column names and types, to `schema`."""
+    arrays = [batch.column(i).cast(field.type, safe=False) for i, field in enumerate(schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def latest(tables, schema):
+    """Concatenate `tables` (oldest first), keeping only the newest copy of each REVIEW_ID."""
+    tables = [t for t in tables if t.num_rows]
+    if not tables:
+        return schema.empty_table()
+    kept, newer = [], None
+    for table in reversed(tables):
+        if newer is not None:
+            table = table.filter(pc.invert(pc.is_in(table["REVIEW_ID"], value_set=newer)))
+        kept.append(table)
+        ids = table["REVIEW_ID"].combine_chunks()
+        newer = ids if newer is None else pa.concat_arrays([newer, ids])
+    return pa.concat_tables(reversed(kept))
+
+
+def to_frame(table):
+    """pandas DataFrame of a cached table: Arrow-backed strings, int8 scores, CATEGORICAL as categories."""
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type) and field.name not in CATEGORICAL:
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+class ReviewCache:
+    """Local Parquet copy of the review columns analysis.py needs, kept up to date incrementally.
+
+    The first `load()` streams the projected columns out of reviews as
+    Arrow batches into one Parquet file. Later loads fetch, per app, only
+    rows whose created_at is at or after that app's newest cached review
+    (edited reviews move forward, so they come back too) and append them
+    as a new part; the newest copy of a review id wins. Per-app counts of
+    rows and of filled BACKFILLED columns then catch rows that arrived
+    out of order, were deleted or were scored later, and only those apps
+    are refetched in full. `_cache.json` lists the
+    parts and the per-app watermarks, and is replaced only after
+    the parts it names are fully written. With an `app_id` every query is
+    restricted to that app and the cache lives in its own `path/<app_id>/`;
+    `app_id=None` caches every app under `path`.
+    """
+
+    def __init__(self, path=REVIEW_CACHE_DIR, columns=COLUMNS, batch_rows=BATCH_ROWS, app_id=DEFAULT_APP_ID):
+        self.app_id = app_id
+        if app_id is not None:
+            path = os.path.join(path, "".join(c if c.isalnum() or c in "-_." else "_" for c in app_id))
+        self.path = path
+        self.columns = tuple(c.upper() for c in columns)
+        for required in ("REVIEW_ID", "CREATED_AT", "APP_ID"):
+            if required not in self.columns:
+                self.columns += (required,)
+        self.schema = cache_schema(self.columns)
+        self.batch_rows = batch_rows
+        self.fetched = 0
+
+    def _scoped(self, where=None, params=None):
+        """Restrict a query's WHERE clause and params to this cache's app, if it has one."""
+        if self.app_id is None:
+            return where, params
+        return f"app_id = %s AND ({where})" if where else "app_id = %s", [self.app_id, *(params or ())]
+
+    def _meta_path(self):
+        return os.path.join(self.path, META)
+
+    def _read_meta(self):
+        try:
+            with open(self._meta_path()) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if meta.get("version") != CACHE_VERSION or tuple(meta.get("columns", ())) != self.columns:
+            return None
+        return meta
+
+    def _write_meta(self, parts, table):
+        watermarks = {}
+        if table is not None and table.num_rows:
+            apps = table["APP_ID"].cast(pa.string()).fill_null("")
+            grouped = pa.table({"app_id": apps, "created_at": table["CREATED_AT"]}).group_by("app_id").aggregate(
+                [("created_at", "max")])
+            for app_id, newest in zip(grouped["app_id"].to_pylist(), grouped["created_at_max"].to_pylist()):
+                watermarks[app_id] = newest.isoformat() if newest else None
+        meta = {"version": CACHE_VERSION, "columns": list(self.columns), "parts": parts,
+                "rows": table.num_rows if table is not None else 0, "watermarks": watermarks,
+                "updated_at": datetime.now().isoformat(timespec="seconds")}
+        tmp = self._meta_path() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=1)
+        os.replace(tmp, self._meta_path())
+        return meta
+
+    def _fetch(self, cursor, where=None, params=None):
+        """Stream a projected query into a new part file; return (part name, table)."""
+        where, params = self._scoped(where, params)
+        cursor.execute(select_sql(self.columns, where), params)
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        batches = []
+        with pq.ParquetWriter(os.path.join(self.path, name), self.schema, compression="zstd") as writer:
+            for batch in arrow_batches(cursor, self.batch_rows):
+                batch = compact(batch, self.schema)
+                writer.write_batch(batch)
+                batches.append(batch)
+        self.fetched += sum(b.num_rows for b in batches)
+        return name, pa.Table.from_batches(batches, schema=self.schema)
+
+    def _write_part(self, table):
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        pq.write_table(table, os.path.join(self.path, name), compression="zstd")
+        return name
+
+    def _read_parts(self, parts):
+        return [pq.read_table(os.path.join(self.path, part), schema=self.schema) for part in parts]
+
+    def _remove(self, parts):
+        for part in parts:
+            try:
+                os.remove(os.path.join(self.path, part))
+            except OSError:
+                pass
+
+    def load(self, cursor, refresh=False):
+        """Bring the cache up to date with reviews and return it as an Arrow table."""
+        os.makedirs(self.path, exist_ok=True)
+        self.fetched = 0
+        meta = None if refresh else self._read_meta()
+        if meta is None:
+            print("Building the review cache from reviews...")
+            name, table = self._fetch(cursor)
+            self._remove(self._orphans([name]))
+            self._write_meta([name], table)
+            return table
+
+        parts = list(meta["parts"])
+        tables = self._read_parts(parts)
+
+        # Rows at or after each app's watermark, and every row of apps not seen yet
+        known = {app: at for app, at in meta["watermarks"].items() if at}
+        clauses = ["(COALESCE(app_id, '') = %s AND created_at >= %s)"] * len(known)
+        params = [v for app, at in known.items() for v in (app, datetime.fromisoformat(at))]
+        if known:
+            clauses.append(f"COALESCE(app_id, '') NOT IN ({', '.join(['%s'] * len(known))})")
+            params += list(known)
+        where, params = self._scoped(" OR ".join(clauses) or None, params)
+        cursor.execute(select_sql(self.columns, where), params or None)
+        delta = pa.Table.from_batches([compact(b, self.schema) for b in arrow_batches(cursor, self.batch_rows)],
+                                      schema=self.schema)
+        self.fetched += delta.num_rows
+        delta = self._changed(latest(tables, self.schema), delta)
+        if delta.num_rows:
+            parts.append(self._write_part(delta))
+            tables.append(delta)
+        table = latest(tables, self.schema)
+
+        # Apps whose counts drifted (older rows loaded late, rows deleted,
+        # sentiment backfilled) are replaced whole
+        where, params = self._scoped()
+        cursor.execute(counts_sql(self.columns, where), params)
+        expected = {app: tuple(counts) for app, *counts in cursor.fetchall()}
+        tracked = [c for c in BACKFILLED if c in self.columns]
+        apps = table["APP_ID"].cast(pa.string()).fill_null("")
+        grouped = pa.table({"app_id": apps, **{c: table[c] for c in tracked}}).group_by("app_id").aggregate(
+            [([], "count_all")] + [(c, "count") for c in tracked])
+        cached = {app: tuple(counts) for app, *counts in zip(
+            *(grouped[name].to_pylist() for name in ["app_id", "count_all"] + [f"{c}_count" for c in tracked]))}
+        stale = sorted(app for app in set(expected) | set(cached) if expected.get(app) != cached.get(app))
+        if stale:
+            print(f"Refetching {len(stale)} app(s) whose cached counts differ: {', '.join(stale)}")
+            placeholders = ", ".join(["%s"] * len(stale))
+            name, fresh = self._fetch(cursor, f"COALESCE(app_id, '') IN ({placeholders})", stale)
+            keep = pc.invert(pc.is_in(apps, value_set=pa.array(stale)))
+            table = pa.concat_tables([table.filter(keep), fresh])
+            # Earlier parts still hold the replaced apps, so this state is only written compacted
+            parts.append(name)
+
+        if stale or len(parts) > MAX_PARTS:
+            self._write_meta([self._write_part(table)], table)
+            self._remove(parts)
+        elif delta.num_rows:
+            self._write_meta(parts, table)
+        return table
+
+    def _changed(self, cached, delta):
+        """Rows of `delta` that are new or differ from their cached copy.
+
+        The watermark query returns each app's newest cached reviews again
+        (created_at >= watermark keeps reviews sharing that timestamp), so
+        without this every load would append a part.
+        """
+        if not delta.num_rows or not cached.num_rows:
+            return delta
+        seen = pc.is_in(delta["REVIEW_ID"], value_set=cached["REVIEW_ID"].combine_chunks())
+        if not pc.any(seen).as_py():
+            return delta
+        old = cached.filter(pc.is_in(cached["REVIEW_ID"], value_set=delta["REVIEW_ID"].combine_chunks()))
+        old = {row["REVIEW_ID"]: row for row in old.to_pylist()}
+        rows = delta.to_pylist()
+        return delta.filter(pa.array([old.get(row["REVIEW_ID"]) != row for row in rows]))
+
+    def _orphans(self, keep):
+        return [f for f in os.listdir(self.path) if f.startswith("part-") and f not in keep]
+
+
+def load_reviews(conn=None, columns=COLUMNS, refresh=False, path=REVIEW_CACHE_DIR, app_id=DEFAULT_APP_ID):
+    """The reviews columns in `columns` of `app_id` as a DataFrame, through the local cache.
+
+    `conn` defaults to the shared warehouse connection; `app_id=None` loads
+    every app. Pass `refresh=True` (or delete REVIEW_CACHE_DIR) to rebuild
+    the cache from scratch.
+    """
+    if conn is None:
+        import warehouse
+
+        conn = warehouse.get_connection()
+    started = time.perf_counter()
+    cache = ReviewCache(path, columns, app_id=app_id)
+    cursor = conn.cursor()
+    try:
+        table = cache.load(cursor, refresh=refresh)
+    finally:
+        cursor.close()
+    wanted = [c.upper() for c in columns]
+    df = to_frame(table.select(wanted))
+    print(f"Loaded {len(df):,} reviews ({cache.fetched:,} fetched from the warehouse) "
+          f"in {time.perf_counter() - started:.1f}s.")
+    return df
+
+
+def main(argv=None):
+    """Command line: `python review_cache.py [--refresh] [--app-id ID]` brings the analysis cache up to date."""
+    parser = argparse.ArgumentParser(description="Update the local review cache used by analysis.py.")
+    parser.add_argument("--refresh", action="store_true", help="rebuild the cache from scratch")
+    parser.add_argument("--app-id", default=DEFAULT_APP_ID, help=f"app to cache (default {DEFAULT_APP_ID})")
+    args = parser.parse_args(argv)
+    df = load_reviews(refresh=args.refresh, app_id=args.app_id)
+    print(f"{REVIEW_CACHE_DIR}: {len(df):,} rows, {df.memory_usage(deep=True).sum() / 1e6:,.1f} MB in memory")
+
+
+if __name__ == "__main__":
+    main()
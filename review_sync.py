@@ -9,18 +9,25 @@ Original file is located at
 Install packages
 """
 
-!pip install -q google-play-scraper snowflake-connector-python pandas tqdm
+!pip install -q google-play-scraper snowflake-connector-python pandas tqdm vaderSentiment numpy pyarrow duckdb
 
 """Import libraries"""
 
-from google_play_scraper import reviews, Sort, app
-import pandas as pd
-import snowflake.connector
-from datetime import datetime, timezone
 from tqdm import tqdm
-import time
 import os
 
+from aggregates import aggregates_from_env
+from checkpoint import resume_checkpoint, save_checkpoint, clear_checkpoint
+from ingest_pipeline import STAGING_DDL, commit_batch, ensure_reviews_table, fetch_pages, run_pipeline
+from known_ids import open_known_reviews
+from landing import landing_from_env
+from loader import load_mode_from_env
+from quality import quality_from_env
+from rate_limiter import RateLimiter
+from review_update import APP_METADATA_DDL, APP_METADATA_MIGRATIONS, INSERT_METADATA_SQL, fetch_app_metadata
+from sentiment import enrichment_from_env
+import warehouse
+
 """Define Snowflake connection parameters"""
 
 conn_params = {
@@ -32,183 +39,110 @@ conn_params = {
     "schema": "PUBLIC",
     "role": "ACCOUNTADMIN"
 }
+warehouse.configure(**conn_params)
 
-"""Fetch reviews from Google Play"""
-
-print("Fetching reviews from Google Play...")
-
-app_id = "com.openai.chatgpt"
-buf, token, first = [], None, True
-pbar = tqdm(desc="Fetching", unit="reviews")
-
-while True:
-    if first:
-        res, token = reviews(app_id, lang="en", country="us", sort=Sort.NEWEST, count=200)
-        first = False
-    else:
-        if token is None:
-            break
-        res, token = reviews(app_id, continuation_token=token)
-
-    if not res:
-        break
-
-    buf.extend(res)
-    pbar.update(len(res))
-
-    time.sleep(0.2)
-
-pbar.close()
-df = pd.DataFrame(buf)
-print(f"Total reviews fetched: {len(df):,}")
-
-"""Clean and format data"""
-
-# Convert 'at' column to datetime
-df['at'] = pd.to_datetime(df['at'], errors='coerce')
+"""Fetch reviews from Google Play and upload to Snowflake
 
-# Rename columns for clarity
-df.rename(columns={
-    "reviewId": "review_id",
-    "userName": "user_name",
-    "content": "content",
-    "score": "score",
-    "at": "created_at",
-    "appVersion": "app_version"
-}, inplace=True)
-
-# Keep only necessary fields
-df = df[[
-    "review_id", "user_name", "content",
-    "score", "created_at", "app_version"
-]]
-
-"""Upload to Snowflake"""
+Pages stream from a background fetch thread through a bounded queue. Each
+micro-batch is merged into `reviews` and checkpointed while fetching
+continues, so re-running this cell after a crash resumes from the last
+committed page instead of page 1.
+"""
 
-print("Uploading data to Snowflake (batch size = 200,000)...")
+print("Fetching reviews from Google Play and uploading to Snowflake...")
 
-conn = snowflake.connector.connect(**conn_params)
+app_id = "com.openai.chatgpt"
+checkpoint_name = f"review_sync_{app_id}_en_us"
+state, start_token = resume_checkpoint(checkpoint_name)
+if state:
+    start_page = state["pages_uploaded"]
+    print(f"Resuming from checkpoint after page {start_page} ({state['rows_uploaded']:,} rows already uploaded).")
+else:
+    start_page = 0
+
+conn = warehouse.get_connection()
 cursor = conn.cursor()
 
 # Step 1: Create target table if not exists
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS reviews (
-    review_id STRING PRIMARY KEY,
-    user_name STRING,
-    content TEXT,
-    score INT,
-    created_at TIMESTAMP,
-    app_version STRING
+ensure_reviews_table(cursor)
+
+# Step 2: Create staging table (temporary) and load the filter of reviews
+# already merged, so a re-run does not stage them again
+cursor.execute(STAGING_DDL)
+known_filter = open_known_reviews(cursor)
+landing = landing_from_env()
+quality = quality_from_env("review_sync")
+if quality is not None:
+    quality.ensure_table(cursor)
+aggregates = aggregates_from_env()
+if aggregates is not None:
+    aggregates.ensure_tables(cursor)
+enrichment = enrichment_from_env()
+if enrichment is not None:
+    enrichment.ensure_table(cursor)
+
+# Step 3: Fetch, merge and checkpoint each micro-batch
+limiter = RateLimiter.from_env()
+load_mode = load_mode_from_env()
+pbar = tqdm(desc="Fetching", unit="reviews")
+progress = {"pages": start_page, "rows": state["rows_uploaded"] if state else 0}
+
+def on_page(page):
+    progress["pages"] = page.number
+    pbar.update(len(page.rows))
+    if landing is not None:
+        landing.append(page.rows)
+
+def flush(batch, pages):
+    last_page = pages[-1]
+    print(f"\nMerging batch through page {last_page.number}: {len(batch):,} records...")
+    if landing is not None:
+        landing.flush()
+    counts = commit_batch(conn, cursor, batch, load_mode, known_filter, quality, aggregates,
+                          sentiment=enrichment)
+    print(f"{counts.inserted:,} inserted, {counts.updated:,} updated, {counts.unchanged:,} unchanged")
+    progress["rows"] += len(batch)
+    save_checkpoint(checkpoint_name, last_page.token, progress["pages"], last_page.number, progress["rows"])
+
+# A full sync pages through the whole history: known reviews are dropped,
+# but a page of them does not end the sync, since older ones may be missing
+total = run_pipeline(
+    fetch_pages(app_id, lang="en", country="us", start_token=start_token, start_page=start_page, limiter=limiter,
+                known_filter=known_filter, stop_on_known=False),
+    flush,
+    on_page=on_page,
 )
-""")
-
-# Step 2: Create staging table (temporary)
-cursor.execute("""
-CREATE OR REPLACE TEMPORARY TABLE reviews_staging LIKE reviews;
-""")
-
-# Step 3: Prepare data
-records = []
-for _, row in df.iterrows():
-    created_at = row["created_at"].strftime("%Y-%m-%d %H:%M:%S") if pd.notnull(row["created_at"]) else None
-    records.append((
-        row["review_id"],
-        row["user_name"],
-        row["content"],
-        int(row["score"]) if pd.notnull(row["score"]) else None,
-        created_at,
-        row["app_version"]
-    ))
-
-print(f"Total records to insert: {len(records):,}")
-
-# Step 4: Batch insert
-BATCH_SIZE = 200000
-insert_sql = """
-INSERT INTO reviews_staging (
-    review_id, user_name, content, score, created_at, app_version
-) VALUES (%s, %s, %s, %s, %s, %s)
-"""
-
-for i in range(0, len(records), BATCH_SIZE):
-    batch = records[i:i + BATCH_SIZE]
-    print(f"Inserting batch {i // BATCH_SIZE + 1}: {len(batch):,} records...")
-    cursor.executemany(insert_sql, batch)
-
-# Step 5: Merge from staging to main table
-print("Merging data into reviews table...")
-
-merge_sql = """
-MERGE INTO reviews AS target
-USING reviews_staging AS source
-ON target.review_id = source.review_id
-WHEN MATCHED THEN UPDATE SET
-    content = source.content,
-    score = source.score,
-    created_at = source.created_at,
-    app_version = source.app_version
-WHEN NOT MATCHED THEN INSERT (
-    review_id, user_name, content, score, created_at, app_version
-) VALUES (
-    source.review_id, source.user_name, source.content,
-    source.score, source.created_at, source.app_version
-);
-"""
-cursor.execute(merge_sql)
+pbar.close()
+clear_checkpoint(checkpoint_name)
+if known_filter is not None:
+    known_filter.save()
+    print(f"Skipped {known_filter.skipped:,} reviews already in the warehouse.")
+print(f"Total reviews fetched: {total:,}")
+if quality is not None and quality.summary():
+    print(quality.summary())
 
 
 # Finalize
 conn.commit()
 cursor.close()
-conn.close()
 print("\n Data upload completed.")
 
 """app_metadata Table"""
 
-# Commented out IPython magic to ensure Python compatibility.
 print("Fetching app metadata...")
-conn = snowflake.connector.connect(**conn_params)
+conn = warehouse.get_connection()
 cursor = conn.cursor()
 
-metadata = app(app_id, lang="en", country="us")
-fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-
-# Prepare metadata mapping for your table schema
-metadata_row = {
-    "APP_VERSION": metadata.get("version"),
-    "TITLE": metadata.get("title"),
-    "DEVELOPER": metadata.get("developer", "OpenAI"),
-    "GENRE": metadata.get("genre", "Productivity"),
-    "SCORE": metadata.get("score"),
-    "RATINGS_COUNT": metadata.get("ratings"),
-    "REVIEWS_COUNT": metadata.get("reviews"),
-    "INSTALLS": metadata.get("installs"),
-    "REAL_INSTALLS": metadata.get("realInstalls"),
-    "IS_FREE": metadata.get("free"),
-    "PRICE": metadata.get("price"),
-    "CURRENCY": metadata.get("currency"),
-    "SALE": metadata.get("sale", False),
-    "OFFERS_IAP": metadata.get("offersIAP"),
-    "IAP_PRICE_RANGE": metadata.get("inAppProductPrice"),
-    "URL": metadata.get("url", "https://play.google.com/store/apps/details?id=com.openai.chatgpt"),
-    "FETCHED_AT": fetched_at
-}
+metadata_row = fetch_app_metadata(app_id, limiter)
 
-# Insert a new metadata record into existing table
-cursor = conn.cursor()
-cursor.execute("""
-INSERT INTO APP_METADATA (
-    APP_VERSION, TITLE, DEVELOPER, GENRE, SCORE, RATINGS_COUNT, REVIEWS_COUNT,
-    INSTALLS, REAL_INSTALLS, IS_FREE, PRICE, CURRENCY, SALE, OFFERS_IAP,
-    IAP_PRICE_RANGE, URL, FETCHED_AT
-) VALUES (
-#     %(APP_VERSION)s, %(TITLE)s, %(DEVELOPER)s, %(GENRE)s, %(SCORE)s, %(RATINGS_COUNT)s, %(REVIEWS_COUNT)s,
-#     %(INSTALLS)s, %(REAL_INSTALLS)s, %(IS_FREE)s, %(PRICE)s, %(CURRENCY)s, %(SALE)s, %(OFFERS_IAP)s,
-#     %(IAP_PRICE_RANGE)s, %(URL)s, %(FETCHED_AT)s
-)
-""", metadata_row)
+# Insert a new metadata record
+cursor.execute(APP_METADATA_DDL)
+for sql in APP_METADATA_MIGRATIONS:
+    cursor.execute(sql)
+cursor.execute(INSERT_METADATA_SQL, metadata_row)
+conn.commit()
 
 cursor.close()
-conn.close()
+warehouse.close()
 
 print("ChatGPT app metadata successfully inserted into APP_METADATA table.")
\ No newline at end of file
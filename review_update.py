@@ -1,230 +1,280 @@
 # review_update.py
 
-from google_play_scraper import reviews, Sort, app
-import pandas as pd
-import snowflake.connector
+from google_play_scraper import app, reviews
 from datetime import datetime, timedelta, timezone
 from tqdm import tqdm
-import time
+import argparse
 import os
 import sys
+import time
 import traceback
 
-
-def main():
-    """Fetch new Google Play reviews and upload them to Snowflake."""
+from aggregates import aggregates_from_env
+from checkpoint import resume_checkpoint, save_checkpoint, clear_checkpoint
+from concurrent.futures import ThreadPoolExecutor
+from harvester import (
+    Harvester, apps_from_env, build_shards, load_watermarks,
+    locales_from_env, save_watermarks, shard_key,
+)
+from ingest_pipeline import DEFAULT_APP_ID, STAGING_DDL, commit_batch, ensure_reviews_table, run_pipeline
+from known_ids import open_known_reviews
+from landing import landing_from_env
+from loader import load_mode_from_env
+import profiling
+from quality import quality_from_env
+from rate_limiter import RateLimiter
+from sentiment import enrichment_from_env
+import spans
+import warehouse
+
+
+APP_METADATA_DDL = """
+CREATE TABLE IF NOT EXISTS APP_METADATA (
+    APP_ID STRING,
+    APP_VERSION STRING,
+    TITLE STRING,
+    DEVELOPER STRING,
+    GENRE STRING,
+    SCORE FLOAT,
+    RATINGS_COUNT INT,
+    REVIEWS_COUNT INT,
+    INSTALLS STRING,
+    REAL_INSTALLS INT,
+    IS_FREE BOOLEAN,
+    PRICE FLOAT,
+    CURRENCY STRING,
+    SALE BOOLEAN,
+    OFFERS_IAP BOOLEAN,
+    IAP_PRICE_RANGE STRING,
+    URL STRING,
+    FETCHED_AT TIMESTAMP
+)
+CLUSTER BY (APP_ID)
+"""
+
+APP_METADATA_MIGRATIONS = [
+    f"ALTER TABLE APP_METADATA ADD COLUMN IF NOT EXISTS APP_ID STRING DEFAULT '{DEFAULT_APP_ID}'",
+    "ALTER TABLE APP_METADATA CLUSTER BY (APP_ID)",
+]
+
+INSERT_METADATA_SQL = """
+INSERT INTO APP_METADATA (
+    APP_ID, APP_VERSION, TITLE, DEVELOPER, GENRE, SCORE, RATINGS_COUNT, REVIEWS_COUNT,
+    INSTALLS, REAL_INSTALLS, IS_FREE, PRICE, CURRENCY, SALE, OFFERS_IAP,
+    IAP_PRICE_RANGE, URL, FETCHED_AT
+) VALUES (
+    %(APP_ID)s, %(APP_VERSION)s, %(TITLE)s, %(DEVELOPER)s, %(GENRE)s, %(SCORE)s, %(RATINGS_COUNT)s, %(REVIEWS_COUNT)s,
+    %(INSTALLS)s, %(REAL_INSTALLS)s, %(IS_FREE)s, %(PRICE)s, %(CURRENCY)s, %(SALE)s, %(OFFERS_IAP)s,
+    %(IAP_PRICE_RANGE)s, %(URL)s, %(FETCHED_AT)s
+)
+"""
+
+
+def fetch_app_metadata(app_id, limiter, app_fn=app):
+    """Fetch one app's Google Play listing as an APP_METADATA row."""
+    metadata = limiter.call(app_fn, app_id, lang="en", country="us")
+    fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+    return {
+        "APP_ID": app_id,
+        "APP_VERSION": metadata.get("version"),
+        "TITLE": metadata.get("title"),
+        "DEVELOPER": metadata.get("developer"),
+        "GENRE": metadata.get("genre"),
+        "SCORE": metadata.get("score"),
+        "RATINGS_COUNT": metadata.get("ratings"),
+        "REVIEWS_COUNT": metadata.get("reviews"),
+        "INSTALLS": metadata.get("installs"),
+        "REAL_INSTALLS": metadata.get("realInstalls"),
+        "IS_FREE": metadata.get("free"),
+        "PRICE": metadata.get("price"),
+        "CURRENCY": metadata.get("currency"),
+        "SALE": metadata.get("sale", False),
+        "OFFERS_IAP": metadata.get("offersIAP"),
+        "IAP_PRICE_RANGE": metadata.get("inAppProductPrice"),
+        "URL": metadata.get("url", f"https://play.google.com/store/apps/details?id={app_id}"),
+        "FETCHED_AT": fetched_at
+    }
+
+
+def main(app_ids=None, load_mode=None, reviews_fn=reviews, app_fn=app):
+    """Fetch new Google Play reviews for every app in `app_ids` and upload them to Snowflake.
+
+    Defaults to the apps listed in APP_IDS (the ChatGPT app when unset).
+    `load_mode` picks how batches reach the staging table ("insert" or
+    "parquet"); it defaults to LOAD_MODE. `reviews_fn` and `app_fn` replace
+    the Google Play calls, e.g. with `fake_play.FakePlayStore` for offline runs.
+    """
     rows_loaded = 0  # Default in case no new data
+    setup_started = time.perf_counter()
     try:
-        print("Connecting to Snowflake...")
-
-        conn_params = {
-            "user": os.getenv("SNOWFLAKE_USER", "USER1204"),
-            "password": os.environ["SNOWFLAKE_PASSWORD"],
-            "account": os.getenv("SNOWFLAKE_ACCOUNT", "XUZXIIE-EAC06737"),
-            "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE", "COMPUTE_WH"),
-            "database": os.getenv("SNOWFLAKE_DATABASE", "GPT_REVIEWS_DB"),
-            "schema": os.getenv("SNOWFLAKE_SCHEMA", "PUBLIC"),
-            "role": "ACCOUNTADMIN"
-        }
-
-        conn = snowflake.connector.connect(**conn_params)
-        cursor = conn.cursor()
-
-        # Ensure target table exists
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS reviews (
-            review_id STRING PRIMARY KEY,
-            user_name STRING,
-            content TEXT,
-            score INT,
-            created_at TIMESTAMP,
-            app_version STRING
-        )
-        """)
-
-        cursor.execute("SELECT MAX(created_at) FROM reviews")
-        last_uploaded = cursor.fetchone()[0]
-        if last_uploaded is None:
-            last_uploaded = datetime.utcnow() - timedelta(days=30)
-
-        print(f"Last review timestamp: {last_uploaded}")
-
-        # Fetch reviews
-        print("Fetching new reviews from Google Play...")
-        app_id = "com.openai.chatgpt"
-        buf, token, first = [], None, True
-        pbar = tqdm(desc="Fetching", unit="reviews")
-
-        while True:
-            if first:
-                res, token = reviews(app_id, lang="en", country="us", sort=Sort.NEWEST, count=200)
-                first = False
-            else:
-                if token is None:
-                    break
-                res, token = reviews(app_id, continuation_token=token)
-
-            if not res:
-                break
-
-            new_data = [r for r in res if r["at"] > last_uploaded]
-            if not new_data:
-                break
-
-            buf.extend(new_data)
-            pbar.update(len(new_data))
-            time.sleep(0.2)
-
-        pbar.close()
-
-        if not buf:
-            print("No new reviews to upload.")
-            rows_loaded = 0
-        else:
-            df = pd.DataFrame(buf)
-            rows_loaded = len(df)
-            print(f"Fetched {rows_loaded:,} new reviews.")
-
-            # Clean
-            df['at'] = pd.to_datetime(df['at'], errors='coerce')
-            df.rename(columns={
-                "reviewId": "review_id",
-                "userName": "user_name",
-                "content": "content",
-                "score": "score",
-                "at": "created_at",
-                "appVersion": "app_version"
-            }, inplace=True)
-
-            df = df[[
-                "review_id", "user_name", "content",
-                "score", "created_at", "app_version"
-            ]]
+        # Shared session, also used by monitor_pipeline for logging afterwards;
+        # if it expires mid-run, warehouse.cursor() drops it so the next use reconnects
+        with warehouse.cursor() as cursor:
+            conn = warehouse.get_connection()
+
+            # Ensure target table exists
+            ensure_reviews_table(cursor)
+
+            app_ids = app_ids or apps_from_env()
+            load_mode = load_mode or load_mode_from_env()
+            shards = build_shards(app_ids, locales_from_env())
+
+            # Per-shard watermarks from REVIEW_WATERMARKS. Only a shard seen for the
+            # first time looks at reviews, once, to start from its app's newest
+            # stored review (or 30 days back for an app not yet tracked)
+            fallback = datetime.utcnow() - timedelta(days=30)
+
+            def bootstrap(shard):
+                cursor.execute("SELECT MAX(created_at) FROM reviews WHERE app_id = %s", (shard.app_id,))
+                return cursor.fetchone()[0] or fallback
+
+            watermarks = load_watermarks(cursor, shards, bootstrap)
+            since = {shard: watermark.last_at for shard, watermark in watermarks.items()}
+            known = {shard: watermark.recent for shard, watermark in watermarks.items()}
+
+            # Resume interrupted shards: keep their original watermark, because the
+            # batches they already committed are in reviews
+            start, resumed_newest, progress = {}, {}, {}
+            for shard in shards:
+                state, token = resume_checkpoint(f"review_update_{shard_key(shard)}")
+                progress[shard] = {"pages": 0, "rows": 0}
+                if not state:
+                    continue
+                since[shard] = datetime.fromisoformat(state["since"])
+                start[shard] = (token, state["pages_uploaded"])
+                if state.get("newest"):
+                    resumed_newest[shard] = datetime.fromisoformat(state["newest"])
+                progress[shard] = {"pages": state["pages_uploaded"], "rows": state["rows_uploaded"]}
+                print(f"Resuming {shard_key(shard)} after page {state['pages_uploaded']} "
+                      f"({state['rows_uploaded']:,} rows already uploaded).")
+
+            for shard in shards:
+                print(f"Last review timestamp for {shard_key(shard)}: {since[shard]}")
+
+            # Fingerprints of reviews already merged, so unchanged rows are
+            # dropped before staging
+            known_filter = open_known_reviews(cursor)
+            # Local Parquet copy of every fetched page, for replays
+            landing = landing_from_env()
+            # Null/range/duplicate checks on every batch, logged per run
+            quality = quality_from_env()
+            if quality is not None:
+                quality.ensure_table(cursor)
+            # Monthly and per-version summaries, updated by every MERGE
+            aggregates = aggregates_from_env()
+            if aggregates is not None:
+                aggregates.ensure_tables(cursor)
 
             # Create staging table
-            cursor.execute("CREATE OR REPLACE TEMPORARY TABLE reviews_staging LIKE reviews;")
-
-            records = []
-            for _, row in df.iterrows():
-                created_at = row["created_at"].strftime("%Y-%m-%d %H:%M:%S") if pd.notnull(row["created_at"]) else None
-                records.append((
-                    row["review_id"],
-                    row["user_name"],
-                    row["content"],
-                    int(row["score"]) if pd.notnull(row["score"]) else None,
-                    created_at,
-                    row["app_version"]
-                ))
-
-            print(f"Total records to insert: {len(records):,}")
-            BATCH_SIZE = 200000
-
-            insert_sql = """
-            INSERT INTO reviews_staging (
-                review_id, user_name, content, score, created_at, app_version
-            ) VALUES (%s, %s, %s, %s, %s, %s)
-            """
-
-            for i in range(0, len(records), BATCH_SIZE):
-                batch = records[i:i + BATCH_SIZE]
-                print(f"Inserting batch {i // BATCH_SIZE + 1}: {len(batch):,} records...")
-                cursor.executemany(insert_sql, batch)
-
-            print("Merging into reviews table...")
-            merge_sql = """
-            MERGE INTO reviews AS target
-            USING reviews_staging AS source
-            ON target.review_id = source.review_id
-            WHEN MATCHED THEN UPDATE SET
-                content = source.content,
-                score = source.score,
-                created_at = source.created_at,
-                app_version = source.app_version
-            WHEN NOT MATCHED THEN INSERT (
-                review_id, user_name, content, score, created_at, app_version
-            ) VALUES (
-                source.review_id, source.user_name, source.content,
-                source.score, source.created_at, source.app_version
-            )
-            """
-            cursor.execute(merge_sql)
-            conn.commit()
-            print("Reviews updated successfully.")
-
-        # Insert app metadata
-        print("\nFetching app metadata...")
-        metadata = app(app_id, lang="en", country="us")
-        fetched_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-
-        metadata_row = {
-            "APP_VERSION": metadata.get("version"),
-            "TITLE": metadata.get("title"),
-            "DEVELOPER": metadata.get("developer", "OpenAI"),
-            "GENRE": metadata.get("genre", "Productivity"),
-            "SCORE": metadata.get("score"),
-            "RATINGS_COUNT": metadata.get("ratings"),
-            "REVIEWS_COUNT": metadata.get("reviews"),
-            "INSTALLS": metadata.get("installs"),
-            "REAL_INSTALLS": metadata.get("realInstalls"),
-            "IS_FREE": metadata.get("free"),
-            "PRICE": metadata.get("price"),
-            "CURRENCY": metadata.get("currency"),
-            "SALE": metadata.get("sale", False),
-            "OFFERS_IAP": metadata.get("offersIAP"),
-            "IAP_PRICE_RANGE": metadata.get("inAppProductPrice"),
-            "URL": metadata.get("url", f"https://play.google.com/store/apps/details?id={app_id}"),
-            "FETCHED_AT": fetched_at
-        }
-
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS APP_METADATA (
-            APP_VERSION STRING,
-            TITLE STRING,
-            DEVELOPER STRING,
-            GENRE STRING,
-            SCORE FLOAT,
-            RATINGS_COUNT INT,
-            REVIEWS_COUNT INT,
-            INSTALLS STRING,
-            REAL_INSTALLS INT,
-            IS_FREE BOOLEAN,
-            PRICE FLOAT,
-            CURRENCY STRING,
-            SALE BOOLEAN,
-            OFFERS_IAP BOOLEAN,
-            IAP_PRICE_RANGE STRING,
-            URL STRING,
-            FETCHED_AT TIMESTAMP
-        )
-        """)
-
-        cursor.execute("""
-        INSERT INTO APP_METADATA (
-            APP_VERSION, TITLE, DEVELOPER, GENRE, SCORE, RATINGS_COUNT, REVIEWS_COUNT,
-            INSTALLS, REAL_INSTALLS, IS_FREE, PRICE, CURRENCY, SALE, OFFERS_IAP,
-            IAP_PRICE_RANGE, URL, FETCHED_AT
-        ) VALUES (
-            %(APP_VERSION)s, %(TITLE)s, %(DEVELOPER)s, %(GENRE)s, %(SCORE)s, %(RATINGS_COUNT)s, %(REVIEWS_COUNT)s,
-            %(INSTALLS)s, %(REAL_INSTALLS)s, %(IS_FREE)s, %(PRICE)s, %(CURRENCY)s, %(SALE)s, %(OFFERS_IAP)s,
-            %(IAP_PRICE_RANGE)s, %(URL)s, %(FETCHED_AT)s
-        )
-        """, metadata_row)
-
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        print("App metadata inserted successfully.")
-        print(f"ROWS_LOADED={rows_loaded}")
-        return rows_loaded
+            cursor.execute(STAGING_DDL)
+            # VADER scores for the sentiment column (SENTIMENT_ENRICHMENT=1)
+            enrichment = enrichment_from_env()
+            if enrichment is not None:
+                enrichment.ensure_table(cursor)
+            spans.current().record("setup", time.perf_counter() - setup_started)
+
+            # Fetch all storefronts concurrently; pages stream through a bounded
+            # queue and each micro-batch is merged and checkpointed while fetching
+            # continues
+            print(f"Fetching new reviews from Google Play ({len(app_ids)} apps, {len(shards)} shards)...")
+            workers = int(os.getenv("HARVEST_WORKERS", 0)) or None
+            budget = RateLimiter.global_from_env()
+            harvester = Harvester(shards, since, workers=workers, start=start, budget=budget, known=known,
+                                  known_filter=known_filter, reviews_fn=reviews_fn)
+            harvester.watermarks.update(resumed_newest)
+            pbar = tqdm(desc="Fetching", unit="reviews")
+
+            def on_page(page):
+                progress[page.shard]["pages"] = page.number
+                pbar.update(len(page.rows))
+                if landing is not None:
+                    landing.append(page.rows)
+
+            merged = {"inserted": 0, "updated": 0, "unchanged": 0}
+
+            def flush(batch, pages):
+                print(f"\nMerging batch: {len(batch):,} records from {len(pages)} pages...")
+                if landing is not None:
+                    landing.flush()
+                counts = commit_batch(conn, cursor, batch, load_mode, known_filter, quality, aggregates,
+                                      sentiment=enrichment)
+                for key, value in counts._asdict().items():
+                    merged[key] += value
+                last_pages = {page.shard: page for page in pages}
+                for page in pages:
+                    progress[page.shard]["rows"] += len(page.rows)
+                for shard, page in last_pages.items():
+                    save_checkpoint(f"review_update_{shard_key(shard)}", page.token,
+                                    progress[shard]["pages"], page.number, progress[shard]["rows"],
+                                    since=since[shard], newest=harvester.watermarks[shard])
+
+            rows_fetched = run_pipeline(harvester.pages(), flush, on_page=on_page)
+            pbar.close()
+            rows_loaded = merged["inserted"] + merged["updated"]
+
+            with spans.span("watermarks"):
+                save_watermarks(cursor, harvester.finished_watermarks())
+                conn.commit()
+                for shard in harvester.completed:
+                    clear_checkpoint(f"review_update_{shard_key(shard)}")
+            if harvester.duplicates:
+                print(f"Skipped {harvester.duplicates:,} reviews already fetched from another storefront.")
+            if known_filter is not None:
+                with spans.span("filter"):
+                    known_filter.save()
+                if known_filter.skipped:
+                    print(f"Skipped {known_filter.skipped:,} reviews already in the warehouse.")
+
+            if rows_fetched == 0:
+                print("No new reviews to upload.")
+            else:
+                print(f"Fetched {rows_fetched:,} reviews: {merged['inserted']:,} inserted, "
+                      f"{merged['updated']:,} updated, {merged['unchanged']:,} unchanged.")
+                print("Reviews updated successfully.")
+            if quality is not None and quality.summary():
+                print(quality.summary())
+
+            # Insert app metadata, fetched concurrently under the same global budget
+            print("\nFetching app metadata...")
+            with spans.span("metadata", rows=len(app_ids)):
+                with ThreadPoolExecutor(max_workers=len(app_ids)) as pool:
+                    metadata_rows = list(pool.map(
+                        lambda app_id: fetch_app_metadata(app_id, RateLimiter.from_env(parent=budget), app_fn),
+                        app_ids,
+                    ))
+
+                cursor.execute(APP_METADATA_DDL)
+                for sql in APP_METADATA_MIGRATIONS:
+                    cursor.execute(sql)
+                for metadata_row in metadata_rows:
+                    cursor.execute(INSERT_METADATA_SQL, metadata_row)
+
+                conn.commit()
+
+            print("App metadata inserted successfully.")
+            print("Time by stage (fetching overlaps the others):")
+            print(spans.current().summary())
+            print(f"ROWS_LOADED={rows_loaded}")
+            return rows_loaded
 
     except Exception:
         print("Script failed with error:")
         traceback.print_exc()
         print("ROWS_LOADED=0")
-        sys.exit(1)
+        raise
 
 
 if __name__ == "__main__":
-    main()
+    # Standalone run without monitoring; the scheduled workflow runs
+    # monitor_pipeline.py, which calls main() in-process exactly once
+    parser = argparse.ArgumentParser(description="Fetch new Google Play reviews into the warehouse.")
+    parser.add_argument("--profile", action="store_true", default=None,
+                        help="profile the run with cProfile and tracemalloc (or set PIPELINE_PROFILE=1)")
+    args = parser.parse_args()
+    try:
+        with profiling.profiled(spans.current().run_id, enabled=args.profile):
+            main()
+    except Exception:
+        sys.exit(1)
 
@@ -0,0 +1,316 @@
+# sentiment.py
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from review_cache import REVIEW_CACHE_DIR, arrow_batches
+from transform import ReviewBuffer
+import spans
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed to persist scores
+    pa = pq = None
+
+
+SENTIMENT_CACHE_DIR = os.getenv("SENTIMENT_CACHE_DIR", os.path.join(REVIEW_CACHE_DIR, "sentiment"))
+CHUNK_SIZE = int(os.getenv("SENTIMENT_CHUNK_SIZE", 50_000))       # unique texts per worker task
+PARALLEL_MIN = int(os.getenv("SENTIMENT_PARALLEL_MIN", 200_000))  # fewer new texts are scored in-process
+MAX_PARTS = int(os.getenv("SENTIMENT_CACHE_MAX_PARTS", 16))       # appended parts before they are compacted
+HASH_CHUNK = 100_000
+BACKFILL_BATCH = int(os.getenv("SENTIMENT_BACKFILL_BATCH", 50_000))   # rows updated per commit
+
+SCORES = ("neg", "neu", "pos", "compound")
+
+SENTIMENT_STAGING_DDL = """
+CREATE OR REPLACE TEMPORARY TABLE reviews_sentiment_staging (
+    review_id STRING,
+    sentiment DOUBLE
+)
+"""
+
+INSERT_SENTIMENT_SQL = "INSERT INTO reviews_sentiment_staging (review_id, sentiment) VALUES (%s, %s)"
+
+CLEAR_SENTIMENT_SQL = "DELETE FROM reviews_sentiment_staging"
+
+# UPDATE ... FROM works on Snowflake and DuckDB alike
+FILL_SENTIMENT_SQL = """
+UPDATE {table}
+SET sentiment = scored.sentiment
+FROM reviews_sentiment_staging AS scored
+WHERE {table}.review_id = scored.review_id
+"""
+
+UNSCORED_SQL = "SELECT review_id, content FROM reviews WHERE sentiment IS NULL AND content IS NOT NULL"
+
+
+def model_version():
+    """Tag of the scorer; cached scores from any other version are ignored."""
+    try:
+        from importlib.metadata import version
+
+        return f"vader-{version('vaderSentiment')}"
+    except Exception:
+        return "vader"
+
+
+MODEL_VERSION = os.getenv("SENTIMENT_MODEL_VERSION") or model_version()
+
+
+def text_hashes(texts):
+    """64-bit fingerprints of `texts` as signed ints, hashed in chunks like transform.content_hashes."""
+    texts = pd.Series(texts, dtype=object).reset_index(drop=True)
+    out = np.empty(len(texts), dtype=np.int64)
+    for i in range(0, len(texts), HASH_CHUNK):
+        hashed = pd.util.hash_pandas_object(texts.iloc[i:i + HASH_CHUNK], index=False)
+        out[i:i + HASH_CHUNK] = hashed.to_numpy(dtype="uint64").view("int64")
+    return out
+
+
+_scorer = None
+
+
+def _init_worker():
+    global _scorer
+    from vader_batch import BatchScorer
+
+    _scorer = BatchScorer()
+
+
+def score_texts(texts):
+    """VADER neg/neu/pos/compound of each text, as a float64 array of shape (len(texts), 4)."""
+    if _scorer is None:
+        _init_worker()
+    return _scorer.scores(texts).to_numpy(dtype=np.float64)
+
+
+class SentimentEngine:
+    """VADER scores for a column of texts, each distinct text scored once, ever.
+
+    `scores()` hashes the texts, keeps the first of each distinct one and
+    looks the hashes up in a Parquet store under `path/<model>/`. Only
+    texts missing from it are scored by vader_batch.BatchScorer, in chunks
+    of `chunk_size` on a process pool of `workers` (in-process below
+    PARALLEL_MIN texts), and appended to the store as a new part. Scores
+    are kept per model version, so upgrading vaderSentiment starts a
+    fresh store. Missing texts (None/NaN) score NaN.
+    """
+
+    def __init__(self, path=SENTIMENT_CACHE_DIR, workers=None, chunk_size=CHUNK_SIZE, model=MODEL_VERSION):
+        self.model = model
+        self.path = os.path.join(path, model) if path else None
+        self.workers = workers or int(os.getenv("SENTIMENT_WORKERS", 0)) or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._hashes = None
+        self._scores = None
+        self.texts = self.unique = self.cached = self.scored = 0
+
+    def _load(self):
+        if self._hashes is not None:
+            return
+        parts = self._parts()
+        if parts:
+            table = pa.concat_tables([pq.read_table(os.path.join(self.path, p)) for p in parts])
+            self._hashes = table["hash"].to_numpy()
+            self._scores = np.column_stack([table[name].to_numpy() for name in SCORES])
+            if len(parts) > MAX_PARTS:
+                self._compact(parts)
+        else:
+            self._hashes = np.empty(0, dtype=np.int64)
+            self._scores = np.empty((0, len(SCORES)), dtype=np.float64)
+
+    def _parts(self):
+        if not self.path or not os.path.isdir(self.path):
+            return []
+        return sorted(p for p in os.listdir(self.path) if p.startswith("part-") and p.endswith(".parquet"))
+
+    def _write(self, hashes, scores):
+        """Write one part; the temporary name keeps half-written files out of `_parts()`."""
+        if not self.path or pq is None:
+            return None
+        os.makedirs(self.path, exist_ok=True)
+        table = pa.table({"hash": hashes, **{name: scores[:, i] for i, name in enumerate(SCORES)}})
+        name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+        tmp = os.path.join(self.path, f"tmp-{name}")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, os.path.join(self.path, name))
+        return name
+
+    def _compact(self, parts):
+        self._write(self._hashes, self._scores)
+        for part in parts:
+            try:
+                os.remove(os.path.join(self.path, part))
+            except OSError:
+                pass
+
+    def _score(self, texts):
+        if len(texts) < PARALLEL_MIN or self.workers == 1:
+            return score_texts(texts)
+        chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker) as pool:
+            return np.concatenate(list(pool.map(score_texts, chunks)))
+
+    def scores(self, texts):
+        """DataFrame of neg/neu/pos/compound for `texts`, aligned with it (same index for a Series)."""
+        index = texts.index if isinstance(texts, pd.Series) else None
+        texts = pd.Series(texts, dtype=object).reset_index(drop=True)
+        present = texts.notna().to_numpy()
+        out = np.full((len(texts), len(SCORES)), np.nan, dtype=np.float64)
+
+        values = texts[present].astype(str)
+        codes, uniques = pd.factorize(text_hashes(values))
+        _, first = np.unique(codes, return_index=True)
+        self._load()
+        found = pd.Index(self._hashes).get_indexer(uniques) if len(self._hashes) else np.full(len(uniques), -1)
+        unique_scores = np.empty((len(uniques), len(SCORES)), dtype=np.float64)
+        hit = found >= 0
+        unique_scores[hit] = self._scores[found[hit]]
+
+        missing = np.flatnonzero(~hit)
+        if len(missing):
+            new_scores = self._score(values.iloc[first[missing]].tolist())
+            unique_scores[missing] = new_scores
+            new_hashes = np.asarray(uniques)[missing]
+            self._write(new_hashes, new_scores)
+            self._hashes = np.concatenate([self._hashes, new_hashes])
+            self._scores = np.concatenate([self._scores, new_scores])
+
+        out[present] = unique_scores[codes]
+        self.texts += len(texts)
+        self.unique += len(uniques)
+        self.cached += int(hit.sum())
+        self.scored += len(missing)
+        return pd.DataFrame(out, columns=list(SCORES), index=index)
+
+    def compound(self, texts):
+        """Compound score of each text, aligned with `texts`."""
+        return self.scores(texts)["compound"]
+
+    def summary(self):
+        return (f"Sentiment ({self.model}): {self.texts:,} texts, {self.unique:,} distinct, "
+                f"{self.cached:,} cached, {self.scored:,} scored")
+
+
+def enrichment_from_env():
+    """Return the SentimentEnrichment for this run when SENTIMENT_ENRICHMENT=1, else None."""
+    if os.getenv("SENTIMENT_ENRICHMENT", "0") != "1":
+        return None
+    return SentimentEnrichment()
+
+
+def _write_scores(cursor, review_ids, scores, table):
+    """Set `table`.sentiment for the given ids through reviews_sentiment_staging."""
+    params = [(review_id, float(score)) for review_id, score in zip(review_ids, scores)
+              if review_id is not None and not np.isnan(score)]
+    if not params:
+        return 0
+    cursor.executemany(INSERT_SENTIMENT_SQL, params)
+    cursor.execute(FILL_SENTIMENT_SQL.format(table=table))
+    cursor.execute(CLEAR_SENTIMENT_SQL)
+    return len(params)
+
+
+class SentimentEnrichment:
+    """Fills the sentiment column of each staged micro-batch before it is merged.
+
+    The compound scores are computed locally from the batch's own text
+    (deduplicated within the run, without the on-disk store, which a
+    scheduled job does not keep), then written to reviews_staging through
+    the small reviews_sentiment_staging table, so both load modes stay as
+    they are.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or SentimentEngine(path=None)
+
+    def ensure_table(self, cursor):
+        cursor.execute(SENTIMENT_STAGING_DDL)
+
+    def enrich(self, cursor, rows):
+        """Score one staged batch and copy the scores into reviews_staging."""
+        with spans.span("sentiment", rows=len(rows)):
+            if isinstance(rows, ReviewBuffer):
+                review_ids, texts = rows.review_id, rows.content
+            else:
+                review_ids = [r.get("reviewId") for r in rows]
+                texts = [r.get("content") for r in rows]
+            scores = self.engine.compound(texts).to_numpy()
+            return _write_scores(cursor, review_ids, scores, "reviews_staging")
+
+
+def _chunks(batches, rows):
+    """Regroup Arrow record batches into tables of `rows` rows (the last one may be shorter)."""
+    pending, count = [], 0
+    for batch in batches:
+        pending.append(batch)
+        count += batch.num_rows
+        while count >= rows:
+            table = pa.Table.from_batches(pending)
+            yield table.slice(0, rows)
+            rest = table.slice(rows)
+            pending, count = rest.to_batches(), rest.num_rows
+    if count:
+        yield pa.Table.from_batches(pending)
+
+
+def backfill(conn, engine=None, batch_size=BACKFILL_BATCH):
+    """Score every review without a sentiment and store it, committing every `batch_size` rows.
+
+    The unscored rows are streamed as Arrow batches; each chunk of
+    `batch_size` rows is scored by a SentimentEngine (on-disk store), written
+    and committed before the next is read, so memory stays bounded by one
+    chunk and an interrupted backfill resumes with the rows it did not
+    commit, rescoring no text. Scores are written through a second cursor,
+    as a new statement on the reading one would discard its result.
+    Returns the number of rows updated.
+    """
+    engine = engine or SentimentEngine()
+    reader, writer = conn.cursor(), conn.cursor()
+    reader.execute(UNSCORED_SQL)
+    writer.execute(SENTIMENT_STAGING_DDL)
+    started = time.perf_counter()
+    read = updated = 0
+    for chunk in _chunks(arrow_batches(reader, batch_size), batch_size):
+        texts = pd.Series(chunk.column(1).to_pylist(), dtype=object)
+        scores = engine.compound(texts).to_numpy()
+        updated += _write_scores(writer, chunk.column(0).to_pylist(), scores, "reviews")
+        conn.commit()
+        read += chunk.num_rows
+        print(f"Stored {updated:,} sentiment scores ({read:,} reviews read, "
+              f"{time.perf_counter() - started:.1f}s).")
+    reader.close()
+    writer.close()
+    if not read:
+        print("Every review already has a sentiment score.")
+    else:
+        print(f"{engine.summary()} in {time.perf_counter() - started:.1f}s")
+    return updated
+
+
+def main(argv=None):
+    """Command line: `python sentiment.py backfill [--workers N] [--batch-size N]`."""
+    from ingest_pipeline import ensure_reviews_table
+    import warehouse
+
+    parser = argparse.ArgumentParser(description="Fill reviews.sentiment for rows stored without one.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--workers", type=int, default=None, help="scoring processes (default: all CPUs)")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH, help="rows updated per commit")
+    args = parser.parse_args(argv)
+    conn = warehouse.get_connection()
+    cursor = conn.cursor()
+    ensure_reviews_table(cursor)
+    cursor.close()
+    backfill(conn, SentimentEngine(workers=args.workers), args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
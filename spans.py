@@ -0,0 +1,118 @@
+# spans.py
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import threading
+import time
+import uuid
+
+
+# Counters every span can carry; unknown ones are rejected so typos surface
+COUNTERS = ("rows", "pages", "bytes", "retries")
+
+STAGE_MONITORING_DDL = """
+CREATE TABLE IF NOT EXISTS PIPELINE_STAGE_MONITORING (
+    RUN_ID STRING,
+    DATE DATE,
+    TASK_NAME STRING,
+    STAGE STRING,
+    CALLS INT,
+    DURATION_SEC FLOAT,
+    ROWS_PROCESSED INT,
+    PAGES INT,
+    BYTES INT,
+    RETRIES INT,
+    TIMESTAMP TIMESTAMP_NTZ DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+INSERT_STAGE_SQL = """
+INSERT INTO PIPELINE_STAGE_MONITORING
+(RUN_ID, DATE, TASK_NAME, STAGE, CALLS, DURATION_SEC, ROWS_PROCESSED, PAGES, BYTES, RETRIES)
+VALUES (%s, CURRENT_DATE(), %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+class Tracer:
+    """Per-run totals of every instrumented stage.
+
+    Spans of the same stage are summed (calls, seconds and counters), so a
+    stage that runs once per page or batch ends up as one row. Spans may be
+    recorded from any thread; stages that overlap in time (fetching runs on
+    worker threads while batches merge) each report their own busy time.
+    """
+
+    def __init__(self, task_name="review_update"):
+        self.task_name = task_name
+        self.run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, **counts):
+        unknown = set(counts) - set(COUNTERS)
+        if unknown:
+            raise ValueError(f"Unknown span counters {sorted(unknown)}; expected {COUNTERS}")
+        with self._lock:
+            totals = self.stages.setdefault(stage, dict.fromkeys(("calls", "seconds") + COUNTERS, 0))
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            for name, value in counts.items():
+                totals[name] += value or 0
+
+    def rows(self):
+        """One tuple per stage, in first-seen order, matching INSERT_STAGE_SQL."""
+        with self._lock:
+            return [
+                (self.run_id, self.task_name, stage, t["calls"], round(t["seconds"], 3),
+                 t["rows"], t["pages"], t["bytes"], t["retries"])
+                for stage, t in self.stages.items()
+            ]
+
+    def summary(self):
+        """Human-readable one-line-per-stage breakdown."""
+        lines = []
+        for _, _, stage, calls, seconds, rows, pages, nbytes, retries in self.rows():
+            extra = [f"{rows:,} rows" if rows else "", f"{pages:,} pages" if pages else "",
+                     f"{nbytes / 1024:,.0f} KiB" if nbytes else "", f"{retries} retries" if retries else ""]
+            lines.append(f"  {stage:<11}{seconds:9.2f}s  {calls:>6,} calls  " + "  ".join(e for e in extra if e))
+        return "\n".join(lines)
+
+
+_current = Tracer()
+
+
+def start_run(task_name="review_update"):
+    """Begin collecting spans for a new run and return its Tracer."""
+    global _current
+    _current = Tracer(task_name)
+    return _current
+
+
+def current():
+    """The Tracer spans are currently recorded into."""
+    return _current
+
+
+@contextmanager
+def span(stage, **counts):
+    """Time a block as part of `stage`.
+
+    Yields a dict of counters (rows, pages, bytes, retries) that the block
+    may fill in once it knows them; they are recorded with the duration
+    even if the block raises.
+    """
+    values = dict(counts)
+    start = time.perf_counter()
+    try:
+        yield values
+    finally:
+        _current.record(stage, time.perf_counter() - start, **values)
+
+
+def save_stages(cursor, tracer=None):
+    """Write the run's per-stage totals to PIPELINE_STAGE_MONITORING."""
+    tracer = tracer or _current
+    rows = tracer.rows()
+    cursor.execute(STAGE_MONITORING_DDL)
+    if rows:
+        cursor.executemany(INSERT_STAGE_SQL, rows)
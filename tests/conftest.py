@@ -0,0 +1,113 @@
+# tests/conftest.py
+
+from datetime import datetime
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# One review_update run against FakePlayStore. `{setup}` is spliced in
+# before the run, e.g. to kill the process part way through with os._exit
+RUN_UPDATE = """
+from datetime import datetime
+from functools import partial
+import os
+import sys
+
+from fake_play import FakePlayStore
+import review_update
+
+store = FakePlayStore({total}, now=datetime.fromisoformat({now!r}), seed=0)
+{setup}
+run = partial(review_update.main, ["app.a"], load_mode={load_mode!r}, reviews_fn=store.reviews, app_fn=store.app)
+{entry}
+"""
+
+# Entry points: review_update alone, or through monitor_pipeline as scheduled
+RUN_DIRECT = "run()"
+RUN_MONITORED = """
+import monitor_pipeline
+
+review_update.main = run
+sys.exit(monitor_pipeline.main() != "SUCCESS")
+"""
+
+# A script run as __main__ (its command line) with Google Play replaced by
+# FakePlayStore before the script imports it
+RUN_SCRIPT = """
+from datetime import datetime
+import runpy
+import sys
+
+import google_play_scraper
+from fake_play import FakePlayStore
+
+store = FakePlayStore({total}, now=datetime.fromisoformat({now!r}), seed=0)
+google_play_scraper.reviews, google_play_scraper.app = store.reviews, store.app
+sys.argv = [{script!r}, *{args!r}]
+runpy.run_path({script!r}, run_name="__main__")
+"""
+
+
+class Pipeline:
+    """Runs review_update in a child process on a DuckDB file under `tmp`.
+
+    Each run is a fresh process, as in production, so module-level settings
+    read at import (checkpoint and cache directories) follow the environment
+    and a run can be killed outright without touching the test process.
+    """
+
+    def __init__(self, tmp):
+        self.path = str(tmp / "warehouse.duckdb")
+        self.now = datetime.now().replace(microsecond=0).isoformat()
+        self.env = dict(
+            os.environ,
+            WAREHOUSE_BACKEND="duckdb",
+            WAREHOUSE_PATH=self.path,
+            CHECKPOINT_DIR=str(tmp / "checkpoints"),
+            LANDING_DIR=str(tmp / "landing"),
+            REVIEW_CACHE_DIR=str(tmp / "review_cache"),
+            ALERT_SINK="none",
+            FETCH_RATE="10000",
+            FETCH_BURST="10000",
+            FETCH_MAX_RATE="10000",
+            FETCH_GLOBAL_RATE="10000",
+            FETCH_GLOBAL_MAX_RATE="10000",
+        )
+
+    def run(self, total=10_000, setup="", load_mode="insert", monitored=False, **env):
+        """Run one update; returns the CompletedProcess (returncode != 0 when it died or failed).
+
+        With `monitored` the run goes through monitor_pipeline.main(), which
+        also logs it to PIPELINE_MONITORING and PIPELINE_STAGE_MONITORING.
+        """
+        code = RUN_UPDATE.format(total=total, now=self.now, setup=textwrap.dedent(setup), load_mode=load_mode,
+                                 entry=RUN_MONITORED if monitored else RUN_DIRECT)
+        return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env={**self.env, **env},
+                              capture_output=True, text=True, timeout=600)
+
+    def script(self, script, *args, total=10_000, **env):
+        """Run `python script *args` for app.a against FakePlayStore; returns the CompletedProcess."""
+        code = RUN_SCRIPT.format(total=total, now=self.now, script=script, args=list(args))
+        return subprocess.run([sys.executable, "-c", code], cwd=ROOT, env={**self.env, "APP_IDS": "app.a", **env},
+                              capture_output=True, text=True, timeout=600)
+
+    def replay(self, *args, **env):
+        """Run `python landing.py replay *args` against the same warehouse and landing zone."""
+        return subprocess.run([sys.executable, "landing.py", "replay", *args], cwd=ROOT,
+                              env={**self.env, **env}, capture_output=True, text=True, timeout=600)
+
+    def connect(self):
+        import duckdb
+
+        return duckdb.connect(self.path)
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    return Pipeline(tmp_path)
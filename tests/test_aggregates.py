@@ -0,0 +1,59 @@
+# tests/test_aggregates.py
+
+import duckdb
+
+from aggregates import ReviewAggregates, TABLES
+import warehouse
+
+
+def summaries(conn):
+    return {table: conn.execute(f"SELECT * EXCLUDE (updated_at) FROM {table} ORDER BY ALL").fetchall()
+            for table in TABLES}
+
+
+def recomputed(path):
+    conn = warehouse.LocalConnection(duckdb.connect(path), "duckdb")
+    cursor = conn.cursor()
+    aggregates = ReviewAggregates()
+    aggregates.ensure_tables(cursor, build_empty=False)
+    aggregates.rebuild(cursor)
+    conn.commit()
+    result = summaries(conn)
+    conn.close()
+    return result
+
+
+# Lets the MERGE of the second batch through, then kills the process before
+# its summary update
+KILL_BEFORE_SECOND_APPLY = """
+import aggregates
+calls = []
+
+def apply(self, cursor):
+    calls.append(1)
+    if len(calls) == 2:
+        os._exit(9)
+    self._apply(cursor)
+
+aggregates.ReviewAggregates.apply = apply
+"""
+
+
+def test_killed_between_merge_and_apply_keeps_summaries_exact(pipeline):
+    killed = pipeline.run(total=25_000, setup=KILL_BEFORE_SECOND_APPLY)
+    assert killed.returncode == 9, killed.stdout + killed.stderr
+
+    conn = pipeline.connect()
+    # The second batch's MERGE was rolled back with the unapplied summaries
+    assert conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0] == 10_000
+    conn.close()
+
+    rerun = pipeline.run(total=25_000)
+    assert rerun.returncode == 0, rerun.stdout + rerun.stderr
+
+    conn = pipeline.connect()
+    assert conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0] == 25_000
+    incremental = summaries(conn)
+    conn.close()
+    assert sum(row[2] for row in incremental["review_monthly_stats"]) == 25_000
+    assert incremental == recomputed(pipeline.path)
@@ -0,0 +1,119 @@
+# tests/test_alerts.py
+
+import socketserver
+import threading
+import time
+
+import pytest
+
+from alerts import Alert, AlertDispatcher, SmtpSink
+
+
+class RecordingSink:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.messages = []
+        self.closed = False
+
+    def send(self, subject, body):
+        time.sleep(self.delay)
+        self.messages.append((subject, body))
+
+    def close(self):
+        self.closed = True
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: greets, accepts every command and collects DATA."""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost test SMTP")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split(" ", 1)[0].upper()
+            if command == "DATA":
+                self.reply("354 end with .")
+                data = []
+                for raw in iter(self.rfile.readline, b""):
+                    if raw.rstrip(b"\r\n") == b".":
+                        break
+                    data.append(raw.decode())
+                self.server.messages.append("".join(data))
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SmtpHandler)
+    server.daemon_threads = True
+    server.messages, server.connections = [], 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_submit_does_not_wait_for_the_sink(tmp_path):
+    sink = RecordingSink(delay=0.5)
+    dispatcher = AlertDispatcher(sink, batch_sec=0, state_path=str(tmp_path / "alerts.json"))
+    started = time.perf_counter()
+    dispatcher.submit("Pipeline failed", "trace")
+    assert time.perf_counter() - started < 0.1
+    assert dispatcher.close()
+    assert sink.messages == [("Pipeline failed", "trace")] and sink.closed
+
+
+def test_alerts_close_together_share_one_message(tmp_path):
+    sink = RecordingSink()
+    dispatcher = AlertDispatcher(sink, batch_sec=0.5, state_path=str(tmp_path / "alerts.json"))
+    for name in ("a", "b", "c", "a"):
+        dispatcher.submit(f"Anomaly {name}", f"details {name}")
+    dispatcher.close()
+    assert len(sink.messages) == 1
+    subject, body = sink.messages[0]
+    assert subject.startswith("[Pipeline Alert] 3 alerts") and "details c" in body
+    assert dispatcher.deduplicated == 1
+
+
+def test_repeats_are_dropped_across_runs(tmp_path):
+    state = str(tmp_path / "alerts.json")
+    first = AlertDispatcher(RecordingSink(), batch_sec=0, state_path=state)
+    first.submit("Pipeline failed", "trace")
+    first.close()
+    sink = RecordingSink()
+    rerun = AlertDispatcher(sink, batch_sec=0, state_path=state)
+    rerun.submit("Pipeline failed", "trace again")
+    rerun.submit("Other problem", "details")
+    rerun.close()
+    assert [subject for subject, _ in sink.messages] == ["Other problem"]
+    assert rerun.deduplicated == 1
+
+
+def test_messages_over_the_hourly_limit_are_dropped(tmp_path):
+    sink = RecordingSink()
+    dispatcher = AlertDispatcher(sink, max_per_hour=2, state_path=str(tmp_path / "alerts.json"))
+    for i in range(4):
+        dispatcher._deliver([Alert(f"problem {i}", f"problem {i}", "body", "WARNING", time.time())])
+    assert len(sink.messages) == 2 and dispatcher.rate_limited == 2
+
+
+def test_smtp_sink_reuses_one_connection(smtp_server):
+    host, port = smtp_server.server_address
+    sink = SmtpSink(host, port, sender="pipeline@localhost", recipients=["ops@localhost"], starttls=False)
+    sink.send("first", "one")
+    sink.send("second", "two")
+    sink.close()
+    assert sink.connections == 1 and smtp_server.connections == 1
+    assert len(smtp_server.messages) == 2 and "Subject: second" in smtp_server.messages[1]
@@ -0,0 +1,116 @@
+# tests/test_anomaly.py
+
+from datetime import date
+
+import duckdb
+import pytest
+
+from anomaly import ALL, AnomalyDetector, Baseline, worst_severity
+import warehouse
+
+
+def detector(rows=(1000.0, 100.0 ** 2), duration=(100.0, 10.0 ** 2), **stages):
+    """A detector with ten runs of history: (mean, variance) per metric."""
+    metrics = {"rows_loaded": rows, "duration_sec": duration, **stages}
+    return AnomalyDetector(state={(metric, ALL): Baseline(10, mean, var, mean)
+                                  for metric, (mean, var) in metrics.items()})
+
+
+def codes(findings):
+    return {(f.severity, f.code, f.metric) for f in findings}
+
+
+def test_zero_row_success_is_critical():
+    findings = detector().check({"rows_loaded": 0})
+    assert codes(findings) == {("CRITICAL", "ZERO_ROWS", "rows_loaded")}
+    # Without history it is still reported, as a warning
+    assert codes(AnomalyDetector().check({"rows_loaded": 0})) == {("WARNING", "ZERO_ROWS", "rows_loaded")}
+    # A failed run loading nothing is not a zero-row success
+    assert "ZERO_ROWS" not in {f.code for f in detector().check({"rows_loaded": 0}, success=False)}
+
+
+@pytest.mark.parametrize("rows, expected", [
+    (701, set()),
+    (700, {("WARNING", "VOLUME_DROP", "rows_loaded")}),           # z = -3
+    (200, {("WARNING", "VOLUME_DROP", "rows_loaded")}),           # 20% of expected
+    (199, {("CRITICAL", "VOLUME_DROP", "rows_loaded")}),          # under 20%
+    (1399, set()),
+    (1400, {("INFO", "VOLUME_SPIKE", "rows_loaded")}),            # z = 4
+    (5000, {("INFO", "VOLUME_SPIKE", "rows_loaded")}),
+])
+def test_volume_thresholds(rows, expected):
+    assert codes(detector().check({"rows_loaded": rows})) == expected
+
+
+@pytest.mark.parametrize("metric, value, expected", [
+    ("duration_sec", 129, set()),
+    ("duration_sec", 130, {("WARNING", "LATENCY_SPIKE", "duration_sec")}),    # z = 3
+    ("duration_sec", 159, {("WARNING", "LATENCY_SPIKE", "duration_sec")}),
+    ("duration_sec", 160, {("CRITICAL", "LATENCY_SPIKE", "duration_sec")}),   # z = 6
+    ("stage_fetch_sec", 65, {("WARNING", "LATENCY_SPIKE", "stage_fetch_sec")}),
+    ("stage_fetch_sec", 500, {("WARNING", "LATENCY_SPIKE", "stage_fetch_sec")}),  # stages never CRITICAL
+])
+def test_latency_thresholds(metric, value, expected):
+    run = detector(stage_fetch_sec=(50.0, 5.0 ** 2))
+    assert codes(run.check({"rows_loaded": 1000, metric: value})) == expected
+
+
+def test_fast_stages_and_short_history_are_not_flagged():
+    run = detector(stage_setup_sec=(0.1, 0.0))
+    assert run.check({"rows_loaded": 1000, "stage_setup_sec": 0.9}) == []
+    young = AnomalyDetector(state={("duration_sec", ALL): Baseline(2, 100.0, 1.0, 100.0)})
+    assert young.check({"duration_sec": 1000}) == []
+
+
+def test_seasonal_baseline_takes_over_with_enough_runs():
+    run = AnomalyDetector()
+    for month, rows in [(1, 1000), (1, 1000), (1, 1000), (12, 5000), (12, 5000)]:
+        run.update({"rows_loaded": rows}, month)
+    assert run.baseline("rows_loaded", 12).mean == 5000
+    assert run.baseline("rows_loaded", 1).mean == 1000
+    assert run.check({"rows_loaded": 5000}, month=12) == []
+    assert worst_severity(run.check({"rows_loaded": 900}, month=12)) == "CRITICAL"
+
+
+def test_flagged_run_is_not_folded_into_the_baseline():
+    run = detector()
+    before = run.state[("rows_loaded", ALL)].mean, run.state[("duration_sec", ALL)].mean
+    findings = run.observe({"rows_loaded": 0, "duration_sec": 100})
+    assert worst_severity(findings) == "CRITICAL"
+    findings = run.observe({"rows_loaded": 1000, "duration_sec": 500})
+    assert codes(findings) == {("CRITICAL", "LATENCY_SPIKE", "duration_sec")}
+    assert (run.state[("rows_loaded", ALL)].mean, run.state[("duration_sec", ALL)].mean) == before
+    assert run.state[("rows_loaded", ALL)].n == 11  # the normal row count of the slow run is kept
+
+
+def test_baseline_seeds_from_history(tmp_path):
+    conn = warehouse.LocalConnection(duckdb.connect(str(tmp_path / "monitor.duckdb")), "duckdb")
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE PIPELINE_MONITORING (
+            DATE DATE, TASK_NAME STRING, STATUS STRING, ROWS_LOADED INT,
+            DURATION_SEC FLOAT, TIMESTAMP TIMESTAMP
+        )
+    """)
+    runs = [(date(2026, 3, d), "review_update", "SUCCESS", rows, 60.0)
+            for d, rows in [(1, 900), (2, 1000), (3, 1100), (4, 1000)]]
+    runs += [(date(2026, 3, 5), "review_update", "FAILURE", 0, 5.0),
+             (date(2026, 3, 6), "review_update", "SUCCESS", 0, 60.0),
+             (date(2026, 3, 7), "other_task", "SUCCESS", 99, 1.0)]
+    cursor.executemany("INSERT INTO PIPELINE_MONITORING VALUES (%s, %s, %s, %s, %s, CAST(%s AS DATE))",
+                       [run + (run[0],) for run in runs])
+
+    seeded = AnomalyDetector.load(cursor, "review_update")
+    expected = Baseline()
+    for rows in (900, 1000, 1100, 1000):
+        expected.update(rows)
+    rows_base = seeded.state[("rows_loaded", ALL)]
+    assert rows_base.n == 4 and rows_base.mean == pytest.approx(expected.mean)
+    assert seeded.state[("rows_loaded", "03")].n == 4
+    assert seeded.state[("duration_sec", ALL)].mean == 60.0
+
+    seeded.observe({"rows_loaded": 1000, "duration_sec": 60.0}, month=3)
+    seeded.save(cursor)
+    reloaded = AnomalyDetector.load(cursor, "review_update")
+    assert reloaded.state[("rows_loaded", ALL)].n == 5  # state is kept, history is not read again
+    conn.close()
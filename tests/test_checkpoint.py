@@ -0,0 +1,39 @@
+# tests/test_checkpoint.py
+
+from datetime import datetime
+import json
+import os
+
+import pytest
+
+from fake_play import FakePlayStore
+import checkpoint
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(checkpoint, "CHECKPOINT_DIR", str(tmp_path))
+
+
+def test_token_round_trip():
+    _, token = FakePlayStore(1_000).reviews("app.a", count=200)
+    checkpoint.save_checkpoint("shard", token, 1, 1, 200, since=datetime(2025, 1, 1))
+    state, resumed = checkpoint.resume_checkpoint("shard")
+    assert state["pages_uploaded"] == 1
+    assert (resumed.token, resumed.lang, resumed.count) == (token.token, token.lang, token.count)
+
+
+def test_token_the_scraper_cannot_rebuild_restarts_the_shard(monkeypatch):
+    _, token = FakePlayStore(1_000).reviews("app.a", count=200)
+    checkpoint.save_checkpoint("shard", token, 1, 1, 200)
+    monkeypatch.setattr(checkpoint, "_ContinuationToken", None)
+    assert checkpoint.resume_checkpoint("shard") == (None, None)
+    assert not os.path.exists(checkpoint.checkpoint_path("shard"))
+
+
+def test_malformed_token_restarts_the_shard():
+    os.makedirs(checkpoint.CHECKPOINT_DIR, exist_ok=True)
+    with open(checkpoint.checkpoint_path("shard"), "w") as f:
+        json.dump({"token": ["not", "a", "dict"], "pages_uploaded": 3, "rows_uploaded": 600}, f)
+    assert checkpoint.resume_checkpoint("shard") == (None, None)
+    assert checkpoint.load_checkpoint("shard") is None
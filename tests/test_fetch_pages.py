@@ -0,0 +1,31 @@
+# tests/test_fetch_pages.py
+
+from fake_play import FakePlayStore
+from ingest_pipeline import PAGE_SIZE, fetch_pages
+from known_ids import KnownReviews
+from rate_limiter import RateLimiter
+
+
+def fetch(store, known, **kwargs):
+    limiter = RateLimiter(rate=10_000, burst=10_000, max_rate=10_000)
+    return list(fetch_pages("app.a", reviews_fn=store.reviews, limiter=limiter, known_filter=known, **kwargs))
+
+
+def known_newest(store, count):
+    """A filter holding the `count` newest reviews of the store, as if an earlier run merged them."""
+    known = KnownReviews(capacity=10_000)
+    known.add_rows([{**store.review("app.a", "en", i), "appId": "app.a"} for i in range(count)])
+    return known
+
+
+def test_known_page_stops_incremental_paging():
+    store = FakePlayStore(2_000)
+    assert fetch(store, known_newest(store, 2 * PAGE_SIZE)) == []
+
+
+def test_full_sync_pages_past_known_history():
+    store = FakePlayStore(2_000)
+    pages = fetch(store, known_newest(store, 2 * PAGE_SIZE), stop_on_known=False)
+    assert [page.number for page in pages] == list(range(1, 11))
+    assert [len(page.rows) for page in pages[:3]] == [0, 0, PAGE_SIZE]
+    assert sum(len(page.rows) for page in pages) == 2_000 - 2 * PAGE_SIZE
@@ -0,0 +1,80 @@
+# tests/test_harvester.py
+
+from datetime import datetime, timedelta
+import threading
+
+from fake_play import FakePlayStore
+import harvester
+from harvester import Harvester, SeenIds, Shard
+from ingest_pipeline import PAGE_SIZE
+from rate_limiter import RateLimiter
+
+
+def fast_limiter(parent=None):
+    return RateLimiter(rate=10_000, burst=10_000, max_rate=10_000, parent=parent)
+
+
+class PeakSeenIds(SeenIds):
+    """Records the largest size each app's set reached."""
+
+    peaks = []
+
+    def add_page(self, shard, rows):
+        fresh = super().add_page(shard, rows)
+        self.peaks.append(len(self))
+        return fresh
+
+
+def test_each_review_is_yielded_once_and_seen_ids_stay_bounded(monkeypatch):
+    monkeypatch.setattr(harvester, "SeenIds", PeakSeenIds)
+    PeakSeenIds.peaks = []
+    store = FakePlayStore(3_000)
+    # en:us and en:gb share their reviews; de:de has its own
+    shards = [Shard("app.a", "en", "us"), Shard("app.a", "en", "gb"), Shard("app.a", "de", "de")]
+    run = Harvester(shards, since={}, reviews_fn=store.reviews, limiter_factory=fast_limiter, max_pages=2)
+    ids = [r["reviewId"] for page in run.pages() for r in page.rows]
+    assert len(ids) == len(set(ids)) == 6_000
+    assert run.duplicates == 3_000 and run.completed == set(shards)
+    # Far fewer than the 6,000 distinct ids of the run are ever held at once
+    assert max(PeakSeenIds.peaks) < 3_000
+
+
+def rows(start, count, now=datetime(2026, 1, 1)):
+    return [{"reviewId": f"r{i}", "at": now - timedelta(minutes=i)} for i in range(start, start + count)]
+
+
+def test_ids_are_forgotten_once_every_shard_paged_past_them():
+    us, gb = Shard("app.a", "en", "us"), Shard("app.a", "en", "gb")
+    seen = SeenIds([us, gb])
+    assert len(seen.add_page(us, rows(0, PAGE_SIZE))) == PAGE_SIZE
+    assert len(seen.add_page(us, rows(PAGE_SIZE, PAGE_SIZE))) == PAGE_SIZE
+    assert len(seen) == 2 * PAGE_SIZE  # gb has not paged yet and may return any of them
+    assert seen.add_page(gb, rows(0, PAGE_SIZE)) == []
+    # gb is past the first page, so only ids it can still fetch again are kept
+    assert len(seen) == PAGE_SIZE + 1
+    assert seen.add_page(gb, rows(PAGE_SIZE, PAGE_SIZE)) == []
+    seen.finish(us)
+    seen.finish(gb)
+    assert len(seen) == 0
+
+
+def test_a_shard_without_pages_stops_holding_ids_once_finished():
+    us, gb = Shard("app.a", "en", "us"), Shard("app.a", "en", "gb")
+    seen = SeenIds([us, gb])
+    seen.add_page(us, rows(0, PAGE_SIZE))
+    seen.add_page(us, rows(PAGE_SIZE, PAGE_SIZE))
+    seen.finish(gb)
+    assert len(seen) == 1  # only the oldest timestamp us may still return
+
+
+def test_stopping_early_leaves_no_thread_behind():
+    store = FakePlayStore(3_000)
+    shards = [Shard("app.a", "en", "us"), Shard("app.a", "de", "de")]
+    run = Harvester(shards, since={}, reviews_fn=store.reviews, limiter_factory=fast_limiter, max_pages=1)
+    pages = run.pages()
+    next(pages)
+    pages.close()
+    for thread in threading.enumerate():
+        if thread.name.startswith("harvest"):
+            thread.join(timeout=2)
+            assert not thread.is_alive(), thread.name
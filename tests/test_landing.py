@@ -0,0 +1,105 @@
+# tests/test_landing.py
+
+from datetime import datetime, timedelta
+import os
+
+import duckdb
+import pytest
+
+from fake_play import FakePlayStore
+from ingest_pipeline import STAGING_DDL, commit_batch, ensure_reviews_table
+import landing
+from landing import LandingZone, read_manifest, replay
+import warehouse
+
+STORED_SQL = "SELECT review_id, content_hash, content, score, created_at, app_id FROM reviews ORDER BY review_id"
+
+
+def fetched_pages(total=2_000, size=100):
+    """Pages of raw scraper dicts spread over March to May 2026, newest first."""
+    store = FakePlayStore(total, span=timedelta(days=75), now=datetime(2026, 5, 20))
+    rows = [{**store.review("app.a", "en", i), "appId": "app.a"} for i in range(total)]
+    rows[3]["content"] = None
+    return [rows[i:i + size] for i in range(0, total, size)]
+
+
+def warehouse_at(path):
+    conn = warehouse.LocalConnection(duckdb.connect(str(path)), "duckdb")
+    return conn, conn.cursor()
+
+
+@pytest.fixture
+def landed(tmp_path):
+    """A landing zone holding two runs' worth of pages, the second refetching part of the first."""
+    pages = fetched_pages()
+    root = str(tmp_path / "landing")
+    for run in (pages[:12], pages[8:]):
+        zone = LandingZone(root)
+        for page in run:
+            zone.append(page)
+        zone.flush()
+    return root, pages
+
+
+def test_pages_are_partitioned_by_month(landed):
+    root, pages = landed
+    entries = read_manifest(root)
+    assert sorted({e["month"] for e in entries}) == ["2026-03", "2026-04", "2026-05"]
+    assert sum(e["rows"] for e in entries) == sum(len(p) for p in pages[:12] + pages[8:])
+    for e in entries:
+        assert e["file"].startswith(f"month={e['month']}{os.sep}") and os.path.exists(os.path.join(root, e["file"]))
+        assert e["min_at"][:7] == e["max_at"][:7] == e["month"] and e["app_ids"] == ["app.a"]
+    assert [e["month"] for e in read_manifest(root, months=["2026-04"])] == ["2026-04", "2026-04"]
+    assert read_manifest(root, app_ids=["app.b"]) == []
+
+
+def test_files_missing_from_the_manifest_are_ignored(landed):
+    root, _ = landed
+    with open(os.path.join(root, "month=2026-04", "part-half-written.parquet.tmp"), "wb") as f:
+        f.write(b"PAR1")
+    assert all(e["file"].endswith(".parquet") for e in read_manifest(root))
+
+
+def test_replay_rebuilds_what_was_loaded(landed, tmp_path):
+    root, pages = landed
+    conn, cursor = warehouse_at(tmp_path / "loaded.duckdb")
+    ensure_reviews_table(cursor)
+    cursor.execute(STAGING_DDL)
+    commit_batch(conn, cursor, [r for page in pages for r in page])
+    loaded = cursor.execute(STORED_SQL).fetchall()
+    conn.close()
+
+    conn, cursor = warehouse_at(tmp_path / "replayed.duckdb")
+    counts = replay(conn, cursor, root, batch_size=700)
+    assert counts == {"inserted": 2_000, "updated": 0, "unchanged": 0}
+    assert cursor.execute(STORED_SQL).fetchall() == loaded
+    # Everything is already there: a second replay changes nothing
+    assert replay(conn, cursor, root) == {"inserted": 0, "updated": 0, "unchanged": 2_000}
+    assert cursor.execute(STORED_SQL).fetchall() == loaded
+    # One month only
+    assert replay(conn, cursor, root, months=["2026-05"])["unchanged"] < 2_000
+    conn.close()
+
+
+def test_rebuild_replaces_the_app_from_the_landing_zone(landed, tmp_path, monkeypatch):
+    root, _ = landed
+    path = tmp_path / "warehouse.duckdb"
+    conn, cursor = warehouse_at(path)
+    replay(conn, cursor, root)
+    expected = cursor.execute(STORED_SQL).fetchall()
+    cursor.execute("UPDATE reviews SET content = 'edited' WHERE review_id IN (SELECT review_id FROM reviews LIMIT 5)")
+    cursor.execute("INSERT INTO reviews (review_id, app_id) VALUES ('not-landed', 'app.a')")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setenv("WAREHOUSE_BACKEND", "duckdb")
+    monkeypatch.setenv("WAREHOUSE_PATH", str(path))
+    monkeypatch.setenv("KNOWN_IDS_FILTER", "0")
+    warehouse.close()
+    try:
+        landing.main(["replay", "--root", root, "--app", "app.a", "--rebuild"])
+    finally:
+        warehouse.close()
+    db = duckdb.connect(str(path))
+    assert db.execute(STORED_SQL).fetchall() == expected
+    db.close()
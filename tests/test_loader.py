@@ -0,0 +1,44 @@
+# tests/test_loader.py
+
+import duckdb
+import pytest
+
+from fake_play import FakePlayStore
+from ingest_pipeline import STAGING_DDL, commit_batch, ensure_reviews_table
+from transform import ReviewBuffer
+import warehouse
+
+
+def raw_rows(n=2_000):
+    store = FakePlayStore(n)
+    rows = [{**store.review("app.a", "en", i), "appId": "app.a"} for i in range(n)]
+    rows[1]["score"] = None
+    rows[2]["content"] = None
+    rows[3]["content"] = "Ünïcödé ✓ 😀 \"quoted\" 'single' \\ back"
+    rows[4]["appVersion"] = None
+    rows[5]["content"] = "x" * 5_000
+    return rows
+
+
+def load(tmp_path, rows, mode):
+    conn = warehouse.LocalConnection(duckdb.connect(str(tmp_path / f"{mode}.duckdb")), "duckdb")
+    cursor = conn.cursor()
+    ensure_reviews_table(cursor)
+    cursor.execute(STAGING_DDL)
+    counts = commit_batch(conn, cursor, rows, mode)
+    stored = cursor.execute("SELECT * FROM reviews ORDER BY review_id").fetchall()
+    conn.close()
+    return counts, stored
+
+
+@pytest.mark.parametrize("buffered", [False, True])
+def test_parquet_and_insert_modes_store_the_same_rows(tmp_path, buffered):
+    rows = raw_rows()
+    if buffered:
+        buffer = ReviewBuffer()
+        buffer.extend(rows)
+        rows = buffer
+    inserted = load(tmp_path, rows, "insert")
+    bulk = load(tmp_path, rows, "parquet")
+    assert inserted[0].inserted == bulk[0].inserted == 2_000
+    assert bulk[1] == inserted[1]
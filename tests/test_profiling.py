@@ -0,0 +1,73 @@
+# tests/test_profiling.py
+
+import glob
+import json
+import os
+import threading
+import tracemalloc
+
+import pytest
+
+import profiling
+
+
+def busy(n):
+    """Some CPU and allocations on the calling thread and on a worker thread."""
+    out = []
+    worker = threading.Thread(target=lambda: out.append(sum(i * i for i in range(n))))
+    worker.start()
+    worker.join()
+    return [str(i) for i in range(n)], out[0]
+
+
+def artifact(prof):
+    with open(prof.path) as f:
+        return json.load(f)
+
+
+def test_profiled_run_writes_artifact_and_summary(tmp_path):
+    with profiling.profiled("run-1", enabled=True, directory=str(tmp_path)) as prof:
+        result = busy(50_000)
+    assert result == busy(50_000)
+    assert prof.path == str(tmp_path / "profile-run-1.json") and os.path.exists(prof.stats_path)
+    report = artifact(prof)
+    assert report["name"] == "run-1" and report["top_cumulative"] and report["top_allocations"]
+    assert any("busy" in row["function"] for row in report["top_cumulative"])
+    assert prof.summary.startswith("wall ") and prof.summary.endswith(f"artifact {prof.path}")
+    assert not tracemalloc.is_tracing()
+
+
+def test_exceptions_pass_through_and_the_profile_is_still_written(tmp_path):
+    error = ValueError("boom")
+    with pytest.raises(ValueError) as raised:
+        with profiling.profiled("run-2", enabled=True, directory=str(tmp_path)) as prof:
+            busy(1_000)
+            raise error
+    assert raised.value is error
+    assert artifact(prof)["name"] == "run-2" and "artifact" in prof.summary
+    assert threading.getprofile() is None and not tracemalloc.is_tracing()
+
+
+def test_disabled_profiling_does_nothing(tmp_path, monkeypatch):
+    monkeypatch.delenv("PIPELINE_PROFILE", raising=False)
+    with profiling.profiled("run-3", directory=str(tmp_path)) as prof:
+        assert busy(10)[1] == 285
+    assert prof is None and os.listdir(tmp_path) == []
+    monkeypatch.setenv("PIPELINE_PROFILE", "1")
+    with profiling.profiled("run-4", directory=str(tmp_path)) as prof:
+        pass
+    assert os.path.exists(prof.path)
+
+
+def test_review_update_profile_flag(pipeline, tmp_path):
+    profiles = tmp_path / "profiles"
+    result = pipeline.script("review_update.py", "--profile", total=2_000, PROFILE_DIR=str(profiles))
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "ROWS_LOADED=2000" in result.stdout and "Profile written:" in result.stdout
+    (path,) = glob.glob(str(profiles / "profile-*.json"))
+    with open(path) as f:
+        assert json.load(f)["top_cumulative"]
+
+    plain = pipeline.script("review_update.py", total=2_000, PROFILE_DIR=str(tmp_path / "none"))
+    assert plain.returncode == 0 and "Profile written:" not in plain.stdout
+    assert not os.path.exists(tmp_path / "none")
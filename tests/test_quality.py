@@ -0,0 +1,83 @@
+# tests/test_quality.py
+
+import duckdb
+
+from fake_play import FakePlayStore
+from ingest_pipeline import STAGING_DDL, commit_batch, ensure_reviews_table
+from quality import COUNTERS, LONG_CONTENT, QualityLog
+import warehouse
+
+# Corpus-level counters computed from reviews, in COUNTERS order
+CORPUS_SQL = f"""
+SELECT app_id, COUNT(*), COUNT_IF(review_id IS NULL), COUNT_IF(content IS NULL OR TRIM(content) = ''),
+       COUNT_IF(score IS NULL), COUNT_IF(score NOT BETWEEN 1 AND 5), COUNT_IF(created_at IS NULL),
+       COUNT(review_id) - COUNT(DISTINCT review_id), COUNT_IF(LENGTH(content) > {LONG_CONTENT}),
+       SUM(COALESCE(LENGTH(content), 0)), SUM(COALESCE(LENGTH(content), 0) * COALESCE(LENGTH(content), 0))
+FROM reviews GROUP BY app_id ORDER BY app_id
+"""
+
+LOGGED_SQL = f"""
+SELECT app_id, {", ".join(f"SUM({name})" for name in COUNTERS)}
+FROM REVIEW_QUALITY_STATS GROUP BY app_id ORDER BY app_id
+"""
+
+
+def test_quality_stats_sum_to_the_stored_corpus(tmp_path):
+    conn = warehouse.LocalConnection(duckdb.connect(str(tmp_path / "warehouse.duckdb")), "duckdb")
+    cursor = conn.cursor()
+    ensure_reviews_table(cursor)
+    cursor.execute(STAGING_DDL)
+    quality = QualityLog()
+    quality.ensure_table(cursor)
+
+    store = FakePlayStore(1_000)
+    rows = [{**store.review("app.a", "en", i), "appId": "app.a"} for i in range(1_000)]
+    for row in rows[::7]:
+        row["content"] = "x" * (LONG_CONTENT + 1)
+    commit_batch(conn, cursor, rows[:600], quality=quality)
+
+    # Refetched unchanged rows, rewrites that blank or fix content, new rows
+    rows[10]["content"] = ""
+    rows[14]["content"] = "fine now"
+    rows[20]["score"] = None
+    commit_batch(conn, cursor, rows[:800], quality=quality)
+    commit_batch(conn, cursor, rows[500:], quality=quality)
+
+    corpus = [tuple(int(v) for v in row[1:]) for row in cursor.execute(CORPUS_SQL).fetchall()]
+    logged = [tuple(int(v) for v in row[1:]) for row in cursor.execute(LOGGED_SQL).fetchall()]
+    assert logged == corpus
+    assert corpus[0][0] == 1_000
+    assert quality.totals["missing_content"] == 1 and quality.totals["missing_score"] == 1
+    conn.close()
+
+
+
+def sums(db, sql):
+    return [(row[0], *(int(v) for v in row[1:])) for row in db.execute(sql).fetchall()]
+
+
+def test_quality_stats_follow_landing_replays(pipeline, tmp_path):
+    assert pipeline.run(total=2_000).returncode == 0
+
+    # Into an empty warehouse, then onto the same one, where nothing changes
+    for path in (str(tmp_path / "replayed.duckdb"), pipeline.path):
+        result = pipeline.replay(WAREHOUSE_PATH=path)
+        assert result.returncode == 0, result.stderr
+        db = duckdb.connect(path)
+        corpus = sums(db, CORPUS_SQL)
+        assert corpus[0][1] == 2_000 and sums(db, LOGGED_SQL) == corpus
+        db.close()
+
+    # A review loaded without the landing zone is gone after a rebuild, from the stats too
+    conn = warehouse.LocalConnection(duckdb.connect(pipeline.path), "duckdb")
+    cursor = conn.cursor()
+    cursor.execute(STAGING_DDL)
+    extra = {**FakePlayStore(1).review("app.a", "en", 0), "reviewId": "unlanded", "appId": "app.a"}
+    commit_batch(conn, cursor, [extra], quality=QualityLog())
+    conn.close()
+    result = pipeline.replay("--rebuild", "--app", "app.a")
+    assert result.returncode == 0, result.stderr
+    db = pipeline.connect()
+    corpus = sums(db, CORPUS_SQL)
+    assert corpus[0][1] == 2_000 and sums(db, LOGGED_SQL) == corpus
+    db.close()
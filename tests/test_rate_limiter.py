@@ -0,0 +1,108 @@
+# tests/test_rate_limiter.py
+
+from google_play_scraper.exceptions import NotFoundError
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter
+
+
+class Clock:
+    """Stands in for time.monotonic/time.sleep: sleeping advances the clock, instantly."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", clock.sleep)
+    # Full jitter at its upper bound, so backoff delays are deterministic
+    monkeypatch.setattr(rate_limiter.random, "uniform", lambda low, high: high)
+    return clock
+
+
+def test_token_bucket_paces_calls_after_the_burst(clock):
+    limiter = RateLimiter(rate=10, burst=2)
+    for _ in range(4):
+        limiter.acquire()
+    # The burst goes out at once, then one token per 1/rate seconds
+    assert clock.sleeps == pytest.approx([0.1, 0.1])
+
+
+def test_aimd_adjusts_the_rate(clock):
+    limiter = RateLimiter(rate=4, min_rate=1, max_rate=5, increase=0.5, slowdown=0.9, decrease=0.5)
+    limiter.record_success(0.1)
+    assert limiter.rate == 4.5
+    limiter.record_success(0.1)
+    limiter.record_success(0.1)
+    assert limiter.rate == 5  # capped at max_rate
+    limiter.record_success(10)
+    assert limiter.rate == pytest.approx(4.5)
+    limiter.record_error()
+    assert limiter.rate == pytest.approx(2.25) and limiter.retries == 1
+    for _ in range(5):
+        limiter.record_error()
+    assert limiter.rate == 1  # floored at min_rate
+
+
+def test_errors_drain_the_bucket_and_reach_the_parent(clock):
+    parent = RateLimiter(rate=20, burst=20)
+    limiter = RateLimiter(rate=10, burst=10, parent=parent)
+    limiter.record_error()
+    assert parent.rate == 10 and parent.retries == 1
+    limiter.acquire()
+    assert clock.now == pytest.approx(1 / limiter.rate)
+
+
+def test_call_retries_with_exponential_backoff(clock):
+    limiter = RateLimiter(rate=100, burst=100, base_delay=0.5, max_delay=1.5, max_retries=5)
+    outcomes = [RuntimeError("429"), RuntimeError("503"), RuntimeError("503"), "rows"]
+
+    def flaky():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert limiter.call(flaky) == "rows"
+    assert limiter.retries == 3
+    # 0.5, 1.0, then capped at max_delay; the bucket's own waits are the other sleeps
+    backoffs = [s for s in clock.sleeps if s >= 0.5]
+    assert backoffs == [0.5, 1.0, 1.5]
+
+
+def test_call_gives_up_after_max_retries(clock):
+    limiter = RateLimiter(rate=100, burst=100, max_retries=2)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError("503")
+
+    with pytest.raises(RuntimeError):
+        limiter.call(failing)
+    assert len(calls) == 3
+
+
+def test_not_found_is_not_retried(clock):
+    limiter = RateLimiter(rate=100, burst=100)
+    calls = []
+
+    def missing():
+        calls.append(1)
+        raise NotFoundError("no such app")
+
+    with pytest.raises(NotFoundError):
+        limiter.call(missing)
+    assert calls == [1] and limiter.retries == 0
@@ -0,0 +1,39 @@
+# tests/test_resume.py
+
+import pytest
+
+# Fails the 80th Google Play call of the run: "kill" ends the process on the
+# spot, "error" raises with retries off, so the run fails through its
+# error path after committing what it had fetched
+FAIL_AT_CALL_80 = """
+reviews = store.reviews
+calls = []
+
+def failing(*args, **kwargs):
+    calls.append(1)
+    if len(calls) == 80:
+        if {mode!r} == "kill":
+            os._exit(9)
+        raise RuntimeError("injected failure at call 80")
+    return reviews(*args, **kwargs)
+
+store.reviews = failing
+"""
+
+
+@pytest.mark.parametrize("mode", ["kill", "error"])
+def test_resume_after_failure_loads_every_review_once(pipeline, mode):
+    failed = pipeline.run(total=30_000, setup=FAIL_AT_CALL_80.format(mode=mode), FETCH_MAX_RETRIES="0")
+    assert failed.returncode != 0, failed.stdout
+    conn = pipeline.connect()
+    committed = conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+    conn.close()
+    assert 0 < committed < 30_000
+
+    resumed = pipeline.run(total=30_000)
+    assert resumed.returncode == 0, resumed.stdout + resumed.stderr
+    assert "Resuming app.a" in resumed.stdout
+
+    conn = pipeline.connect()
+    assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT review_id) FROM reviews").fetchone() == (30_000, 30_000)
+    conn.close()
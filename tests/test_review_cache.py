@@ -0,0 +1,70 @@
+# tests/test_review_cache.py
+
+import warnings
+
+import duckdb
+
+from ingest_pipeline import ensure_reviews_table
+from review_cache import arrow_batches, load_reviews
+import warehouse
+
+INSERT_SQL = """
+INSERT INTO reviews (review_id, content, score, created_at, app_id)
+SELECT %s || i, 'text', 5, TIMESTAMP '2025-01-01' + to_seconds({offset} + i * 60), %s
+FROM range({count}) t(i)
+"""
+
+
+def add_reviews(conn, app_id, count, offset=0):
+    cursor = conn.cursor()
+    cursor.execute(INSERT_SQL.format(offset=offset, count=count), (f"{app_id}:{offset}:", app_id))
+    cursor.close()
+    conn.commit()
+
+
+def test_cache_is_scoped_to_one_app(tmp_path):
+    conn = warehouse.LocalConnection(duckdb.connect(str(tmp_path / "warehouse.duckdb")), "duckdb")
+    cursor = conn.cursor()
+    ensure_reviews_table(cursor)
+    cursor.close()
+    add_reviews(conn, "app.a", 300)
+    add_reviews(conn, "app.b", 200)
+    path = str(tmp_path / "cache")
+
+    a = load_reviews(conn, path=path, app_id="app.a")
+    b = load_reviews(conn, path=path, app_id="app.b")
+    assert len(a) == 300 and set(a["APP_ID"].astype(str)) == {"app.a"}
+    assert len(b) == 200 and set(b["APP_ID"].astype(str)) == {"app.b"}
+
+    # New reviews of the other app neither reach nor invalidate this app's cache
+    add_reviews(conn, "app.b", 50, offset=10**6)
+    add_reviews(conn, "app.a", 10, offset=10**6)
+    a = load_reviews(conn, path=path, app_id="app.a")
+    assert len(a) == 310 and set(a["APP_ID"].astype(str)) == {"app.a"}
+    assert len(load_reviews(conn, path=path, app_id=None)) == 560
+    conn.close()
+
+
+class OlderDuckDBCursor:
+    """A duckdb cursor from before to_arrow_reader(): only fetch_record_batch()."""
+
+    dialect = "duckdb"
+
+    def __init__(self, cursor):
+        self.fetch_record_batch = cursor.fetch_record_batch
+
+
+def test_arrow_batches_avoid_the_deprecated_duckdb_reader():
+    conn = warehouse.LocalConnection(duckdb.connect(), "duckdb")
+    cursor = conn.cursor()
+    cursor.execute("SELECT range AS i FROM range(2500)")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        sizes = [batch.num_rows for batch in arrow_batches(cursor, 1000)]
+    assert sum(sizes) == 2500 and max(sizes) <= 1000
+
+    cursor.execute("SELECT range AS i FROM range(2500)")
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        assert sum(b.num_rows for b in arrow_batches(OlderDuckDBCursor(cursor), 1000)) == 2500
+    conn.close()
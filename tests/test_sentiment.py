@@ -0,0 +1,71 @@
+# tests/test_sentiment.py
+
+import duckdb
+import pytest
+
+from ingest_pipeline import ensure_reviews_table
+from sentiment import SentimentEngine, backfill
+import warehouse
+
+WORDS = ["great", "awful", "fine", "slow", "love it", "crashes", "helpful", "meh"]
+
+
+class CountingEngine(SentimentEngine):
+    """Records the size of every chunk it scores and can fail on a given call."""
+
+    def __init__(self, path, fail_on=None):
+        super().__init__(path=path, workers=1)
+        self.calls = []
+        self.fail_on = fail_on
+
+    def scores(self, texts):
+        self.calls.append(len(texts))
+        if len(self.calls) == self.fail_on:
+            raise RuntimeError("scorer crashed")
+        return super().scores(texts)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = warehouse.LocalConnection(duckdb.connect(str(tmp_path / "reviews.duckdb")), "duckdb")
+    cursor = conn.cursor()
+    ensure_reviews_table(cursor)
+    cursor.executemany("INSERT INTO reviews (review_id, content) VALUES (%s, %s)",
+                       [(f"r{i}", None if i % 50 == 0 else f"{WORDS[i % 8]} {i}") for i in range(1_000)])
+    cursor.close()
+    yield conn
+    conn.close()
+
+
+def unscored(conn):
+    cursor = conn.cursor()
+    count = cursor.execute("SELECT COUNT(*) FROM reviews WHERE sentiment IS NULL AND content IS NOT NULL").fetchall()
+    cursor.close()
+    return count[0][0]
+
+
+def test_backfill_scores_one_chunk_at_a_time(conn, tmp_path):
+    engine = CountingEngine(str(tmp_path / "cache"))
+    assert backfill(conn, engine, batch_size=300) == 980
+    assert engine.calls == [300, 300, 300, 80]
+    assert unscored(conn) == 0
+    cursor = conn.cursor()
+    stored = dict(cursor.execute("SELECT content, sentiment FROM reviews WHERE content IS NOT NULL").fetchall())
+    cursor.close()
+    expected = SentimentEngine(path=None).compound(list(stored))
+    assert list(stored.values()) == pytest.approx(expected.tolist())
+
+
+def test_interrupted_backfill_keeps_committed_chunks(conn, tmp_path):
+    with pytest.raises(RuntimeError):
+        backfill(conn, CountingEngine(str(tmp_path / "cache"), fail_on=3), batch_size=300)
+    assert unscored(conn) == 380
+    engine = CountingEngine(str(tmp_path / "cache"))
+    assert backfill(conn, engine, batch_size=300) == 380
+    assert engine.calls == [300, 80] and unscored(conn) == 0
+
+
+def test_nothing_to_backfill(conn, tmp_path):
+    backfill(conn, CountingEngine(str(tmp_path / "cache")), batch_size=300)
+    engine = CountingEngine(str(tmp_path / "cache"))
+    assert backfill(conn, engine, batch_size=300) == 0 and engine.calls == []
@@ -0,0 +1,66 @@
+# tests/test_spans.py
+
+import pytest
+
+import spans
+
+# Makes the MERGE of the first batch fail, after fetching and staging worked
+FAIL_MERGE = """
+import ingest_pipeline
+
+ingest_pipeline.MERGE_SQL = "MERGE INTO missing_table AS target USING reviews_staging AS source ON FALSE"
+"""
+
+STAGES_SQL = """
+SELECT STAGE, CALLS, DURATION_SEC, ROWS_PROCESSED, PAGES
+FROM PIPELINE_STAGE_MONITORING WHERE RUN_ID = ? AND TASK_NAME = 'review_update'
+"""
+
+
+def logged_run(pipeline):
+    """The single PIPELINE_MONITORING row and its stages as {stage: (calls, seconds, rows, pages)}."""
+    conn = pipeline.connect()
+    runs = conn.execute("SELECT RUN_ID, STATUS, DURATION_SEC FROM PIPELINE_MONITORING").fetchall()
+    assert len(runs) == 1
+    run_id, status, duration = runs[0]
+    stages = {stage: rest for stage, *rest in conn.execute(STAGES_SQL, [run_id]).fetchall()}
+    conn.close()
+    return status, duration, stages
+
+
+def test_stages_are_logged_with_the_run(pipeline):
+    result = pipeline.run(total=3_000, monitored=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    status, duration, stages = logged_run(pipeline)
+    assert status == "SUCCESS"
+    assert {"setup", "fetch", "transform", "stage", "merge", "commit", "watermarks", "metadata"} <= set(stages)
+    calls, _, rows, pages = stages["fetch"]
+    assert rows == 3_000 and pages == calls
+    assert stages["merge"][2] == 3_000
+    assert all(seconds >= 0 for _, seconds, _, _ in stages.values())
+    # Stages on the main thread do not overlap, so they fit in the run
+    assert sum(stages[s][1] for s in ("setup", "merge", "commit", "watermarks", "metadata")) <= duration
+
+
+def test_failed_stage_still_records_its_span(pipeline):
+    result = pipeline.run(total=3_000, setup=FAIL_MERGE, monitored=True)
+    assert result.returncode != 0
+    status, _, stages = logged_run(pipeline)
+    assert status == "FAILURE"
+    assert stages["merge"][0] == 1 and stages["merge"][2] > 0
+    assert "commit" not in stages and "watermarks" not in stages
+
+
+def test_span_counters_are_summed_per_stage():
+    tracer = spans.start_run("test")
+    for rows in (10, 20):
+        with spans.span("stage", rows=rows) as counts:
+            counts["bytes"] = 100
+    with pytest.raises(RuntimeError):
+        with spans.span("merge", rows=5):
+            raise RuntimeError("merge failed")
+    rows = {row[2]: row[3:] for row in tracer.rows()}
+    assert rows["stage"][0] == 2 and rows["stage"][2] == 30 and rows["stage"][4] == 200
+    assert rows["merge"][0] == 1 and rows["merge"][2] == 5
+    with pytest.raises(ValueError):
+        tracer.record("stage", 1.0, row=1)
@@ -0,0 +1,54 @@
+# tests/test_vader_batch.py
+
+import random
+
+import pandas as pd
+import pytest
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+from sentiment import SCORES
+from vader_batch import TOLERANCE, BatchScorer
+
+TEXTS = [
+    "VADER is smart, handsome, and funny.", "VADER is VERY SMART, uber handsome, and FRIGGIN FUNNY!!!",
+    "VADER is not smart, handsome, nor funny.", "At least it isn't a horrible book.",
+    "Today only kinda sux! But I'll get by, lol", "Make sure you :) or :D today!",
+    "Catch utf-8 emoji such as 💘 and 💋 and 😁", "Not bad at all", "Without a doubt, excellent idea.",
+    "Great app, very helpful for work and study.", "It keeps logging me out after the latest update.",
+    "The app is good but the free tier limits are frustrating!!", "", "   ", "!!!", "why??",
+]
+
+
+@pytest.fixture(scope="module")
+def analyzer():
+    return SentimentIntensityAnalyzer()
+
+
+def expected(analyzer, texts):
+    return pd.DataFrame([analyzer.polarity_scores(t) for t in texts])[list(SCORES)]
+
+
+def assert_agrees(got, want):
+    for name in SCORES:
+        assert (got[name] - want[name]).abs().max() <= TOLERANCE[name] + 1e-9, name
+
+
+def test_batch_matches_polarity_scores(analyzer):
+    assert_agrees(BatchScorer(analyzer).scores(TEXTS), expected(analyzer, TEXTS))
+
+
+def test_nul_in_a_text_does_not_depend_on_the_batch(analyzer):
+    text = "It was fine and the update made things better, honestly a\x00b!!!"
+    scorer = BatchScorer(analyzer)
+    alone = scorer.scores([text])["compound"][0]
+    batched = scorer.scores(["a\x00b </3 feudal cautious cutting.", text])["compound"][1]
+    assert batched == alone == analyzer.polarity_scores(text)["compound"]
+
+
+def test_texts_with_nul_and_separator_tokens(analyzer):
+    rng = random.Random(0)
+    texts = []
+    for _ in range(2_000):
+        words = rng.choices(TEXTS[:12], k=2)
+        texts.append(rng.choice(["\0", " \0 ", "\0!", "a\0b", "\0\0"]).join(words))
+    assert_agrees(BatchScorer(analyzer).scores(texts), expected(analyzer, texts))
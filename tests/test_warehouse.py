@@ -0,0 +1,125 @@
+# tests/test_warehouse.py
+
+import pytest
+
+import monitor_pipeline
+import review_update
+import warehouse
+
+
+class SessionExpired(Exception):
+    def __init__(self, message, errno=390112):
+        super().__init__(message)
+        self.errno = errno
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+        self.expired = False
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        if self.conn.expired:
+            raise SessionExpired("Session no longer exists", errno=390114)
+        self.conn.statements.append(sql)
+        if sql == "expire":
+            raise SessionExpired("Authentication token has expired")
+        if sql == "fail":
+            raise RuntimeError("syntax error")
+        return self
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    """Registers a fake backend that counts the connections it opens."""
+    opened = []
+
+    def connect(params):
+        opened.append(FakeConnection(len(opened) + 1))
+        return opened[-1]
+
+    warehouse.close()
+    warehouse.register_backend("fake", connect)
+    monkeypatch.setenv("WAREHOUSE_BACKEND", "fake")
+    yield opened
+    warehouse.close()
+
+
+def test_connection_is_shared(backend):
+    assert warehouse.get_connection() is warehouse.get_connection()
+    with warehouse.cursor() as cur:
+        cur.execute("SELECT 1")
+    assert len(backend) == 1
+
+
+def test_expired_session_reconnects_on_next_use(backend):
+    with pytest.raises(SessionExpired):
+        with warehouse.cursor() as cur:
+            cur.execute("expire")
+    with warehouse.cursor() as cur:
+        assert cur.conn.number == 2
+    assert len(backend) == 2
+
+
+def test_session_dropped_by_the_server_reconnects(backend):
+    warehouse.get_connection().expired = True
+    with pytest.raises(SessionExpired) as error:
+        with warehouse.cursor() as cur:
+            cur.execute("SELECT 1")
+    assert error.value.errno == 390114
+    with warehouse.cursor() as cur:
+        assert cur.conn.number == 2
+
+
+def test_run_logged_after_the_ingest_session_expired(backend):
+    warehouse.get_connection().expired = True
+    with pytest.raises(SessionExpired):
+        review_update.main(app_ids=["app.a"])
+    monitor_pipeline.log_to_snowflake("FAILURE", 0, "Session no longer exists", 1.0, run_id="run-1")
+    assert len(backend) == 2
+    assert any("INSERT INTO PIPELINE_MONITORING" in sql for sql in backend[1].statements)
+
+
+def test_other_errors_keep_the_session(backend):
+    with pytest.raises(RuntimeError):
+        with warehouse.cursor() as cur:
+            cur.execute("fail")
+    with warehouse.cursor() as cur:
+        assert cur.conn.number == 1
+
+
+def test_closed_connection_is_reopened(backend):
+    warehouse.get_connection().close()
+    assert warehouse.get_connection().number == 2
+
+
+def test_empty_variables_fall_back_to_defaults(monkeypatch):
+    monkeypatch.setenv("SNOWFLAKE_WAREHOUSE", "")
+    monkeypatch.setenv("SNOWFLAKE_PASSWORD", "")
+    monkeypatch.setenv("SNOWFLAKE_ROLE", "ANALYST")
+    monkeypatch.setenv("WAREHOUSE_BACKEND", "")
+    params = warehouse.conn_params()
+    assert params["warehouse"] == "COMPUTE_WH" and params["password"] is None and params["role"] == "ANALYST"
+    assert warehouse.backend_name() == "snowflake"
@@ -0,0 +1,224 @@
+# transform.py
+
+from array import array
+from datetime import datetime, timedelta, timezone
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # Arrow output is optional
+    pa = None
+
+
+# Scraper payload keys -> reviews table columns, in INSERT order
+FIELD_MAP = {
+    "reviewId": "review_id",
+    "userName": "user_name",
+    "content": "content",
+    "score": "score",
+    "at": "created_at",
+    "appVersion": "app_version",
+    "appId": "app_id",
+}
+
+COLUMNS = list(FIELD_MAP.values()) + ["content_hash"]
+
+# Fields the MERGE rewrites; a row whose fingerprint over these is unchanged
+# is skipped instead of updated
+HASHED_COLUMNS = ["content", "score", "created_at", "app_version", "app_id"]
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+HASH_CHUNK = 65536  # rows fingerprinted at a time
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_NAT = np.iinfo(np.int64).min   # created_at sentinel, read back as NaT
+_NO_SCORE = -128                # score sentinel, read back as <NA>
+
+
+class ReviewBuffer:
+    """Columnar micro-batch of reviews holding only the schema fields.
+
+    Scraper dicts are unpacked on `extend()` and dropped: ids and review
+    text go into lists, the heavily repeated `user_name`, `app_version`
+    and `app_id` strings are interned, and `score`/`created_at` are packed
+    into typed arrays. `to_frame()` wraps those arrays without copying the
+    values, so a batch never exists as both dicts and a DataFrame.
+    """
+
+    __slots__ = ("review_id", "user_name", "content", "score", "created_at", "app_version", "app_id")
+
+    def __init__(self, rows=()):
+        self.review_id = []
+        self.user_name = []
+        self.content = []
+        self.score = array("b")
+        self.created_at = array("q")
+        self.app_version = []
+        self.app_id = []
+        self.extend(rows)
+
+    def __len__(self):
+        return len(self.review_id)
+
+    def extend(self, rows):
+        """Append raw scraper dicts, keeping only the FIELD_MAP keys."""
+        for r in rows:
+            self.review_id.append(r.get("reviewId"))
+            self.user_name.append(_intern(r.get("userName")))
+            self.content.append(r.get("content"))
+            score = r.get("score")
+            self.score.append(_NO_SCORE if score is None else score)
+            self.created_at.append(_micros(r.get("at")))
+            self.app_version.append(_intern(r.get("appVersion")))
+            self.app_id.append(_intern(r.get("appId")))
+
+    def to_frame(self):
+        """Build the same DataFrame as `to_frame()` over the equivalent dicts."""
+        scores = np.frombuffer(self.score, dtype=np.int8)
+        df = pd.DataFrame({
+            "review_id": pd.Series(self.review_id, dtype=object),
+            "user_name": pd.Series(self.user_name, dtype=object),
+            "content": pd.Series(self.content, dtype=object),
+            "score": pd.arrays.IntegerArray(scores.astype(np.int64), scores == _NO_SCORE),
+            "created_at": np.frombuffer(self.created_at, dtype="datetime64[us]"),
+            "app_version": pd.Series(self.app_version, dtype=object),
+            "app_id": pd.Series(self.app_id, dtype=object),
+        }, copy=False)
+        df["content_hash"] = content_hashes(df)
+        return df
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _micros(value):
+    """Microseconds since the epoch for a scraper timestamp (naive or aware)."""
+    if value is None:
+        return _NAT
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def to_frame(rows):
+    """Build a reviews-shaped DataFrame from raw scraper dicts or a `ReviewBuffer`.
+
+    Only the schema fields are read, so the discarded payload keys
+    (userImage, thumbsUpCount, replyContent, ...) are never copied.
+    Timestamps are kept at microsecond resolution whatever the pandas
+    default, so content fingerprints do not depend on the pandas version.
+    """
+    if isinstance(rows, ReviewBuffer):
+        return rows.to_frame()
+    df = pd.DataFrame.from_records(rows, columns=list(FIELD_MAP))
+    df.columns = list(FIELD_MAP.values())
+    df["created_at"] = pd.to_datetime(df["created_at"], errors="coerce").dt.as_unit("us")
+    df["score"] = pd.to_numeric(df["score"], errors="coerce").astype("Int64")
+    df["content_hash"] = content_hashes(df)
+    return df
+
+
+def content_hashes(df):
+    """Vectorised 64-bit fingerprint of the MERGE-updated fields, as signed BIGINTs.
+
+    Hashed in chunks, because hashing text columns builds a temporary encoded
+    copy of every string.
+    """
+    fields = df[HASHED_COLUMNS]
+    out = np.empty(len(fields), dtype=np.int64)
+    for i in range(0, len(fields), HASH_CHUNK):
+        hashed = pd.util.hash_pandas_object(fields.iloc[i:i + HASH_CHUNK], index=False)
+        out[i:i + HASH_CHUNK] = hashed.to_numpy(dtype="uint64").view("int64")
+    return out
+
+
+def format_timestamps(values):
+    """Format a datetime column as 'YYYY-MM-DD HH:MM:SS' strings, None for NaT."""
+    ts = pd.to_datetime(values, errors="coerce")
+    if getattr(ts.dt, "tz", None) is not None:
+        ts = ts.dt.tz_convert("UTC").dt.tz_localize(None)
+    text = np.datetime_as_string(ts.to_numpy(dtype="datetime64[s]"), unit="s").astype("U19")
+    # 'YYYY-MM-DDTHH:MM:SS' -> 'YYYY-MM-DD HH:MM:SS' by patching the
+    # separator code point of every fixed-width string in place
+    text.view(np.uint32).reshape(-1, 19)[:, 10] = ord(" ")
+    out = text.astype(object)
+    out[ts.isna().to_numpy()] = None
+    return out
+
+
+def to_columns(df):
+    """Return upload-ready object arrays (Python scalars, None for nulls) keyed by column."""
+    columns = {}
+    for name in COLUMNS:
+        if name == "created_at":
+            columns[name] = format_timestamps(df[name])
+        else:
+            columns[name] = df[name].to_numpy(dtype=object, na_value=None)
+    return columns
+
+
+def to_records(df):
+    """Convert a reviews DataFrame into tuples for the staging INSERT."""
+    columns = to_columns(df)
+    return list(zip(*(columns[name] for name in COLUMNS)))
+
+
+def prepare_records(rows):
+    """Turn raw scraper dicts into tuples matching loader.INSERT_STAGING_SQL."""
+    if not rows:
+        return []
+    return to_records(to_frame(rows))
+
+
+def iter_record_batches(rows, chunk_size):
+    """Yield upload-ready record lists of at most `chunk_size` rows."""
+    for i in range(0, len(rows), chunk_size):
+        yield prepare_records(rows[i:i + chunk_size])
+
+
+def to_numpy_batch(df):
+    """Return NumPy-backed columns: datetime64 timestamps, float scores (NaN for null), object strings."""
+    return {
+        "review_id": df["review_id"].to_numpy(dtype=object, na_value=None),
+        "user_name": df["user_name"].to_numpy(dtype=object, na_value=None),
+        "content": df["content"].to_numpy(dtype=object, na_value=None),
+        "score": df["score"].to_numpy(dtype="float64", na_value=np.nan),
+        "created_at": df["created_at"].to_numpy(dtype="datetime64[us]"),
+        "app_version": df["app_version"].to_numpy(dtype=object, na_value=None),
+        "app_id": df["app_id"].to_numpy(dtype=object, na_value=None),
+        "content_hash": df["content_hash"].to_numpy(dtype="int64"),
+    }
+
+
+def arrow_schema():
+    """Arrow schema matching the reviews table."""
+    if pa is None:
+        raise ImportError("pyarrow is required for Arrow batches: pip install pyarrow")
+    return pa.schema([
+        ("review_id", pa.string()),
+        ("user_name", pa.string()),
+        ("content", pa.string()),
+        ("score", pa.int8()),
+        ("created_at", pa.timestamp("us")),
+        ("app_version", pa.string()),
+        ("app_id", pa.string()),
+        ("content_hash", pa.int64()),
+    ])
+
+
+def to_arrow(df):
+    """Convert a reviews DataFrame into an Arrow RecordBatch."""
+    schema = arrow_schema()
+    return pa.RecordBatch.from_pandas(df[COLUMNS], schema=schema, preserve_index=False)
+
+
+def iter_arrow_batches(rows, chunk_size):
+    """Yield Arrow RecordBatches of at most `chunk_size` reviews from raw scraper dicts."""
+    for i in range(0, len(rows), chunk_size):
+        yield to_arrow(to_frame(rows[i:i + chunk_size]))
@@ -0,0 +1,321 @@
+# vader_batch.py
+
+import string
+
+import numpy as np
+import pandas as pd
+from vaderSentiment.vaderSentiment import (
+    BOOSTER_DICT, C_INCR, N_SCALAR, NEGATE, SPECIAL_CASES, SentimentIntensityAnalyzer,
+)
+
+from sentiment import SCORES
+
+
+# Largest difference from SentimentIntensityAnalyzer.polarity_scores allowed
+# by benchmarks/bench_vader_batch.py: one unit of the rounding VADER applies.
+# Valences and sums go through the same float64 operations in the same order,
+# and the scores are rounded like round(), so they come out identical on its
+# corpus; the bound leaves room for a rounding tie that _round misses
+TOLERANCE = {"neg": 1e-3, "neu": 1e-3, "pos": 1e-3, "compound": 1e-4}
+
+ALPHA = 15          # normalize(): score / sqrt(score^2 + ALPHA)
+NO_VALENCE = 0.0
+# Words the rules below look for by name
+RULE_WORDS = ("no", "kind", "of", "least", "at", "very", "never", "so", "this", "without", "doubt", "or", "nor", "but")
+
+_PUNCTUATION = string.punctuation
+# Texts are joined with NUL tokens; pd.factorize hashes strings up to their
+# first NUL, so NULs in the texts themselves become \x01, a character VADER
+# treats the same way (not whitespace, punctuation, cased or in the lexicon)
+_SEPARATOR = "\0"
+_SEPARATE = f" {_SEPARATOR} "
+_NUL_FREE = str.maketrans(_SEPARATOR, "\x01")
+
+
+def _but_check(sentiments, positions, but_index):
+    """VADER's _but_check on one text's scored words at `positions`, quirks included.
+
+    It finds each valence with list.index(), so when a rescaled valence
+    equals a later one (-1.4 * 0.5 and -0.7), the later one rescales the
+    earlier word instead. Kept as is to match polarity_scores.
+    """
+    for sentiment in sentiments:
+        si = sentiments.index(sentiment)
+        if positions[si] < but_index:
+            sentiments[si] = sentiment * 0.5
+        elif positions[si] > but_index:
+            sentiments[si] = sentiment * 1.5
+    return sentiments
+
+
+def _round(values, digits):
+    """np.round, except that values close to a tie get Python's correctly rounded round()."""
+    out = np.round(values, digits)
+    scaled = values * 10 ** digits
+    near_tie = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+    out[near_tie] = [round(x, digits) for x in values[near_tie].tolist()]
+    return out
+
+
+class BatchScorer:
+    """VADER scores for a whole column of texts, computed with array operations.
+
+    Texts are split into one flat token array; each distinct token is
+    stripped, lower-cased and looked up once, in a vocabulary of the
+    lexicon, boosters and negations whose valences and flags are
+    precomputed as arrays. The rules of `polarity_scores` (the "no" and
+    "least" negations, ALL CAPS emphasis, boosters and negations up to
+    three words back, special idioms, the "but" shift) are then applied to
+    every lexicon word at once from the ids of the words around it, and
+    the per-text sums come from `np.bincount`. Only texts containing emoji
+    go through VADER's own per-character emoji replacement.
+    """
+
+    def __init__(self, analyzer=None):
+        analyzer = analyzer or SentimentIntensityAnalyzer()
+        self.emojis = analyzer.emojis
+        # polarity_scores replaces emoji one character at a time, so longer keys never match
+        self._emoji_chars = frozenset(e for e in self.emojis if len(e) == 1)
+
+        lexicon = analyzer.lexicon
+        words = list(lexicon) + [w for w in BOOSTER_DICT if w not in lexicon]
+        words += [w for w in NEGATE if w not in lexicon and w not in BOOSTER_DICT]
+        phrase_words = {w for phrase in list(SPECIAL_CASES) + list(BOOSTER_DICT) for w in phrase.split()}
+        words += sorted((phrase_words | set(RULE_WORDS)) - set(words))
+        self.vocab = pd.Index(words)
+        # Any other word only counts as a negation or not ("n't"): two shared ids after the
+        # vocabulary, then one for "no word" before the start or past the end of a text
+        self.unknown, self.unknown_negation, self.boundary = len(words), len(words) + 1, len(words) + 2
+        words += ["", "n't", ""]
+        self.valence = np.array([lexicon.get(w, NO_VALENCE) for w in words], dtype=np.float64)
+        self.in_lexicon = np.array([w in lexicon for w in words], dtype=bool)
+        self.boost = np.array([BOOSTER_DICT.get(w, 0.0) for w in words], dtype=np.float64)
+        self.is_booster = self.boost != 0
+        self.negation = np.array([w in NEGATE or "n't" in w for w in words], dtype=bool)
+
+        self.ids = {w: self.vocab.get_loc(w) for w in RULE_WORDS}
+        # Multi-word SPECIAL_CASES and BOOSTER_DICT keys as tuples of vocabulary ids
+        self.special = [(tuple(self.vocab.get_loc(w) for w in phrase.split()), value)
+                        for phrase, value in SPECIAL_CASES.items() if " " in phrase]
+        self.booster_ngrams = [(tuple(self.vocab.get_loc(w) for w in phrase.split()), value)
+                               for phrase, value in BOOSTER_DICT.items() if " " in phrase]
+        self.in_phrase = np.zeros(len(words), dtype=bool)
+        self.in_phrase[[i for phrase, _ in self.special + self.booster_ngrams for i in phrase]] = True
+
+    def _replace_emoji(self, text):
+        """polarity_scores' emoji-to-description pass, unchanged."""
+        out = []
+        prev_space = True
+        for char in text:
+            if char in self.emojis:
+                if not prev_space:
+                    out.append(" ")
+                out.append(self.emojis[char])
+                prev_space = False
+            else:
+                out.append(char)
+                prev_space = char == " "
+        return "".join(out)
+
+    def _prepare(self, texts):
+        """`texts` as a list with emoji and NULs replaced (split() ignores the whitespace strip() would remove)."""
+        texts = list(texts)
+        if _SEPARATOR in "".join(texts):
+            texts = [t.translate(_NUL_FREE) if _SEPARATOR in t else t for t in texts]
+        # Every emoji is outside ASCII, and isascii() is O(1)
+        no_emoji = self._emoji_chars.isdisjoint
+        for i in np.flatnonzero(~np.fromiter(map(str.isascii, texts), dtype=bool, count=len(texts))):
+            if not no_emoji(texts[i]):
+                texts[i] = self._replace_emoji(texts[i])
+        return texts
+
+    def _tokens(self, texts):
+        """Flat token arrays (vocabulary id of the lower-cased word, ALL CAPS flag, text, position),
+        text offsets and lengths, and the number of "!" and "?" in each text."""
+        # One split() of all texts joined by a separator token is far cheaper than one per text
+        # (_prepare() took every NUL out of the texts, so each separator token is a join)
+        tokens = np.array(_SEPARATE.join(texts).split(), dtype=object)
+        codes, raw = pd.factorize(tokens)
+        found = [i for i, token in enumerate(raw) if token == _SEPARATOR]   # numpy would compare "\0" as ""
+        separator = codes == found[0] if found else np.zeros(len(codes), dtype=bool)
+        codes = codes[~separator]
+        lengths = np.bincount(np.cumsum(separator)[~separator], minlength=len(texts))
+        # Each distinct token is stripped of punctuation unless two characters or fewer
+        # would be left, an emoticon such as ":)" that is kept whole
+        words = [w if len(w) > 2 else token for token, w in zip(raw, (t.strip(_PUNCTUATION) for t in raw))]
+        lower = list(map(str.lower, words))
+        word_ids = self.vocab.get_indexer(lower)
+        for i in np.flatnonzero(word_ids < 0):
+            word_ids[i] = self.unknown_negation if "n't" in lower[i] else self.unknown
+        upper = np.fromiter(map(str.isupper, words), dtype=bool, count=len(words))
+        # Every "!" and "?" of a text is in one of its tokens
+        exclaim = np.fromiter((t.count("!") for t in raw), dtype=np.float64, count=len(raw))
+        question = np.fromiter((t.count("?") for t in raw), dtype=np.float64, count=len(raw))
+
+        doc = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        position = np.arange(len(doc)) - starts[doc]
+        marks = (np.bincount(doc, weights=exclaim[codes], minlength=len(texts)),
+                 np.bincount(doc, weights=question[codes], minlength=len(texts)))
+        return word_ids[codes], upper[codes], doc, position, starts, lengths, marks
+
+    def scores(self, texts):
+        """DataFrame of neg/neu/pos/compound for `texts` (strings), one row per text."""
+        texts = self._prepare(texts)
+        ids, upper, doc, pos, starts, lengths, (ep_count, qm_count) = self._tokens(texts)
+        n_docs = len(lengths)
+        named = self.ids
+
+        caps = np.bincount(doc, weights=upper, minlength=n_docs)
+        cap_diff = (caps > 0) & (caps < lengths)
+
+        # Only lexicon words carry a valence; booster words and "kind" in "kind of" score 0
+        follows = np.append(ids[1:], self.boundary)[:len(ids)]
+        follows[starts[lengths > 0] + lengths[lengths > 0] - 1] = self.boundary
+        scored = self.in_lexicon[ids] & ~self.is_booster[ids] & ~((ids == named["kind"]) & (follows == named["of"]))
+        at = np.flatnonzero(scored)
+        word, text, p = ids[at], doc[at], pos[at]
+
+        def near(values, k, outside):
+            """`values` k tokens after (k > 0) or before (k < 0) each scored word, `outside` past its text."""
+            inside = (p + k >= 0) & (p + k < lengths[text])
+            return np.where(inside, values[np.clip(at + k, 0, len(values) - 1)], outside)
+
+        prev = {k: near(ids, -k, self.boundary) for k in (1, 2, 3)}
+        nxt = {k: near(ids, k, self.boundary) for k in (1, 2)}
+        prev_upper = {k: near(upper, -k, False) for k in (1, 2, 3)}
+        emphasis = cap_diff[text]
+
+        def is_(array, *words):
+            hit = array == named[words[0]]
+            for w in words[1:]:
+                hit |= array == named[w]
+            return hit
+
+        lexicon_valence = self.valence[word]
+        v = lexicon_valence.copy()
+        # "no" before another lexicon word negates it rather than scoring itself
+        v[(word == named["no"]) & self.in_lexicon[nxt[1]]] = 0.0
+        after_no = is_(prev[1], "no") | is_(prev[2], "no") | (is_(prev[3], "no") & is_(prev[1], "or", "nor"))
+        v = np.where(after_no, lexicon_valence * N_SCALAR, v)
+        v = np.where(upper[at] & emphasis, np.where(v > 0, v + C_INCR, v - C_INCR), v)
+
+        for k in (1, 2, 3):
+            applies = (p >= k) & ~self.in_lexicon[prev[k]]
+            booster = self.is_booster[prev[k]]
+            s = np.where(v < 0, -self.boost[prev[k]], self.boost[prev[k]])
+            s = np.where(booster & prev_upper[k] & emphasis, np.where(v > 0, s + C_INCR, s - C_INCR), s)
+            if k == 2:
+                s = s * 0.95
+            elif k == 3:
+                s = s * 0.9
+            v = np.where(applies, v + s, v)
+
+            negated = self.negation[prev[k]]
+            if k == 1:
+                factor = np.where(negated, N_SCALAR, 1.0)
+            elif k == 2:
+                never_so = is_(prev[2], "never") & is_(prev[1], "so", "this")
+                without_doubt = is_(prev[2], "without") & is_(prev[1], "doubt")
+                factor = np.where(never_so, 1.25, np.where(without_doubt, 1.0, np.where(negated, N_SCALAR, 1.0)))
+            else:
+                never_so = (is_(prev[3], "never") & is_(prev[2], "so", "this")) | is_(prev[1], "so", "this")
+                without_doubt = is_(prev[3], "without") & (is_(prev[2], "doubt") | is_(prev[1], "doubt"))
+                factor = np.where(never_so, 1.25, np.where(without_doubt, 1.0, np.where(negated, N_SCALAR, 1.0)))
+            v = np.where(applies, v * factor, v)
+            if k == 3:
+                # Idioms, only where a word of one is close enough to match
+                near_phrase = self.in_phrase[word] | self.in_phrase[nxt[1]] | self.in_phrase[nxt[2]]
+                for j in (1, 2, 3):
+                    near_phrase |= self.in_phrase[prev[j]]
+                c = np.flatnonzero(applies & near_phrase)
+                if len(c):
+                    v[c] = self._idioms(v[c], word[c], {j: a[c] for j, a in prev.items()},
+                                        {j: a[c] for j, a in nxt.items()})
+
+        least = is_(prev[1], "least") & ~self.in_lexicon[prev[1]]
+        v = np.where(least & (p > 1) & ~is_(prev[2], "at", "very"), v * N_SCALAR, v)
+        v = np.where(least & (p == 1), v * N_SCALAR, v)
+
+        is_but = ids == named["but"]
+        if is_but.any():
+            v = self._but(v, text, p, doc[is_but], pos[is_but], n_docs)
+
+        # Words left out score 0, and adding 0.0 leaves VADER's running sums unchanged
+        total = np.bincount(text, weights=v, minlength=n_docs)
+        ep = np.minimum(ep_count, 4) * 0.292
+        qm = np.where(qm_count > 1, np.where(qm_count <= 3, qm_count * 0.18, 0.96), 0.0)
+        amplifier = ep + qm
+        total = np.where(total > 0, total + amplifier, np.where(total < 0, total - amplifier, total))
+        compound = np.clip(total / np.sqrt(total * total + ALPHA), -1.0, 1.0)
+
+        pos_sum = np.bincount(text, weights=np.where(v > 0, v + 1, 0.0), minlength=n_docs)
+        neg_sum = np.bincount(text, weights=np.where(v < 0, v - 1, 0.0), minlength=n_docs)
+        neu_count = lengths - np.bincount(text, weights=v != 0, minlength=n_docs)
+        pos_sum, neg_sum = (np.where(pos_sum > -neg_sum, pos_sum + amplifier, pos_sum),
+                            np.where(pos_sum < -neg_sum, neg_sum - amplifier, neg_sum))
+        has_words = lengths > 0
+        denominator = np.where(has_words, pos_sum - neg_sum + neu_count, 1.0)
+
+        return pd.DataFrame({
+            "neg": np.where(has_words, _round(np.abs(neg_sum / denominator), 3), 0.0),
+            "neu": np.where(has_words, _round(np.abs(neu_count / denominator), 3), 0.0),
+            "pos": np.where(has_words, _round(np.abs(pos_sum / denominator), 3), 0.0),
+            "compound": np.where(has_words, _round(compound, 4), 0.0),
+        })[list(SCORES)]
+
+    @staticmethod
+    def _but(v, text, p, but_text, but_pos, n_docs):
+        """The contrastive "but": valences before a text's first "but" halved, those after it x1.5.
+
+        VADER's _but_check rescales word k in place of an earlier word j
+        whose already-rescaled valence equals k's own; texts where that can
+        happen go through _but_check itself, the rest are done with arrays.
+        """
+        but_at = np.full(n_docs, -1)
+        but_at[but_text[::-1]] = but_pos[::-1]
+        first = but_at[text]
+        has_but = first >= 0
+        shifted = np.where(has_but & (p < first), v * 0.5, np.where(has_but & (p > first), v * 1.5, v))
+
+        words = np.flatnonzero(has_but & (v != 0))
+        rescaled = pd.DataFrame({"text": text[words], "value": shifted[words], "earliest": words})
+        rescaled = rescaled.groupby(["text", "value"], as_index=False)["earliest"].min()
+        own = pd.DataFrame({"text": text[words], "value": v[words], "word": words})
+        clash = own.merge(rescaled, on=["text", "value"])
+        texts = np.unique(clash["text"][clash["earliest"] < clash["word"]])
+        for d, lo, hi in zip(texts, np.searchsorted(text, texts), np.searchsorted(text, texts, side="right")):
+            shifted[lo:hi] = _but_check(v[lo:hi].tolist(), p[lo:hi], but_at[d])
+        return shifted
+
+    def _idioms(self, v, ids, prev, nxt):
+        """_special_idioms_check for each of the words `ids`, given the ids around them."""
+
+        def at(offsets):
+            return [ids if o == 0 else (prev[-o] if o < 0 else nxt[o]) for o in offsets]
+
+        def matches(phrase, offsets):
+            if len(phrase) != len(offsets):
+                return np.zeros(len(ids), dtype=bool)
+            hit = np.ones(len(ids), dtype=bool)
+            for word, column in zip(phrase, at(offsets)):
+                hit &= column == word
+            return hit
+
+        out = v.copy()
+        found = np.zeros(len(ids), dtype=bool)
+        # First match wins, in VADER's order: i-1 i, i-2 i-1 i, i-2 i-1, i-3 i-2 i-1, i-3 i-2
+        for offsets in ((-1, 0), (-2, -1, 0), (-2, -1), (-3, -2, -1), (-3, -2)):
+            for phrase, value in self.special:
+                hit = matches(phrase, offsets) & ~found
+                out = np.where(hit, value, out)
+                found |= hit
+        # Then phrases starting at the word itself override
+        for offsets in ((0, 1), (0, 1, 2)):
+            for phrase, value in self.special:
+                out = np.where(matches(phrase, offsets), value, out)
+        # Booster bigrams such as "kind of" just before the word add to it
+        for offsets in ((-3, -2, -1), (-3, -2), (-2, -1)):
+            for phrase, value in self.booster_ngrams:
+                out = np.where(matches(phrase, offsets), out + value, out)
+        return out
@@ -0,0 +1,235 @@
+# warehouse.py
+
+import atexit
+import os
+import re
+import threading
+import weakref
+from contextlib import contextmanager
+
+
+# Snowflake error codes meaning the session is gone and must be re-established
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+
+_backends = {}
+_params = {}
+_conn = None
+_lock = threading.RLock()
+
+
+def register_backend(name, factory):
+    """Register a connection factory `factory(params) -> DBAPI connection` under `name`."""
+    _backends[name] = factory
+
+
+def backend_name():
+    """Return the active backend, from WAREHOUSE_BACKEND (default snowflake)."""
+    return (os.getenv("WAREHOUSE_BACKEND") or "snowflake").lower()
+
+
+def conn_params():
+    """Connection parameters from the SNOWFLAKE_* environment, overridden by configure().
+
+    An empty variable counts as unset: CI passes a secret that is not
+    configured as "", which must not replace the default.
+    """
+    params = {
+        "user": os.getenv("SNOWFLAKE_USER") or "USER1204",
+        "password": os.getenv("SNOWFLAKE_PASSWORD") or None,
+        "account": os.getenv("SNOWFLAKE_ACCOUNT") or "XUZXIIE-EAC06737",
+        "warehouse": os.getenv("SNOWFLAKE_WAREHOUSE") or "COMPUTE_WH",
+        "database": os.getenv("SNOWFLAKE_DATABASE") or "GPT_REVIEWS_DB",
+        "schema": os.getenv("SNOWFLAKE_SCHEMA") or "PUBLIC",
+        "role": os.getenv("SNOWFLAKE_ROLE") or "ACCOUNTADMIN",
+    }
+    params.update(_params)
+    return params
+
+
+def configure(**params):
+    """Override connection parameters for this process and drop any cached session."""
+    _params.update(params)
+    close()
+
+
+def _is_closed(conn):
+    is_closed = getattr(conn, "is_closed", None)
+    return bool(is_closed()) if callable(is_closed) else False
+
+
+def get_connection():
+    """Return this process's shared connection, opening (or re-opening) it when needed."""
+    global _conn
+    with _lock:
+        if _conn is None or _is_closed(_conn):
+            name = backend_name()
+            if name not in _backends:
+                raise ValueError(f"Unknown WAREHOUSE_BACKEND {name!r}; registered: {sorted(_backends)}")
+            print(f"Connecting to warehouse ({name})...")
+            _conn = _backends[name](conn_params())
+        return _conn
+
+
+def is_session_expired(error):
+    """True when `error` means the warehouse session has expired or been dropped."""
+    return getattr(error, "errno", None) in SESSION_EXPIRED_ERRNOS
+
+
+@contextmanager
+def cursor():
+    """Yield a cursor on the shared connection.
+
+    If the block fails because the session expired, the cached connection is
+    discarded so the next call reconnects transparently.
+    """
+    global _conn
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        yield cur
+    except Exception as e:
+        if is_session_expired(e):
+            with _lock:
+                if _conn is conn:
+                    _conn = None
+        raise
+    finally:
+        try:
+            cur.close()
+        except Exception:
+            pass
+
+
+def close():
+    """Close the shared connection, if any."""
+    global _conn
+    with _lock:
+        if _conn is not None:
+            try:
+                _conn.close()
+            except Exception:
+                pass
+            _conn = None
+
+
+atexit.register(close)
+
+
+def _connect_snowflake(params):
+    import snowflake.connector
+
+    if not params.get("password"):
+        raise KeyError("SNOWFLAKE_PASSWORD")
+    return snowflake.connector.connect(client_session_keep_alive=True, **params)
+
+
+# Rewrites Snowflake-flavoured statements for local stand-ins. Each entry is
+# (pattern, replacement); a replacement of None drops the statement.
+_LOCAL_REWRITES = [
+    (re.compile(r"^\s*ALTER TABLE \S+ CLUSTER BY .*$", re.I | re.S), None),
+    (re.compile(r"^\s*PUT\s", re.I), None),
+    (re.compile(r"\bCLUSTER BY \([^)]*\)", re.I), ""),
+    (re.compile(r"CREATE OR REPLACE TEMPORARY TABLE (\S+) LIKE (\S+)", re.I),
+     r"CREATE OR REPLACE TEMP TABLE \1 AS SELECT * FROM \2 LIMIT 0"),
+    (re.compile(r"\bTIMESTAMP_NTZ\b", re.I), "TIMESTAMP"),
+    (re.compile(r"\bCURRENT_(DATE|TIMESTAMP)\(\)", re.I), r"CURRENT_\1"),
+    (re.compile(r"%\((\w+)\)s"), r"$\1"),
+    (re.compile(r"%s"), "?"),
+]
+
+
+def translate_local(sql):
+    """Translate one Snowflake statement for DuckDB; returns None to skip it."""
+    for pattern, replacement in _LOCAL_REWRITES:
+        if replacement is None:
+            if pattern.search(sql):
+                return None
+        else:
+            sql = pattern.sub(replacement, sql)
+    return sql
+
+
+class LocalCursor:
+    """DBAPI cursor wrapper that feeds Snowflake SQL to a local database."""
+
+    def __init__(self, cursor, dialect):
+        self._cursor = cursor
+        self.dialect = dialect
+        self.closed = False
+
+    def execute(self, sql, params=None):
+        sql = translate_local(sql)
+        if sql is not None:
+            if params is None:
+                self._cursor.execute(sql)
+            else:
+                self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        sql = translate_local(sql)
+        if sql is not None:
+            self._cursor.executemany(sql, seq_of_params)
+        return self
+
+    def close(self):
+        self.closed = True
+        self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class LocalConnection:
+    """DBAPI connection wrapper whose cursors translate Snowflake SQL.
+
+    A DuckDB cursor is a connection of its own, with its own transaction,
+    so `commit()` and `rollback()` also end the transactions opened on this
+    connection's cursors, as they would on a Snowflake session.
+    """
+
+    def __init__(self, conn, dialect):
+        self._conn = conn
+        self.dialect = dialect
+        self._closed = False
+        self._cursors = weakref.WeakSet()
+
+    def cursor(self):
+        cursor = LocalCursor(self._conn.cursor(), self.dialect)
+        self._cursors.add(cursor)
+        return cursor
+
+    def _open_cursors(self):
+        return [cursor._cursor for cursor in list(self._cursors) if not cursor.closed]
+
+    def commit(self):
+        for conn in self._open_cursors():
+            conn.commit()
+        self._conn.commit()
+
+    def rollback(self):
+        for conn in self._open_cursors() + [self._conn]:
+            try:
+                conn.rollback()
+            except Exception:  # DuckDB raises when no transaction is open
+                pass
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        self._closed = True
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _connect_duckdb(params):
+    import duckdb
+
+    return LocalConnection(duckdb.connect(os.getenv("WAREHOUSE_PATH") or ":memory:"), "duckdb")
+
+
+register_backend("snowflake", _connect_snowflake)
+register_backend("duckdb", _connect_duckdb)